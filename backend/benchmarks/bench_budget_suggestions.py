@@ -0,0 +1,82 @@
+"""
+Benchmark for the budget suggestion generator.
+
+Builds `--years` of history for `--account-sets` copies of the four sample
+accounts (data/generate_data.py), then times frame construction and the
+suggestion pass. Transfers are flagged and excluded like in the database.
+
+Usage (from backend/):
+    python -m benchmarks.bench_budget_suggestions [--years 10] [--account-sets 10]
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+from core.suggestions import history_frame, suggest_budgets
+from benchmarks.synthetic import account_set
+
+CATEGORIES = {
+    "WALMART GROCERY": "Groceries",
+    "KROGER #443": "Groceries",
+    "STARBUCKS COFFEE": "Dining",
+    "UBER EATS": "Dining",
+    "CITY WATER BILL": "Utilities",
+    "NETFLIX COM": "Subscriptions",
+    "AMZN Mktp US": "Shopping",
+    "TARGET": "Shopping",
+    "MORTGAGE PAYMENT 4432": "Housing",
+}
+
+
+def spending_rows(years: int, account_sets: int):
+    start = date(2025 - years, 1, 1)
+    end = date(2024, 12, 31)
+    rows = []
+    for copy in range(account_sets):
+        rows.extend(account_set(start, end, suffix=f" #{copy}" if copy else ""))
+    # A few one-off spikes the trimming should ignore
+    for _ in range(years * account_sets):
+        day = start.toordinal() + random.randrange((end - start).days)
+        rows.append({"date": date.fromordinal(day).isoformat(), "description": "TARGET",
+                     "amount": -round(random.uniform(2000, 5000), 2), "potential_transfer": False})
+    dates, amounts, categories = [], [], []
+    for row in rows:
+        if row["amount"] >= 0 or row["potential_transfer"]:
+            continue
+        dates.append(datetime.fromisoformat(row["date"]))
+        amounts.append(row["amount"])
+        categories.append(CATEGORIES.get(row["description"], "Investments"))
+    return dates, amounts, categories
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--account-sets", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(3)
+    dates, amounts, categories = spending_rows(args.years, args.account_sets)
+
+    start = time.perf_counter()
+    frame = history_frame(dates, amounts, categories)
+    frame_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    result = suggest_budgets(frame, pd.Period("2025-01", freq="M"))
+    suggest_ms = (time.perf_counter() - start) * 1000
+
+    print(f"rows={len(frame)} years={args.years} account_sets={args.account_sets}")
+    print(f"frame:   {frame_ms:.1f} ms")
+    print(f"suggest: {suggest_ms:.1f} ms")
+    print(f"{'category':<14} {'suggested':>10} {'low':>10} {'high':>10} {'median':>10} {'trend':>8} {'season':>7}")
+    for i, category in enumerate(result["category"]):
+        print(f"{category:<14} {result['suggested'][i]:>10.2f} {result['low'][i]:>10.2f} {result['high'][i]:>10.2f} "
+              f"{result['median'][i]:>10.2f} {result['trend'][i]:>8.2f} {result['seasonal_factor'][i]:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+End-to-end benchmark against a local Mongo.
+
+Generates a dataset with data/generate_data.py, then measures:
+  generate   -- writing the bank-format and flat CSVs
+  parse      -- reading every bank file through the known-format parsers
+  link       -- matching transfers across the whole flat dataset
+  load       -- bulk-inserting the flat dataset (normalized, fingerprinted)
+  upload     -- one user's bank files through POST /upload and its job queue
+  queries    -- GET /transactions first pages, filters and full keyset scan
+  analytics  -- the /analytics endpoints
+
+Results are written as JSON; --compare prints the change against an earlier
+run and exits non-zero when a metric regressed by more than --tolerance.
+The benchmark database (--db) is dropped and refilled on every run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_e2e [--users 20] [--accounts 4] [--years 5] [--transfer-density 1.0]
+        [--mongo-url mongodb://localhost:27017] [--db fintrack_bench]
+        [--output benchmarks/results/e2e.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pandas as pd
+from bson import ObjectId
+
+from benchmarks.synthetic import generate_data  # data/generate_data.py
+from core.config import Config
+from core.db import ensure_indexes
+from core.dates import normalize_date
+from core.fingerprints import fingerprint_batch
+from core.formats import parse_known_format
+from core.links import link_fields
+from core.merchants import annotate_merchant
+from core.transfers import match_batch_transfers
+
+LOAD_BATCH_SIZE = 5000
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else 0.0
+
+
+def latency_summary(latencies):
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "requests": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 2),
+        "requests_per_s": rate(len(ordered), total),
+    }
+
+
+async def timed_requests(http, path, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await http.get(path)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return latency_summary(latencies)
+
+
+def bench_generate(args, workdir):
+    start = time.perf_counter()
+    rows = generate_data.generate(
+        args.users, args.accounts, args.years, args.transfer_density,
+        out_dir=os.path.join(workdir, "bank"), flat_path=os.path.join(workdir, "flat.csv"),
+    )
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(seconds, 3), "rows_per_s": rate(rows, seconds)}
+
+
+def bench_parse(workdir):
+    files = sorted(glob.glob(os.path.join(workdir, "bank", "*.csv")))
+    rows = 0
+    start = time.perf_counter()
+    for path in files:
+        rows += len((parse_known_format(pd.read_csv(path)) or ([], 0))[0])
+    seconds = time.perf_counter() - start
+    return {"files": len(files), "rows": rows, "seconds": round(seconds, 3), "rows_per_s": rate(rows, seconds)}
+
+
+def flat_transactions(workdir):
+    frame = pd.read_csv(os.path.join(workdir, "flat.csv"))
+    potential = frame["description"].str.upper().str.contains("TRANSFER")
+    return [
+        {
+            "date": date, "description": description, "amount": amount,
+            "type": "income" if amount > 0 else "expense",
+            "category": "Transfer" if flag else "Other",
+            "merchant": description, "account_name": account,
+            "is_transfer": False, "potential_transfer": flag, "linked_tx_id": None,
+        }
+        for date, description, amount, account, flag in zip(
+            frame["date"], frame["description"], frame["amount"], frame["account_name"], potential,
+        )
+    ]
+
+
+def bench_link(transactions):
+    start = time.perf_counter()
+    pairs = match_batch_transfers(transactions)
+    seconds = time.perf_counter() - start
+    # Link the pairs the way ingest does, so the loaded data carries them
+    for i, j in pairs:
+        a, b = transactions[i], transactions[j]
+        a["_id"], b["_id"] = ObjectId(), ObjectId()
+        a.update(link_fields(a["_id"], b["_id"], b.get("account_name")))
+        b.update(link_fields(b["_id"], a["_id"], a.get("account_name")))
+    return {"rows": len(transactions), "pairs": len(pairs), "seconds": round(seconds, 3),
+            "rows_per_s": rate(len(transactions), seconds)}
+
+
+async def bench_load(db, transactions):
+    start = time.perf_counter()
+    for txn in transactions:
+        normalize_date(txn)
+        annotate_merchant(txn)
+    fingerprint_batch(transactions)
+    prepare = time.perf_counter() - start
+
+    await ensure_indexes(db.transactions)
+    start = time.perf_counter()
+    for offset in range(0, len(transactions), LOAD_BATCH_SIZE):
+        await db.transactions.insert_many(transactions[offset:offset + LOAD_BATCH_SIZE], ordered=False)
+    insert = time.perf_counter() - start
+    return {"rows": len(transactions), "prepare_seconds": round(prepare, 3), "insert_seconds": round(insert, 3),
+            "rows_per_s": rate(len(transactions), prepare + insert)}
+
+
+async def wait_for_job(http, job_id):
+    while True:
+        job = (await http.get(f"/jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+
+
+async def bench_upload(http, workdir):
+    files = sorted(glob.glob(os.path.join(workdir, "bank", "user0_*.csv")))
+    inserted = failed = 0
+    latencies = []
+    start = time.perf_counter()
+    for path in files:
+        begin = time.perf_counter()
+        with open(path, "rb") as f:
+            response = await http.post("/upload", files={"file": (os.path.basename(path), f.read())})
+        response.raise_for_status()
+        job = await wait_for_job(http, response.json()["job_id"])
+        latencies.append(time.perf_counter() - begin)
+        if job["status"] == "failed":
+            failed += 1
+        else:
+            inserted += job["result"]["inserted"]
+    seconds = time.perf_counter() - start
+    return {"files": len(files), "failed": failed, "rows": inserted, "seconds": round(seconds, 3),
+            "rows_per_s": rate(inserted, seconds), **latency_summary(latencies)}
+
+
+async def bench_queries(http, repeat):
+    results = {
+        "first_page": await timed_requests(http, "/transactions?page_size=100", repeat),
+        "category": await timed_requests(http, "/transactions?category=Transfer&page_size=100", repeat),
+        "vendor": await timed_requests(http, "/transactions?vendor=walmart&page_size=100", repeat),
+    }
+    latest = (await http.get("/transactions?page_size=1&fields=date")).json()
+    if latest:
+        end = datetime.strptime(latest[0]["date"], "%Y-%m-%d")
+        start = (end - timedelta(days=90)).strftime("%Y-%m-%d")
+        results["date_range"] = await timed_requests(
+            http, f"/transactions?start_date={start}&end_date={latest[0]['date']}&page_size=100", repeat
+        )
+
+    # Walk every row with keyset pagination
+    rows = pages = 0
+    cursor = None
+    start_time = time.perf_counter()
+    while True:
+        path = "/transactions?page_size=1000" + (f"&cursor={cursor}" if cursor else "")
+        response = await http.get(path)
+        response.raise_for_status()
+        rows += len(response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    seconds = time.perf_counter() - start_time
+    results["full_scan"] = {"rows": rows, "pages": pages, "seconds": round(seconds, 3), "rows_per_s": rate(rows, seconds)}
+    return results
+
+
+async def bench_analytics(http, repeat):
+    return {
+        "monthly": await timed_requests(http, "/analytics/monthly", repeat),
+        "cashflow": await timed_requests(http, "/analytics/cashflow", repeat),
+        "top_vendors": await timed_requests(http, "/analytics/top-vendors", repeat),
+        "transfer_flows": await timed_requests(http, "/transfers/flows", repeat),
+    }
+
+
+def bind_app(main, client, db):
+    """Points the app's module-level collections at the benchmark database."""
+    main.bind_database(client, db)
+
+
+async def run(args):
+    if args.mongomock:
+        # Smoke runs without a server; timings are not comparable to real Mongo
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.db)
+    db = client[args.db]
+
+    stages = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        print("generate...", flush=True)
+        stages["generate"] = bench_generate(args, workdir)
+        print("parse...", flush=True)
+        stages["parse"] = bench_parse(workdir)
+        transactions = flat_transactions(workdir)
+        print("link...", flush=True)
+        stages["link"] = bench_link(transactions)
+        print("load...", flush=True)
+        stages["load"] = await bench_load(db, transactions)
+        del transactions
+
+        import main
+        bind_app(main, client, db)
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.lifespan(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+                print("upload...", flush=True)
+                stages["upload"] = await bench_upload(http, workdir)
+                print("queries...", flush=True)
+                stages["queries"] = await bench_queries(http, args.repeat)
+                print("analytics...", flush=True)
+                try:
+                    stages["analytics"] = await bench_analytics(http, args.repeat)
+                except Exception as e:
+                    stages["analytics"] = {"error": str(e)}
+
+    if not args.keep:
+        await client.drop_database(args.db)
+    return stages
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def flatten(stages, prefix=""):
+    metrics = {}
+    for key, value in stages.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.endswith("_per_s")):
+            metrics[name] = value
+    return metrics
+
+
+def compare(current, baseline, tolerance):
+    """Prints per-metric changes; returns the metrics that regressed beyond tolerance."""
+    now, then = flatten(current["stages"]), flatten(baseline["stages"])
+    regressions = []
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(now.keys() & then.keys()):
+        old, new = then[name], now[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        # Latencies should go down, throughput up
+        worse = change > tolerance if name.endswith("_ms") else change < -tolerance
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:<40} {old:>12.2f} {new:>12.2f} {change:>+8.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--transfer-density", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=20, help="Requests per query/analytics endpoint")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-url", default=Config.get_mongo_url())
+    parser.add_argument("--db", default="fintrack_bench")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database afterwards")
+    parser.add_argument("--mongomock", action="store_true", help="Run against mongomock_motor (smoke test only)")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/e2e-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.db == "fintrack":
+        parser.error("refusing to benchmark against the application database")
+    generate_data.set_seed(args.seed)
+
+    stages = asyncio.run(run(args))
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "backend": "mongomock" if args.mongomock else args.mongo_url,
+            "params": {k: getattr(args, k) for k in ("users", "accounts", "years", "transfer_density", "repeat", "seed")},
+        },
+        "stages": stages,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(stages, indent=2))
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
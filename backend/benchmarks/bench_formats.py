@@ -0,0 +1,82 @@
+"""
+Benchmark for the known-format CSV fast path.
+
+Parses the sample statements in data/ plus multi-year synthetic exports from
+the data/generate_data.py generators. With --llm, the same files also go
+through the configured LLMProvider (first 50 rows, as /upload used to send)
+to show the gap.
+
+Usage (from backend/):
+    python -m benchmarks.bench_formats [--years 1,10,50] [--llm]
+"""
+import argparse
+import asyncio
+import glob
+import io
+import os
+import time
+from datetime import date
+
+import pandas as pd
+
+from core.formats import parse_known_format
+from benchmarks.synthetic import generate_data
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+
+GENERATORS = {
+    "boa": generate_data.generate_boa,
+    "baxter": generate_data.generate_baxter,
+    "fidelity_individual": generate_data.generate_fidelity_individual,
+    "fidelity_roth": generate_data.generate_fidelity_roth,
+}
+
+
+def synthetic_csv(generator, years: int) -> bytes:
+    start = date(2025 - years, 1, 1)
+    return generator(start, date(2024, 12, 31)).to_csv(index=False).encode("utf-8")
+
+
+def time_fast_path(content: bytes):
+    start = time.perf_counter()
+    rows, _ = parse_known_format(pd.read_csv(io.BytesIO(content)))
+    return len(rows), (time.perf_counter() - start) * 1000
+
+
+async def time_llm_path(content: bytes):
+    from core.llm import get_llm_provider
+    from prompts import DATA_EXTRACTION_PROMPT
+
+    llm = get_llm_provider()
+    text_sample = pd.read_csv(io.BytesIO(content)).head(50).to_string()
+    start = time.perf_counter()
+    rows = await llm.extract_data(text_sample, DATA_EXTRACTION_PROMPT)
+    return len(rows), (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", default="1,10,50")
+    parser.add_argument("--llm", action="store_true", help="also time the configured LLM provider")
+    args = parser.parse_args()
+
+    cases = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*.csv"))):
+        with open(path, "rb") as f:
+            cases.append((os.path.basename(path), f.read()))
+    for years in (int(y) for y in args.years.split(",")):
+        for name, generator in GENERATORS.items():
+            cases.append((f"{name} x{years}y", synthetic_csv(generator, years)))
+
+    print(f"{'file':<36} {'rows':>7} {'fast (ms)':>10} {'llm rows':>9} {'llm (ms)':>10}")
+    for name, content in cases:
+        rows, fast_ms = time_fast_path(content)
+        llm_rows, llm_ms = "-", "-"
+        if args.llm:
+            count, elapsed = asyncio.run(time_llm_path(content))
+            llm_rows, llm_ms = str(count), f"{elapsed:.0f}"
+        print(f"{name:<36} {rows:>7} {fast_ms:>10.1f} {llm_rows:>9} {llm_ms:>10}")
+
+
+if __name__ == "__main__":
+    main()
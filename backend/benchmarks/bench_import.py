@@ -0,0 +1,131 @@
+"""
+Cold-start import time of the app, from `python -X importtime`.
+
+Imports main in fresh interpreters and reports, as medians over --repeat
+runs:
+  main_ms  -- cumulative import time of main, as importtime measures it
+  wall_ms  -- the whole interpreter run, startup included
+and the heaviest modules main pulls in directly.
+
+It fails (exit 1) when a module that should load on first use is imported
+at startup (pandas, numpy, the Gemini SDK, Motor), when main_ms exceeds
+--budget-ms, or, with --compare, when a metric regressed by more than
+--tolerance against an earlier run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_import [--repeat 7] [--budget-ms 1000]
+        [--output benchmarks/results/import.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_e2e import compare
+
+# Loaded by the code paths that need them, never by `import main`
+LAZY_MODULES = ("pandas", "numpy", "google.generativeai", "motor")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self us, cumulative us) per `import time:` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_once() -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, default=0, help="Fail when main_ms exceeds this (0: no budget)")
+    parser.add_argument("--output", default=os.path.join(BACKEND_DIR, "benchmarks", "results", "import.json"))
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args()
+
+    walls, mains = [], []
+    children: Dict[str, List[int]] = {}
+    eager = set()
+    for _ in range(args.repeat):
+        wall, rows = import_once()
+        walls.append(wall * 1000)
+        depth = next(d for name, d, _, _ in rows if name == "main")
+        mains.append(next(c for name, d, _, c in rows if name == "main") / 1000)
+        for name, d, _, cumulative in rows:
+            if name.split(".")[0] in LAZY_MODULES or name in LAZY_MODULES:
+                eager.add(name if name in LAZY_MODULES else name.split(".")[0])
+            # Modules imported directly while main was loading
+            if d == depth + 1:
+                children.setdefault(name, []).append(cumulative)
+
+    stats = {
+        "main_ms": round(statistics.median(mains), 1),
+        "wall_ms": round(statistics.median(walls), 1),
+    }
+    heaviest = sorted(
+        ((name, statistics.median(times) / 1000) for name, times in children.items()),
+        key=lambda item: -item[1],
+    )[:args.top]
+
+    print(f"import main: {stats['main_ms']:.1f} ms (interpreter run {stats['wall_ms']:.1f} ms, "
+          f"median of {args.repeat})")
+    for name, ms in heaviest:
+        print(f"  {name:<40} {ms:>8.1f} ms")
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "stages": {"import": stats},
+        "heaviest": {name: round(ms, 1) for name, ms in heaviest},
+        "eager_lazy_modules": sorted(eager),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    failures = []
+    if eager:
+        failures.append(f"imported at startup: {', '.join(sorted(eager))}")
+    if args.budget_ms and stats["main_ms"] > args.budget_ms:
+        failures.append(f"main_ms {stats['main_ms']:.1f} over budget {args.budget_ms:.0f}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            failures.append(f"regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
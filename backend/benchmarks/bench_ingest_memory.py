@@ -0,0 +1,179 @@
+"""
+Peak memory of upload ingestion versus file size.
+
+Writes BoA-format CSVs of increasing size and ingests each in a fresh
+process, reporting peak RSS above the RSS right after imports:
+  whole   -- the previous path: read the bytes, one DataFrame, every row as
+             a dict, fingerprint_batch over the whole file
+  stream  -- iter_upload chunks with an OrdinalCounter, each chunk dropped
+             before the next is read
+  upload  -- (with --mongo-url) the real upload job, main.process_upload,
+             writing into a throwaway database
+
+The streaming columns should stay flat as the file grows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingest_memory [--rows 50000,200000,800000]
+        [--chunk-rows 20000] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DESCRIPTIONS = np.array([
+    "WALMART SUPERCENTER", "SHELL OIL 5744", "NETFLIX.COM", "STARBUCKS STORE 1192",
+    "AMAZON MKTPLACE PMTS", "COSTCO WHSE #0113", "TRANSFER TO SAVINGS", "PAYROLL ACME CORP",
+])
+
+
+def write_csv(path: str, rows: int, block: int = 100000):
+    """Date-sorted BoA export, written in blocks so the parent stays small."""
+    rng = np.random.default_rng(7)
+    start = pd.Timestamp("2000-01-01")
+    per_day = 40
+    with open(path, "w") as f:
+        f.write("Date,Description,Amount\n")
+        for offset in range(0, rows, block):
+            n = min(block, rows - offset)
+            days = (np.arange(offset, offset + n) // per_day).astype("timedelta64[D]")
+            frame = pd.DataFrame({
+                "Date": (start + pd.to_timedelta(days)).strftime("%m/%d/%Y"),
+                "Description": DESCRIPTIONS[rng.integers(0, len(DESCRIPTIONS), n)],
+                "Amount": np.round(-rng.gamma(2.0, 30.0, n), 2),
+            })
+            frame.to_csv(f, header=False, index=False)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def run_whole(path: str):
+    from core.dates import normalize_date
+    from core.fingerprints import fingerprint_batch
+    from core.formats import parse_known_format
+    from core.merchants import annotate_merchant
+
+    with open(path, "rb") as f:
+        content = f.read()
+    rows, _ = parse_known_format(pd.read_csv(io.BytesIO(content)))
+    for txn in rows:
+        normalize_date(txn)
+        annotate_merchant(txn)
+    fingerprint_batch(rows)
+    return len(rows)
+
+
+def run_stream(path: str, chunk_rows: int):
+    from core.dates import normalize_date
+    from core.fingerprints import OrdinalCounter
+    from core.merchants import annotate_merchant
+    from core.uploads import iter_upload
+
+    counter = OrdinalCounter()
+    total = 0
+    for rows, _, _ in iter_upload(path, "bench.csv", chunk_rows):
+        for txn in rows:
+            normalize_date(txn)
+            annotate_merchant(txn)
+        counter.assign(rows)
+        total += len(rows)
+    return total
+
+
+def run_upload(path: str, chunk_rows: int, mongo_url: str):
+    os.environ["UPLOAD_CHUNK_ROWS"] = str(chunk_rows)
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    import main
+    from benchmarks.bench_e2e import bind_app
+
+    class Progress:
+        async def update(self, stage, done=None, total=None):
+            pass
+
+    async def go():
+        client = AsyncIOMotorClient(mongo_url)
+        await client.drop_database("fintrack_bench_memory")
+        db = client.fintrack_bench_memory
+        bind_app(main, client, db)
+        await main.ensure_indexes(db.transactions)
+        # process_upload removes its input, as it does with spooled uploads
+        spooled = path + ".spool"
+        os.link(path, spooled)
+        try:
+            result = await main.process_upload({"filename": "bench.csv", "path": spooled}, Progress())
+        finally:
+            await client.drop_database("fintrack_bench_memory")
+        return result["inserted"]
+
+    return asyncio.run(go())
+
+
+def child(mode: str, path: str, chunk_rows: int, mongo_url: str):
+    # Import everything first so the baseline covers the libraries
+    import core.merchants  # noqa: F401
+    import core.uploads  # noqa: F401
+    baseline = current_rss_mb()
+    if mode == "whole":
+        rows = run_whole(path)
+    elif mode == "stream":
+        rows = run_stream(path, chunk_rows)
+    else:
+        rows = run_upload(path, chunk_rows, mongo_url)
+    print(f"{rows} {baseline:.1f} {peak_rss_mb():.1f}")
+
+
+def measure(mode: str, path: str, chunk_rows: int, mongo_url: str):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_ingest_memory", "--child", mode, path,
+         "--chunk-rows", str(chunk_rows), "--mongo-url", mongo_url or ""],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    baseline, peak = float(out[-2]), float(out[-1])
+    return peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="50000,200000,800000")
+    parser.add_argument("--chunk-rows", type=int, default=20000)
+    parser.add_argument("--mongo-url", default="", help="Also measure the real upload job against this server")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.chunk_rows, args.mongo_url)
+        return
+
+    modes = ["whole", "stream"] + (["upload"] if args.mongo_url else [])
+    print(f"{'rows':>9} {'file MB':>8} " + " ".join(f"{m + ' MB':>10}" for m in modes))
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in (int(r) for r in args.rows.split(",")):
+            path = os.path.join(workdir, f"boa_{rows}.csv")
+            write_csv(path, rows)
+            size = os.path.getsize(path) / 1e6
+            peaks = [measure(mode, path, args.chunk_rows, args.mongo_url) for mode in modes]
+            print(f"{rows:>9} {size:>8.1f} " + " ".join(f"{p:>10.1f}" for p in peaks))
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark for ingest-time categorization rules.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rules [--rows 100000] [--rules 500] [--merchants 5000]
+"""
+import argparse
+import random
+import time
+
+from core.merchants import annotate_merchant
+from core.rules import RuleMatcher
+from benchmarks.synthetic import synthetic_batch
+
+
+def location(n: int) -> str:
+    letters = ""
+    while True:
+        letters = chr(ord("a") + n % 26) + letters
+        n //= 26
+        if not n:
+            return letters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--merchants", type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    batch = synthetic_batch(args.rows)
+    # The generators only use a handful of descriptions; suffix a location
+    # word (store numbers are normalized away) so the batch has a realistic
+    # number of distinct merchants
+    for txn in batch:
+        txn["description"] = f"{txn['description']} {location(random.randrange(args.merchants))}"
+        annotate_merchant(txn)
+
+    keys = sorted({txn["merchant_key"] for txn in batch})
+    rules = []
+    for i in range(args.rules):
+        kind = ("exact", "prefix", "prefix", "prefix")[i % 4]
+        key = random.choice(keys)
+        pattern = key if kind == "exact" else " ".join(key.split()[:random.randint(1, 2)] + [f"x{i}"] * (i % 3 == 0))
+        rules.append({"kind": kind, "pattern": pattern, "category": f"Category {i % 20}"})
+    rules.append({"kind": "regex", "pattern": r"payroll|direct dep", "category": "Salary"})
+
+    start = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    applied = matcher.apply(batch)
+    apply_ms = (time.perf_counter() - start) * 1000
+
+    print(f"rows={len(batch)} merchants={len(keys)} rules={len(rules)}")
+    print(f"compile: {compile_ms:.1f} ms")
+    print(f"apply:   {apply_ms:.1f} ms ({applied} rows categorized)")
+
+
+if __name__ == "__main__":
+    main()
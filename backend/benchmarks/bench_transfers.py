@@ -0,0 +1,63 @@
+"""
+Benchmark for batch transfer matching.
+
+Usage (from backend/):
+    python -m benchmarks.bench_transfers [--sizes 1000,10000,100000] [--legacy-max 5000]
+"""
+import argparse
+import time
+
+from core.dates import parse_date
+from core.transfers import match_batch_transfers
+from benchmarks.synthetic import synthetic_batch
+
+
+def legacy_match(transactions):
+    """The original nested-loop scan, kept only for comparison."""
+    linked = {}
+    for i, txn in enumerate(transactions):
+        if not txn.get("potential_transfer"):
+            continue
+        txn_date = parse_date(txn.get("date"))
+        if not txn_date:
+            continue
+        for j, candidate in enumerate(transactions):
+            if i == j:
+                continue
+            cand_date = parse_date(candidate.get("date"))
+            if not cand_date:
+                continue
+            if (candidate.get("amount") == -txn["amount"] and
+                abs((cand_date - txn_date).days) <= 5 and
+                candidate.get("account_name") != txn.get("account_name")):
+                linked[i] = j
+                linked[j] = i
+                break
+    return linked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--legacy-max", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'pairs':>7} {'indexed (ms)':>13} {'legacy (ms)':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        batch = synthetic_batch(size)
+
+        start = time.perf_counter()
+        pairs = match_batch_transfers(batch)
+        indexed_ms = (time.perf_counter() - start) * 1000
+
+        legacy = "-"
+        if size <= args.legacy_max:
+            start = time.perf_counter()
+            legacy_match(batch)
+            legacy = f"{(time.perf_counter() - start) * 1000:.1f}"
+
+        print(f"{len(batch):>8} {len(pairs):>7} {indexed_ms:>13.1f} {legacy:>12}")
+
+
+if __name__ == "__main__":
+    main()
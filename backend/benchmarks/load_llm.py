@@ -0,0 +1,52 @@
+"""
+Load test for the async LLM providers against a local stub Ollama server.
+
+The stub answers /api/generate after a fixed delay. With non-blocking
+providers, N concurrent calls should finish in roughly the time of one.
+
+Usage (from backend/):
+    python -m benchmarks.load_llm [--concurrency 1,10,50] [--delay 0.5]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.stub_llm import start_stub_server
+
+
+async def run(concurrency: int, base_url: str) -> float:
+    from core.llm import LocalLLMProvider
+
+    llm = LocalLLMProvider(base_url=base_url)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(llm.generate_content(f"chat {i}") for i in range(concurrency)))
+        return time.perf_counter() - start
+    finally:
+        await llm.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--delay", type=float, default=0.5, help="stub response time in seconds")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    # Let the pool open as many connections as the largest level needs
+    os.environ.setdefault("LLM_CONCURRENCY", str(max(levels)))
+
+    server = start_stub_server(args.delay)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{'concurrent':>10} {'wall (s)':>9} {'x single call':>14}")
+    for level in levels:
+        elapsed = asyncio.run(run(level, base_url))
+        print(f"{level:>10} {elapsed:>9.2f} {elapsed / args.delay:>14.2f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
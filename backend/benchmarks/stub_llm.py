@@ -0,0 +1,57 @@
+"""
+Local stand-in for the Ollama HTTP API, used by the LLM benchmarks.
+
+POST /api/generate answers after `delay` seconds. With "stream": true it
+sends `tokens` NDJSON lines instead, `token_delay` seconds apart, the way
+Ollama does.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def start_stub_server(delay: float = 0.5, tokens: int = 20, token_delay: float = 0.05) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so client pooling is exercised
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if payload.get("stream"):
+                self._stream()
+                return
+            # A non-streaming call costs as much as the whole streamed answer
+            time.sleep(delay)
+            body = json.dumps({"response": "stub answer", "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(tokens):
+                time.sleep(token_delay)
+                self._chunk(json.dumps({"response": f"tok{i} ", "done": False}) + "\n")
+            self._chunk(json.dumps({"response": "", "done": True}) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text: str):
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 256  # the default backlog of 5 drops connection bursts
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,52 @@
+"""
+Synthetic transaction batches for the benchmarks, built from the
+data/generate_data.py generators and flattened into the Transaction schema.
+"""
+import os
+import sys
+from datetime import date, timedelta
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data"))
+
+import generate_data  # noqa: E402
+
+TRANSFER_KEYWORDS = ("TRANSFER", "EFT", "IRA", "CONTRIBUTION")
+
+
+def _row(d, description, amount, account_name) -> Dict[str, Any]:
+    return {
+        "date": d.isoformat(),
+        "description": description,
+        "amount": float(amount),
+        "type": "income" if amount > 0 else "expense",
+        "category": "Other",
+        "account_name": account_name,
+        "is_transfer": False,
+        "potential_transfer": any(k in description.upper() for k in TRANSFER_KEYWORDS),
+        "linked_tx_id": None,
+    }
+
+
+def account_set(start_date: date, end_date: date, suffix: str = "") -> List[Dict[str, Any]]:
+    rows = []
+    for r in generate_data.generate_boa(start_date, end_date).itertuples(index=False):
+        rows.append(_row(r.Date, r.Description, r.Amount, f"BoA Checking{suffix}"))
+    for r in generate_data.generate_baxter(start_date, end_date).itertuples(index=False):
+        rows.append(_row(r[0], r[1], float(r[3]) - float(r[2]), f"Baxter CU{suffix}"))
+    for r in generate_data.generate_fidelity_individual(start_date, end_date).itertuples(index=False):
+        rows.append(_row(r.Date, r.Description, r.Amount, f"Fidelity Individual{suffix}"))
+    for r in generate_data.generate_fidelity_roth(start_date, end_date).itertuples(index=False):
+        rows.append(_row(r[0], r[4], r[7], f"Fidelity Roth IRA{suffix}"))
+    return rows
+
+
+def synthetic_batch(n_rows: int, start_date: date = date(2020, 1, 1)) -> List[Dict[str, Any]]:
+    """Roughly n_rows transactions: one year per account set, as many sets as needed."""
+    rows: List[Dict[str, Any]] = []
+    end_date = start_date + timedelta(days=364)
+    copy = 0
+    while len(rows) < n_rows:
+        rows.extend(account_set(start_date, end_date, suffix=f" #{copy}" if copy else ""))
+        copy += 1
+    return rows[:n_rows]
@@ -0,0 +1,59 @@
+"""
+Time-to-first-byte for streamed vs. buffered chat answers, measured against
+the local stub Ollama server.
+
+Usage (from backend/):
+    python -m benchmarks.ttfb_chat [--tokens 40] [--token-delay 0.05] [--runs 5]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.stub_llm import start_stub_server
+
+
+async def measure(base_url: str, runs: int):
+    from core.llm import LocalLLMProvider
+
+    llm = LocalLLMProvider(base_url=base_url)
+    buffered, first_token, streamed_total = [], [], []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            await llm.generate_content("question")
+            buffered.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            first = None
+            async for _token in llm.stream_content("question"):
+                if first is None:
+                    first = time.perf_counter() - start
+            first_token.append(first)
+            streamed_total.append(time.perf_counter() - start)
+    finally:
+        await llm.aclose()
+    return buffered, first_token, streamed_total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    server = start_stub_server(delay=args.tokens * args.token_delay, tokens=args.tokens,
+                               token_delay=args.token_delay)
+    buffered, first_token, streamed_total = asyncio.run(
+        measure(f"http://127.0.0.1:{server.server_port}", args.runs)
+    )
+    server.shutdown()
+
+    print(f"buffered  time to first byte: {statistics.median(buffered) * 1000:8.1f} ms")
+    print(f"streamed  time to first byte: {statistics.median(first_token) * 1000:8.1f} ms")
+    print(f"streamed  total:              {statistics.median(streamed_total) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Aggregation pipelines behind the /analytics endpoints.
+
+Everything is grouped inside Mongo ($group over $dateTrunc months), so a
+response is O(months x groups) regardless of how many transactions exist.
+Linked transfers are excluded: moving money between accounts is neither
+spending nor income. Results are returned columnar -- one shared `months`
+axis plus parallel arrays -- which keeps multi-year histories compact.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+GROUP_FIELDS = {
+    "category": "$category",
+    "account": "$account_name",
+    "merchant": {"$ifNull": ["$merchant", "$description"]},
+}
+
+KINDS = ("expense", "income", "all")
+
+
+def base_match(start: Optional[datetime], end: Optional[datetime], kind: str = "all") -> Dict[str, Any]:
+    # $dateTrunc needs real dates; rows not yet migrated are skipped
+    date_filter: Dict[str, Any] = {"$type": "date"}
+    if start:
+        date_filter["$gte"] = start
+    if end:
+        date_filter["$lte"] = end
+    match: Dict[str, Any] = {"date": date_filter, "is_transfer": {"$ne": True}}
+    if kind == "expense":
+        match["amount"] = {"$lt": 0}
+    elif kind == "income":
+        match["amount"] = {"$gt": 0}
+    return match
+
+
+def _month():
+    return {"$dateTrunc": {"date": "$date", "unit": "month"}}
+
+
+def _total(kind: str):
+    # Spending and income are reported as positive magnitudes; "all" stays signed
+    return {"$sum": "$amount" if kind == "all" else {"$abs": "$amount"}}
+
+
+def monthly_totals_pipeline(group_by: str, kind: str,
+                            start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": base_match(start, end, kind)},
+        {"$group": {
+            "_id": {"month": _month(), "key": GROUP_FIELDS[group_by]},
+            "total": _total(kind),
+        }},
+        {"$sort": {"_id.month": 1}},
+    ]
+
+
+def cash_flow_pipeline(start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": base_match(start, end)},
+        {"$group": {
+            "_id": _month(),
+            "income": {"$sum": {"$cond": [{"$gt": ["$amount", 0]}, "$amount", 0]}},
+            "expenses": {"$sum": {"$cond": [{"$lt": ["$amount", 0]}, {"$abs": "$amount"}, 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def top_vendors_pipeline(limit: int, start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": base_match(start, end, "expense")},
+        {"$group": {
+            "_id": GROUP_FIELDS["merchant"],
+            "total": {"$sum": {"$abs": "$amount"}},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"total": -1}},
+        {"$limit": limit},
+    ]
+
+
+def _month_label(value) -> str:
+    return value.strftime("%Y-%m") if isinstance(value, datetime) else str(value)
+
+
+def pivot_monthly(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """{month, key, total} rows -> {"months": [...], "series": {key: [...]}} with zeros filled."""
+    months = sorted({_month_label(r["_id"]["month"]) for r in rows})
+    position = {m: i for i, m in enumerate(months)}
+    series: Dict[str, List[float]] = {}
+    for r in rows:
+        key = r["_id"]["key"] if r["_id"]["key"] is not None else "Unknown"
+        values = series.setdefault(str(key), [0.0] * len(months))
+        values[position[_month_label(r["_id"]["month"])]] += round(r["total"], 2)
+    return {"months": months, "series": series}
+
+
+def columnar_cash_flow(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    income = [round(float(r["income"]), 2) for r in rows]
+    expenses = [round(float(r["expenses"]), 2) for r in rows]
+    return {
+        "months": [_month_label(r["_id"]) for r in rows],
+        "income": income,
+        "expenses": expenses,
+        "net": [round(i - e, 2) for i, e in zip(income, expenses)],
+    }
+
+
+def columnar_vendors(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "merchant": [r["_id"] if r["_id"] is not None else "Unknown" for r in rows],
+        "total": [round(r["total"], 2) for r in rows],
+        "count": [r["count"] for r in rows],
+    }
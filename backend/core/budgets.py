@@ -0,0 +1,219 @@
+"""
+Monthly category budgets with incrementally maintained spending totals.
+
+Spending per (category, month) lives in a materialized collection keyed by
+{category, month}. Every write path -- ingest, recategorization and its
+undo, transfer link/unlink, delete -- describes its effect as a SpendDelta
+(rows removed with sign -1, rows added with sign +1) and the tracker folds
+it in with one $inc bulk_write. Budget status therefore reads one document
+per budgeted category, never the transactions themselves.
+
+Spending follows the analytics definition: negative amounts on rows that
+are not linked transfers, counted in integer cents so repeated $inc never
+drifts. When a total crosses one of its budget's thresholds an alert event
+is stored once per (category, month, threshold).
+
+A full rebuild writes a staging collection and renames it over the live
+totals, so readers see either the old totals or the new ones, never a
+half-rebuilt set.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+DEFAULT_THRESHOLDS = (0.75, 1.0)
+
+TOTALS_INDEX = [("_id.month", 1)]
+
+# Fields a SpendDelta needs from a transaction document
+SPEND_FIELDS = {"date": 1, "amount": 1, "category": 1, "is_transfer": 1}
+
+
+def month_key(date) -> Optional[str]:
+    return date.strftime("%Y-%m") if isinstance(date, datetime) else None
+
+
+def spend_of(txn: Dict[str, Any]) -> Optional[Tuple[str, str, int]]:
+    """(category, month, cents spent) for a spending row, else None."""
+    month = month_key(txn.get("date"))
+    if month is None or txn.get("is_transfer"):
+        return None
+    try:
+        cents = int(round(float(txn.get("amount")) * 100))
+    except (TypeError, ValueError):
+        return None
+    if cents >= 0:
+        return None
+    return txn.get("category") or "Other", month, -cents
+
+
+class SpendDelta:
+    """Net change to the (category, month) totals from a set of row edits."""
+
+    def __init__(self):
+        self.changes: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+
+    def add(self, txn: Dict[str, Any], sign: int = 1):
+        spend = spend_of(txn)
+        if spend is None:
+            return
+        category, month, cents = spend
+        change = self.changes[(category, month)]
+        change[0] += sign * cents
+        change[1] += sign
+
+    def replace(self, before: Dict[str, Any], changes: Dict[str, Any]):
+        """A row edited with $set `changes`."""
+        self.add(before, -1)
+        self.add({**before, **changes}, 1)
+
+    def __bool__(self):
+        return any(cents or count for cents, count in self.changes.values())
+
+
+class BudgetTracker:
+    def __init__(self, totals, budgets, alerts):
+        self.totals = totals
+        self.budgets = budgets
+        self.alerts = alerts
+
+    async def ensure_indexes(self):
+        await self.totals.create_index(TOTALS_INDEX)
+        await self.alerts.create_index([("category", 1), ("month", 1), ("threshold", 1)], unique=True)
+        await self.alerts.create_index([("created_at", -1)])
+
+    async def rebuild(self, transactions):
+        """Recomputes every total from scratch (first start, or after a bulk delete)."""
+        pipeline = [
+            {"$match": {"date": {"$type": "date"}, "is_transfer": {"$ne": True}, "amount": {"$lt": 0}}},
+            {"$group": {
+                "_id": {
+                    "category": {"$ifNull": ["$category", "Other"]},
+                    "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}},
+                },
+                "spent": {"$sum": {"$abs": "$amount"}},
+                "count": {"$sum": 1},
+            }},
+        ]
+        rows = await transactions.aggregate(pipeline).to_list(length=None)
+        for row in rows:
+            row["spent_cents"] = int(round(row.pop("spent") * 100))
+
+        database = self.totals.database
+        # Unique per rebuild, so concurrent rebuilds never share a staging collection
+        staging = database[f"{self.totals.name}_rebuild_{ObjectId()}"]
+        await database.create_collection(staging.name)
+        try:
+            if rows:
+                await staging.insert_many(rows)
+            await staging.create_index(TOTALS_INDEX)
+            await staging.rename(self.totals.name, dropTarget=True)
+        except Exception:
+            await staging.drop()
+            raise
+
+    async def ensure_built(self, transactions):
+        if not await self.totals.find_one({}) and await transactions.find_one({}, {"_id": 1}):
+            await self.rebuild(transactions)
+
+    async def apply(self, delta: SpendDelta) -> List[Dict[str, Any]]:
+        """Folds a delta into the totals; returns any alerts it triggered."""
+        if not delta:
+            return []
+        ops = [
+            UpdateOne(
+                {"_id": {"category": category, "month": month}},
+                {"$inc": {"spent_cents": cents, "count": count}},
+                upsert=True,
+            )
+            for (category, month), (cents, count) in delta.changes.items()
+            if cents or count
+        ]
+        await self.totals.bulk_write(ops, ordered=False)
+        return await self.check([key for key, (cents, _) in delta.changes.items() if cents > 0])
+
+    async def check(self, keys: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Emits an alert for every threshold the given totals have reached."""
+        keys = list(keys)
+        if not keys:
+            return []
+        budgets = {
+            b["category"]: b
+            async for b in self.budgets.find({"category": {"$in": list({c for c, _ in keys})}})
+        }
+        if not budgets:
+            return []
+        ids = [{"category": c, "month": m} for c, m in keys if c in budgets]
+        totals = {
+            (t["_id"]["category"], t["_id"]["month"]): t["spent_cents"]
+            async for t in self.totals.find({"_id": {"$in": ids}})
+        }
+
+        emitted = []
+        for (category, month), spent_cents in totals.items():
+            budget = budgets[category]
+            limit_cents = int(round(budget["monthly_limit"] * 100))
+            for threshold in budget.get("thresholds") or DEFAULT_THRESHOLDS:
+                if limit_cents <= 0 or spent_cents < threshold * limit_cents:
+                    continue
+                alert = {
+                    "category": category,
+                    "month": month,
+                    "threshold": threshold,
+                    "spent": spent_cents / 100,
+                    "limit": budget["monthly_limit"],
+                    "created_at": datetime.utcnow(),
+                }
+                # The unique index makes each crossing fire once, even under concurrent writes
+                result = await self.alerts.update_one(
+                    {"category": category, "month": month, "threshold": threshold},
+                    {"$setOnInsert": alert},
+                    upsert=True,
+                )
+                if result.upserted_id is not None:
+                    print(f"Budget alert: {category} reached {threshold:.0%} of {budget['monthly_limit']} in {month}")
+                    emitted.append(alert)
+        return emitted
+
+    async def set_budget(self, category: str, monthly_limit: float,
+                         thresholds: Optional[List[float]] = None) -> Dict[str, Any]:
+        if monthly_limit <= 0:
+            raise ValueError("monthly_limit must be positive")
+        thresholds = sorted(set(thresholds or DEFAULT_THRESHOLDS))
+        if any(t <= 0 for t in thresholds):
+            raise ValueError("thresholds must be positive fractions of the limit")
+        budget = {"category": category, "monthly_limit": monthly_limit, "thresholds": thresholds}
+        await self.budgets.update_one(
+            {"category": category},
+            {"$set": {**budget, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        # A new or lowered limit may already be exceeded this month
+        await self.check([(category, month_key(datetime.now()))])
+        return budget
+
+    async def status(self, month: str) -> List[Dict[str, Any]]:
+        """One row per budget: O(categories) reads."""
+        budgets = await self.budgets.find({}, {"_id": 0}).sort("category", 1).to_list(length=None)
+        ids = [{"category": b["category"], "month": month} for b in budgets]
+        spent = {
+            t["_id"]["category"]: t["spent_cents"] / 100
+            async for t in self.totals.find({"_id": {"$in": ids}})
+        } if ids else {}
+        rows = []
+        for budget in budgets:
+            used = spent.get(budget["category"], 0.0)
+            limit = budget["monthly_limit"]
+            rows.append({
+                "category": budget["category"],
+                "month": month,
+                "limit": limit,
+                "spent": round(used, 2),
+                "remaining": round(limit - used, 2),
+                "percent": round(used / limit * 100, 1) if limit else None,
+                "thresholds": budget.get("thresholds") or list(DEFAULT_THRESHOLDS),
+            })
+        return rows
@@ -0,0 +1,120 @@
+"""
+Chunked, concurrent LLM extraction for statements that no fast-path parser
+recognizes.
+
+Statements are split on row boundaries into chunks that fit a token budget,
+each chunk repeats the header line, and consecutive chunks share a small
+overlap so a row cut at a boundary is always seen whole once. Chunks are
+extracted concurrently under a semaphore, then merged in order with the
+overlap de-duplicated.
+"""
+import asyncio
+import re
+from collections import Counter
+from typing import List, Dict, Any, Tuple, Optional, Callable, Awaitable
+
+from core.dates import parse_date
+from core.llm import LLMProvider
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting English/number text
+    return len(text) // 4 + 1
+
+
+def split_lines(text: str) -> Tuple[str, List[str]]:
+    """First non-blank line is treated as the header; the rest are rows."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return "", []
+    return lines[0], lines[1:]
+
+
+def chunk_rows(header: str, rows: List[str], token_budget: int, overlap: int = 1) -> List[str]:
+    """
+    Groups rows into chunks of at most token_budget tokens (header included).
+    A single row larger than the budget still gets a chunk of its own.
+    """
+    chunks: List[str] = []
+    header_tokens = estimate_tokens(header)
+    start = 0
+    while start < len(rows):
+        end = start
+        used = header_tokens
+        while end < len(rows):
+            cost = estimate_tokens(rows[end])
+            if end > start and used + cost > token_budget:
+                break
+            used += cost
+            end += 1
+        chunks.append("\n".join([header] + rows[start:end]))
+        if end >= len(rows):
+            break
+        # Step back so the next chunk starts with the last `overlap` rows
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def _record_key(record: Dict[str, Any]) -> tuple:
+    parsed = parse_date(record.get("date"))
+    try:
+        amount = round(float(record.get("amount")), 2)
+    except (TypeError, ValueError):
+        amount = record.get("amount")
+    description = re.sub(r"\s+", " ", str(record.get("description", ""))).strip().lower()
+    return (parsed or record.get("date"), amount, description)
+
+
+def merge_chunk_results(results: List[List[Dict[str, Any]]], overlap: int = 1) -> List[Dict[str, Any]]:
+    """
+    Concatenates per-chunk results in order. Only the rows a chunk shares with
+    its predecessor can be double-extracted, so a chunk's leading records are
+    dropped when they match the previous chunk's trailing ones; genuinely
+    repeated rows elsewhere are kept.
+    """
+    merged: List[Dict[str, Any]] = []
+    previous_tail: Counter = Counter()
+    for records in results:
+        head = Counter(_record_key(r) for r in records[:overlap])
+        shared = head & previous_tail
+        for record in records:
+            key = _record_key(record)
+            if shared[key] > 0:
+                shared[key] -= 1
+                continue
+            merged.append(record)
+        previous_tail = Counter(_record_key(r) for r in records[-overlap:]) if overlap else Counter()
+    return merged
+
+
+async def extract_chunked(
+    llm: LLMProvider,
+    text: str,
+    prompt_template: str,
+    token_budget: int,
+    concurrency: int,
+    overlap: int = 1,
+    on_chunk: Optional[Callable[[int, int], Awaitable[None]]] = None,
+) -> List[Dict[str, Any]]:
+    """on_chunk(done, total) is awaited as each chunk's extraction finishes."""
+    header, rows = split_lines(text)
+    if not rows:
+        return await llm.extract_data(text, prompt_template) if header else []
+
+    # Leave room for the prompt itself inside the model's budget
+    budget = max(token_budget - estimate_tokens(prompt_template), 1)
+    chunks = chunk_rows(header, rows, budget, overlap)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    done = 0
+
+    async def run(chunk: str) -> List[Dict[str, Any]]:
+        nonlocal done
+        async with semaphore:
+            result = await llm.extract_data(chunk, prompt_template) or []
+        done += 1
+        if on_chunk:
+            await on_chunk(done, len(chunks))
+        return result
+
+    results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+    return merge_chunk_results(list(results), overlap)
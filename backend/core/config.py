@@ -1,22 +1,210 @@
+"""
+Application settings, read from the environment once.
+
+On first use the process environment is snapshotted and merged over the
+.env files (backend/.env, then the repository root's), so real environment
+variables always win, and every value is parsed into one immutable Settings.
+ProviderRegistry calls reload_settings() when a .env file is edited; the
+files are read afresh and merged under the same snapshot, so the precedence
+is unchanged and a key deleted from a file reverts to its default. The .env
+files never modify os.environ. Config keeps the getter API the rest of the
+code uses.
+"""
 import os
-from dotenv import load_dotenv
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional
+
+from dotenv import dotenv_values
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Earlier files take precedence
+ENV_FILES = [
+    os.path.join(BACKEND_DIR, ".env"),
+    os.path.join(os.path.dirname(BACKEND_DIR), ".env"),
+]
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:
+    llm_type: str
+    gemini_api_key: Optional[str]
+    gemini_model: str
+    mongo_url: str
+    llm_chunk_tokens: int
+    llm_concurrency: int
+    local_llm_url: str
+    local_llm_model: str
+    llm_timeout: float
+    llm_max_retries: int
+    # Empty string disables the persistent tier
+    llm_cache_path: str
+    llm_cache_ttl: int
+    llm_cache_max_entries: int
+    llm_cache_memory_entries: int
+    chat_context_tokens: int
+    upload_workers: int
+    upload_queue_size: int
+    # Processes parsing batch imports
+    parse_workers: int
+    upload_chunk_rows: int
+    upload_spool_dir: str
+    # Server-Timing on every response; clients can also ask with X-Timing: 1
+    timing_headers: bool
+    # Memory for cached read responses; 0 turns the cache and ETags off
+    read_cache_mb: float
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str]) -> "Settings":
+        return cls(
+            llm_type=env.get("LLM_TYPE", "CLOUD").upper(),
+            gemini_api_key=env.get("GEMINI_API_KEY"),
+            gemini_model=env.get("GEMINI_MODEL", "gemini-1.5-flash"),
+            mongo_url=env.get("MONGO_URL", "mongodb://localhost:27017"),
+            llm_chunk_tokens=int(env.get("LLM_CHUNK_TOKENS", "4000")),
+            llm_concurrency=int(env.get("LLM_CONCURRENCY", "4")),
+            local_llm_url=env.get("LOCAL_LLM_URL", "http://localhost:11434"),
+            local_llm_model=env.get("LOCAL_LLM_MODEL", "llama2"),
+            llm_timeout=float(env.get("LLM_TIMEOUT_SECONDS", "120")),
+            llm_max_retries=int(env.get("LLM_MAX_RETRIES", "2")),
+            llm_cache_path=env.get("LLM_CACHE_PATH", os.path.join(BACKEND_DIR, "llm_cache.sqlite3")),
+            llm_cache_ttl=int(env.get("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600))),
+            llm_cache_max_entries=int(env.get("LLM_CACHE_MAX_ENTRIES", "10000")),
+            llm_cache_memory_entries=int(env.get("LLM_CACHE_MEMORY_ENTRIES", "256")),
+            chat_context_tokens=int(env.get("CHAT_CONTEXT_TOKENS", "1500")),
+            upload_workers=int(env.get("UPLOAD_WORKERS", "2")),
+            upload_queue_size=int(env.get("UPLOAD_QUEUE_SIZE", "100")),
+            parse_workers=int(env.get("PARSE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            upload_chunk_rows=int(env.get("UPLOAD_CHUNK_ROWS", "20000")),
+            upload_spool_dir=env.get("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "fintrack-uploads")),
+            timing_headers=_flag(env.get("TIMING_HEADERS", "false")),
+            read_cache_mb=float(env.get("READ_CACHE_MB", "32")),
+        )
+
+
+_settings: Optional[Settings] = None
+# The process environment as it was when settings were first read
+_process_env: Optional[Dict[str, str]] = None
+
+
+def read_env_files(paths: List[str] = ENV_FILES) -> Dict[str, str]:
+    """Values set in the .env files; earlier files take precedence."""
+    values: Dict[str, str] = {}
+    for path in reversed(paths):
+        if os.path.exists(path):
+            values.update({key: value for key, value in dotenv_values(path).items() if value is not None})
+    return values
+
+
+def _load(paths: List[str]) -> Settings:
+    global _settings, _process_env
+    if _process_env is None:
+        _process_env = dict(os.environ)
+    _settings = Settings.from_env({**read_env_files(paths), **_process_env})
+    return _settings
+
+
+def get_settings() -> Settings:
+    if _settings is None:
+        return _load(ENV_FILES)
+    return _settings
+
+
+def reload_settings(paths: List[str] = ENV_FILES) -> Settings:
+    """Re-reads the .env files after one was edited; the environment still wins."""
+    return _load(paths)
 
-# Ensure env vars are loaded
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env"))
 
 class Config:
     @staticmethod
     def get_llm_type() -> str:
-        return os.getenv("LLM_TYPE", "CLOUD").upper()
+        return get_settings().llm_type
 
     @staticmethod
     def get_gemini_api_key() -> str | None:
-        return os.getenv("GEMINI_API_KEY")
+        return get_settings().gemini_api_key
 
     @staticmethod
     def get_gemini_model() -> str:
-        return os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        return get_settings().gemini_model
 
     @staticmethod
     def get_mongo_url() -> str:
-        return os.getenv("MONGO_URL", "mongodb://localhost:27017")
+        return get_settings().mongo_url
+
+    @staticmethod
+    def get_llm_chunk_tokens() -> int:
+        return get_settings().llm_chunk_tokens
+
+    @staticmethod
+    def get_llm_concurrency() -> int:
+        return get_settings().llm_concurrency
+
+    @staticmethod
+    def get_local_llm_url() -> str:
+        return get_settings().local_llm_url
+
+    @staticmethod
+    def get_local_llm_model() -> str:
+        return get_settings().local_llm_model
+
+    @staticmethod
+    def get_llm_timeout() -> float:
+        return get_settings().llm_timeout
+
+    @staticmethod
+    def get_llm_max_retries() -> int:
+        return get_settings().llm_max_retries
+
+    @staticmethod
+    def get_llm_cache_path() -> str:
+        return get_settings().llm_cache_path
+
+    @staticmethod
+    def get_llm_cache_ttl() -> int:
+        return get_settings().llm_cache_ttl
+
+    @staticmethod
+    def get_llm_cache_max_entries() -> int:
+        return get_settings().llm_cache_max_entries
+
+    @staticmethod
+    def get_llm_cache_memory_entries() -> int:
+        return get_settings().llm_cache_memory_entries
+
+    @staticmethod
+    def get_chat_context_tokens() -> int:
+        return get_settings().chat_context_tokens
+
+    @staticmethod
+    def get_upload_workers() -> int:
+        return get_settings().upload_workers
+
+    @staticmethod
+    def get_upload_queue_size() -> int:
+        return get_settings().upload_queue_size
+
+    @staticmethod
+    def get_parse_workers() -> int:
+        return get_settings().parse_workers
+
+    @staticmethod
+    def get_upload_chunk_rows() -> int:
+        return get_settings().upload_chunk_rows
+
+    @staticmethod
+    def get_upload_spool_dir() -> str:
+        return get_settings().upload_spool_dir
+
+    @staticmethod
+    def get_timing_headers() -> bool:
+        return get_settings().timing_headers
+
+    @staticmethod
+    def get_read_cache_mb() -> float:
+        return get_settings().read_cache_mb
@@ -0,0 +1,42 @@
+from datetime import datetime, date
+from typing import Any, Dict, Optional
+
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d-%b-%Y", "%Y/%m/%d"]
+
+
+def parse_date(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str) and len(value) == 10 and value[4] == "-":
+        # ISO dates are by far the most common; skip the strptime chain
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def normalize_date(txn: Dict[str, Any]) -> Dict[str, Any]:
+    """Stores the date as a native datetime; unparseable values are kept as-is."""
+    parsed = parse_date(txn.get("date"))
+    if parsed is not None:
+        txn["date"] = parsed
+    return txn
+
+
+def serialize_transaction(txn: Dict[str, Any]) -> Dict[str, Any]:
+    """Makes a Mongo document JSON-friendly with the API's YYYY-MM-DD dates."""
+    if "_id" in txn:
+        txn["_id"] = str(txn["_id"])
+    if isinstance(txn.get("date"), datetime):
+        txn["date"] = txn["date"].strftime("%Y-%m-%d")
+    return txn
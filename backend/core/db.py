@@ -0,0 +1,38 @@
+from pymongo import ASCENDING, DESCENDING
+
+# Index set for the transactions collection. Range filters and the newest-first
+# listing use the (date, _id) index, which also gives keyset pagination a
+# total order; the compound ones serve filtered views and the bulk transfer
+# lookup (amount equality, then date range).
+TRANSACTION_INDEXES = [
+    [("date", DESCENDING), ("_id", DESCENDING)],
+    [("category", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+    [("account_name", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+    [("merchant", ASCENDING), ("date", DESCENDING)],
+    [("merchant_tokens", ASCENDING)],
+    [("amount", ASCENDING), ("date", ASCENDING), ("account_name", ASCENDING)],
+]
+
+
+async def ensure_indexes(collection):
+    for keys in TRANSACTION_INDEXES:
+        await collection.create_index(keys)
+    # Ingest upserts on the row fingerprint; sparse so rows stored before
+    # fingerprinting (no field yet) do not collide on null
+    await collection.create_index([("fingerprint", ASCENDING)], unique=True, sparse=True)
+    # Linked transfers carry a shared pair key; flows and the link audit read it
+    await collection.create_index([("transfer_pair", ASCENDING)], sparse=True)
+    # Bulk recategorization bookkeeping lives next to the transactions
+    await collection.database.recategorizations.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+    await collection.database.recategorization_undo.create_index([("plan_id", ASCENDING)])
+    # One rule per (kind, pattern); upserted whenever a correction is confirmed
+    await collection.database.category_rules.create_index([("kind", ASCENDING), ("pattern", ASCENDING)])
+
+
+async def supports_transactions(client) -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster."""
+    try:
+        hello = await client.admin.command("hello")
+    except Exception:
+        return False
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
@@ -0,0 +1,47 @@
+"""
+Streaming serializers for transaction exports.
+
+Rows are pulled from the Motor cursor batch by batch and encoded as they go,
+so memory stays flat no matter how many transactions are exported.
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, List
+
+from core.dates import serialize_transaction
+
+EXPORT_COLUMNS = [
+    "_id", "date", "description", "amount", "type", "category", "merchant",
+    "account_name", "is_transfer", "linked_tx_id",
+]
+
+# Rows per yielded chunk: large enough to amortize the write, small enough to stream
+ROWS_PER_CHUNK = 500
+
+
+async def ndjson_rows(cursor) -> AsyncIterator[str]:
+    lines: List[str] = []
+    async for doc in cursor:
+        lines.append(json.dumps(serialize_transaction(doc), default=str))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def csv_rows(cursor, columns: List[str] = EXPORT_COLUMNS) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    async for doc in cursor:
+        writer.writerow(serialize_transaction(doc))
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()
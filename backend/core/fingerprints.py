@@ -0,0 +1,127 @@
+"""
+Row fingerprints for idempotent ingest.
+
+A fingerprint hashes account, date, signed amount in cents, normalized
+description and the row's ordinal among identical rows in the same file.
+Overlapping statements (monthly plus year-to-date) therefore produce the
+same fingerprints for the rows they share, while two genuinely identical
+purchases on one day stay distinct (ordinal 0 and 1). A unique index on the
+field lets upserts skip rows that are already stored.
+
+Files ingested in chunks number their rows with an OrdinalCounter. Identical
+rows always share a date, so for a date-sorted file only the dates it has
+not yet moved past need counts.
+"""
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Fingerprints looked up per query when checking a batch against the database
+LOOKUP_BATCH_SIZE = 5000
+
+
+def _cents(amount) -> int:
+    try:
+        return int(round(float(amount) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _day(txn: Dict[str, Any]) -> str:
+    date = txn.get("date")
+    return date.strftime("%Y-%m-%d") if isinstance(date, datetime) else str(date or "")
+
+
+def row_identity(txn: Dict[str, Any]) -> str:
+    """Everything but the ordinal: the part two copies of a row share."""
+    description = " ".join(str(txn.get("description") or "").lower().split())
+    return "|".join((str(txn.get("account_name") or ""), _day(txn), str(_cents(txn.get("amount"))), description))
+
+
+def fingerprint(identity: str, ordinal: int) -> str:
+    return hashlib.sha1(f"{identity}|{ordinal}".encode("utf-8")).hexdigest()
+
+
+def fingerprint_batch(transactions: List[Dict[str, Any]]) -> List[str]:
+    """Sets txn["fingerprint"] on every row, numbering repeats in file order."""
+    seen: Dict[str, int] = {}
+    fingerprints = []
+    for txn in transactions:
+        identity = row_identity(txn)
+        ordinal = seen.get(identity, 0)
+        seen[identity] = ordinal + 1
+        txn["fingerprint"] = fingerprint(identity, ordinal)
+        fingerprints.append(txn["fingerprint"])
+    return fingerprints
+
+
+class OrderChanged(Exception):
+    """A chunk revisits a date an OrdinalCounter has already dropped."""
+
+
+class OrdinalCounter:
+    """
+    fingerprint_batch for a file that arrives in chunks: ordinals count
+    identical rows across the whole file, exactly as if it were one batch.
+
+    Counts are kept per date. While bounded, once the file's direction
+    (ascending or descending) is known, dates behind the last row seen are
+    dropped, so a sorted file of any length holds only a few dates of state.
+    A chunk with a row behind that mark raises OrderChanged before anything
+    is numbered; the caller then replays the earlier chunks into an
+    unbounded counter and continues with it.
+    """
+
+    def __init__(self, bounded: bool = True):
+        self.bounded = bounded
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.first: Optional[str] = None
+        self.direction = 0
+        # Dates behind this mark (in the file's direction) have been dropped
+        self.mark: Optional[str] = None
+
+    def _behind(self, day: str) -> bool:
+        return day < self.mark if self.direction > 0 else day > self.mark
+
+    def assign(self, transactions: List[Dict[str, Any]]) -> List[str]:
+        """Sets txn["fingerprint"] on every row of the next chunk."""
+        days = [_day(txn) for txn in transactions]
+        if self.mark is not None and any(self._behind(day) for day in days):
+            raise OrderChanged("rows revisit dates the counter has already dropped")
+
+        fingerprints = []
+        for txn, day in zip(transactions, days):
+            identity = row_identity(txn)
+            seen = self.counts.setdefault(day, {})
+            ordinal = seen.get(identity, 0)
+            seen[identity] = ordinal + 1
+            txn["fingerprint"] = fingerprint(identity, ordinal)
+            fingerprints.append(txn["fingerprint"])
+
+        if self.bounded and days:
+            self._drop_passed(days)
+        return fingerprints
+
+    def _drop_passed(self, days: List[str]):
+        if self.first is None:
+            self.first = days[0]
+        if not self.direction and days[-1] != self.first:
+            self.direction = 1 if days[-1] > self.first else -1
+        if not self.direction:
+            return
+        # The last row is the frontier; anything behind it is done with
+        self.mark = days[-1]
+        for day in [d for d in self.counts if self._behind(d)]:
+            del self.counts[day]
+
+
+async def existing_fingerprints(collection, fingerprints: Iterable[str]) -> Set[str]:
+    """Which of the given fingerprints are already stored (index-only lookups)."""
+    fingerprints = list(fingerprints)
+    found: Set[str] = set()
+    for start in range(0, len(fingerprints), LOOKUP_BATCH_SIZE):
+        chunk = fingerprints[start:start + LOOKUP_BATCH_SIZE]
+        cursor = collection.find({"fingerprint": {"$in": chunk}}, {"_id": 0, "fingerprint": 1})
+        async for doc in cursor:
+            found.add(doc["fingerprint"])
+    return found
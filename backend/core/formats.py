@@ -0,0 +1,184 @@
+"""
+Deterministic parsers for known bank export layouts.
+
+Each layout is fingerprinted by its header row. Recognized files are parsed
+with vectorized pandas straight into the Transaction schema, so the LLM is
+only needed for layouts we have never seen.
+
+Categories come from description keywords (CATEGORY_PATTERNS, named like the
+extraction prompt's), with the user's category rules still applied on top at
+ingest. A layout's account name is only a default: the same export layout is
+shared by many accounts, so uploads can name the account themselves. Rows
+without a usable date or amount are counted and reported, not stored.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Any, Optional, FrozenSet, Tuple
+
+import pandas as pd
+
+# Same keywords the extraction prompt uses to flag potential transfers
+TRANSFER_PATTERN = r"TRANSFER|ACCT|SAVINGS|IRA|INVESTMENT|EFT|CONTRIBUTION"
+
+# Checked in order, the first match wins; transfers take precedence over all
+CATEGORY_PATTERNS: List[Tuple[str, str]] = [
+    ("Salary", r"PAYROLL|SALARY|DIRECT DEP"),
+    ("Food", r"WHOLE FOODS|TRADER JOE|SAFEWAY|KROGER|GROCER|SUPERMARKET|STARBUCKS|COFFEE|RESTAURANT"
+             r"|DOORDASH|UBER EATS|GRUBHUB|MCDONALD|CHIPOTLE|PIZZA|CAFE"),
+    ("Transport", r"UBER|LYFT|SHELL|CHEVRON|EXXON|\bGAS\b|FUEL|PARKING|TRANSIT|AIRLINE"),
+    ("Utilities", r"ELECTRIC|\bWATER\b|INTERNET|COMCAST|VERIZON|AT&T|T-MOBILE|UTILIT"),
+    ("Housing", r"\bRENT\b|MORTGAGE"),
+    ("Shopping", r"AMAZON|TARGET|WALMART|COSTCO|BEST BUY"),
+    ("Entertainment", r"NETFLIX|SPOTIFY|HULU|CINEMA|THEATER"),
+    ("Health", r"PHARMACY|\bCVS\b|WALGREENS|DENTAL|MEDICAL|CLINIC"),
+    ("Investment", r"DIVIDEND|REINVEST|INTEREST|\bBOUGHT\b|\bSOLD\b"),
+]
+
+
+@dataclass(frozen=True)
+class BankFormat:
+    name: str
+    account_name: str
+    columns: FrozenSet[str]
+    # Returns a frame with date, description and signed amount columns
+    extract: Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.fillna("").astype(str).str.strip()
+
+
+def _money(series: pd.Series) -> pd.Series:
+    # Text columns are object dtype, or str under pandas 3
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.replace(r"[$,]", "", regex=True)
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _join(*parts: pd.Series) -> pd.Series:
+    joined = parts[0]
+    for part in parts[1:]:
+        joined = joined + " " + part
+    return joined.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def _boa(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": df["Date"],
+        "description": _text(df["Description"]),
+        "amount": _money(df["Amount"]),
+    })
+
+
+def _baxter(df: pd.DataFrame) -> pd.DataFrame:
+    # Debit/Credit are both unsigned; money out is the debit column
+    return pd.DataFrame({
+        "date": df["Posted Date"],
+        "description": _text(df["Transaction Details"]),
+        "amount": _money(df["Credit"]).fillna(0) - _money(df["Debit"]).fillna(0),
+    })
+
+
+def _fidelity_individual(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": df["Date"],
+        "description": _join(_text(df["Action"]), _text(df["Symbol"]), _text(df["Description"])),
+        "amount": _money(df["Amount"]),
+    })
+
+
+def _fidelity_roth(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": df["Run Date"],
+        "description": _join(_text(df["Action"]), _text(df["Symbol"]), _text(df["Security Description"])),
+        "amount": _money(df["Amount"]),
+    })
+
+
+FORMATS: List[BankFormat] = [
+    BankFormat("boa", "BoA Checking",
+               frozenset({"Date", "Description", "Amount"}), _boa),
+    BankFormat("baxter", "Baxter Credit Union",
+               frozenset({"Posted Date", "Transaction Details", "Debit", "Credit"}), _baxter),
+    BankFormat("fidelity_individual", "Fidelity Individual",
+               frozenset({"Date", "Action", "Symbol", "Description", "Amount"}), _fidelity_individual),
+    BankFormat("fidelity_roth", "Fidelity Roth IRA",
+               frozenset({"Run Date", "Account", "Action", "Symbol", "Security Description",
+                          "Quantity", "Price", "Amount"}), _fidelity_roth),
+]
+
+_BY_FINGERPRINT: Dict[FrozenSet[str], BankFormat] = {
+    frozenset(c.lower() for c in fmt.columns): fmt for fmt in FORMATS
+}
+
+
+def detect_format(columns) -> Optional[BankFormat]:
+    """Matches a header row (order and case insensitive) against the registry."""
+    fingerprint = frozenset(str(c).strip().lower() for c in columns)
+    return _BY_FINGERPRINT.get(fingerprint)
+
+
+def categorize(descriptions: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """(category, potential transfer flag) per description."""
+    upper = descriptions.str.upper()
+    potential = upper.str.contains(TRANSFER_PATTERN, regex=True)
+    categories = pd.Series("Other", index=descriptions.index)
+    # Applied last to first, so earlier patterns overwrite later ones
+    for category, pattern in reversed(CATEGORY_PATTERNS):
+        categories = categories.mask(upper.str.contains(pattern, regex=True), category)
+    return categories.where(~potential, "Transfer"), potential
+
+
+def to_transactions(frame: pd.DataFrame, account_name: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Vectorized conversion of date/description/amount columns into Transaction
+    dicts. Returns the transactions and the number of rows dropped for a
+    missing or unreadable date or amount.
+    """
+    dates = pd.to_datetime(frame["date"], errors="coerce", format="mixed")
+    keep = dates.notna() & frame["amount"].notna()
+    dropped = int((~keep).sum())
+    frame, dates = frame[keep], dates[keep]
+
+    amounts = frame["amount"].round(2)
+    descriptions = frame["description"]
+    categories, potential = categorize(descriptions)
+    types = pd.Series("expense", index=frame.index).where(amounts < 0, "income")
+
+    rows = [
+        {
+            "date": date,
+            "description": description,
+            "amount": amount,
+            "type": txn_type,
+            "category": category,
+            "merchant": description,
+            "account_name": account_name,
+            "is_transfer": False,
+            "potential_transfer": flag,
+            "linked_tx_id": None,
+        }
+        for date, description, amount, txn_type, category, flag in zip(
+            dates.dt.to_pydatetime().tolist(),
+            descriptions.tolist(),
+            amounts.tolist(),
+            types.tolist(),
+            categories.tolist(),
+            potential.tolist(),
+        )
+    ]
+    return rows, dropped
+
+
+def parse_known_format(df: pd.DataFrame, account_name: Optional[str] = None) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+    """
+    Parses every row of a recognized layout into (transactions, rows dropped),
+    labeled with account_name or else the layout's default account; returns
+    None for unknown layouts.
+    """
+    fmt = detect_format(df.columns)
+    if fmt is None:
+        return None
+    # Header matching is case-insensitive; map back to the registry spelling
+    canonical = {c.lower(): c for c in fmt.columns}
+    df = df.rename(columns={c: canonical[str(c).strip().lower()] for c in df.columns})
+    return to_transactions(fmt.extract(df), account_name or fmt.account_name)
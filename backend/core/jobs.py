@@ -0,0 +1,179 @@
+"""
+Background jobs for long-running requests (uploads).
+
+A request is recorded as a job document and answered immediately with its
+id; a fixed pool of asyncio workers drains an in-memory queue, so at most
+`workers` jobs run at once. Handlers report progress through JobProgress,
+which writes the current stage and counters to the job document that
+GET /jobs/{id} returns. Payloads (e.g. the path of a spooled upload) only
+live in the memory of the process that accepted the job, so such a job can
+never finish once that process is gone.
+
+Several server processes may share the jobs collection. Each stamps its
+jobs with its owner id and keeps a lease on that id (a heartbeat in
+job_owners); a job is only failed as interrupted once its owner's lease has
+expired, so one process starting up never touches another's work.
+"""
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobProgress:
+    def __init__(self, jobs, job_id: ObjectId):
+        self.jobs = jobs
+        self.job_id = job_id
+
+    async def update(self, stage: str, done: Optional[int] = None, total: Optional[int] = None):
+        fields: Dict[str, Any] = {"stage": stage, "updated_at": datetime.utcnow()}
+        if done is not None:
+            fields["progress.done"] = done
+        if total is not None:
+            fields["progress.total"] = total
+        await self.jobs.update_one({"_id": self.job_id}, {"$set": fields})
+
+
+Handler = Callable[[Dict[str, Any], JobProgress], Awaitable[Dict[str, Any]]]
+
+# An owner that has not renewed its lease for LEASE_SECONDS is considered gone
+HEARTBEAT_SECONDS = 30
+LEASE_SECONDS = 120
+
+
+def new_owner_id() -> str:
+    """Unique per process start; readable in the job documents."""
+    return f"{socket.gethostname()}-{os.getpid()}-{os.urandom(4).hex()}"
+
+
+class JobQueue:
+    def __init__(self, jobs, handler: Handler, workers: int = 2, max_pending: int = 100,
+                 owner: Optional[str] = None):
+        self.jobs = jobs
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.max_pending = max(max_pending, 1)
+        self.owner = owner or new_owner_id()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        # Slots claimed by submit() calls still inserting their job document
+        self.reserved = 0
+        self.tasks: List[asyncio.Task] = []
+
+    @property
+    def owners(self):
+        return self.jobs.database.job_owners
+
+    async def start(self):
+        # A fresh queue for the running loop, so the app can be started again
+        # (e.g. by tests) after an earlier loop has closed
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.reserved = 0
+        await self.heartbeat()
+        await self.recover()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._keep_lease()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        # Jobs that never started cannot run anywhere else
+        await self.jobs.update_many(
+            {"owner": self.owner, "status": "queued"},
+            {"$set": {"status": "failed", "error": "Interrupted by a server shutdown", "finished_at": datetime.utcnow()}},
+        )
+        await self.owners.delete_one({"_id": self.owner})
+
+    async def heartbeat(self):
+        await self.owners.update_one({"_id": self.owner}, {"$set": {"heartbeat_at": datetime.utcnow()}}, upsert=True)
+
+    async def live_owners(self) -> List[str]:
+        cutoff = datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)
+        return [doc["_id"] for doc in await self.owners.find({"heartbeat_at": {"$gte": cutoff}}, {"_id": 1}).to_list(length=None)]
+
+    async def recover(self) -> List[str]:
+        """
+        Fails the unfinished jobs of owners whose lease expired (or of no
+        owner, from before owners were recorded); returns the live owners.
+        """
+        live = await self.live_owners()
+        await self.jobs.update_many(
+            {"status": {"$in": ["queued", "running"]}, "owner": {"$nin": live}},
+            {"$set": {"status": "failed", "error": "Interrupted by a server restart", "finished_at": datetime.utcnow()}},
+        )
+        await self.owners.delete_many({"_id": {"$nin": live}})
+        return live
+
+    async def _keep_lease(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await self.heartbeat()
+                await self.recover()
+            except Exception as e:
+                print(f"Job lease renewal failed: {e}")
+
+    async def submit(self, kind: str, payload: Dict[str, Any], **fields) -> str:
+        # Claimed before the insert awaits, so concurrent submits cannot both
+        # take the last slot
+        if self.queue.qsize() + self.reserved >= self.max_pending:
+            raise QueueFull("Too many jobs waiting; try again shortly")
+        self.reserved += 1
+        try:
+            job = {
+                "kind": kind,
+                "status": "queued",
+                "stage": "queued",
+                "progress": {"done": 0, "total": None},
+                "owner": self.owner,
+                "created_at": datetime.utcnow(),
+                **fields,
+            }
+            result = await self.jobs.insert_one(job)
+            self.queue.put_nowait((result.inserted_id, payload))
+        finally:
+            self.reserved -= 1
+        return str(result.inserted_id)
+
+    async def _worker(self):
+        while True:
+            job_id, payload = await self.queue.get()
+            try:
+                await self._run(job_id, payload)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: ObjectId, payload: Dict[str, Any]):
+        await self.jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "running", "stage": "started", "started_at": datetime.utcnow()}},
+        )
+        try:
+            result = await self.handler(payload, JobProgress(self.jobs, job_id))
+        except asyncio.CancelledError:
+            await self.jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "error": "Cancelled", "finished_at": datetime.utcnow()}},
+            )
+            raise
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            await self.jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}},
+            )
+        else:
+            await self.jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "succeeded", "stage": "done", "result": result, "finished_at": datetime.utcnow()}},
+            )
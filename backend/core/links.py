@@ -0,0 +1,227 @@
+"""
+Transfer links as pairs.
+
+Both legs of a transfer carry the partner's id (linked_tx_id), a shared
+pair key ("<smaller id>:<larger id>", sparse-indexed) and the partner's
+account. Link and unlink requests are planned here as UpdateOne lists the
+caller applies in one bulk_write (inside a transaction when available), so
+many pairs change per round-trip and a relink also releases the old
+partner. Account-to-account flows read only the keyed outgoing legs.
+
+The audit groups every linked row by the pair key it implies in a single
+aggregation: a healthy pair is a group of two, and anything else is a
+dangling or one-sided link to clear, or a healthy pair whose stored key or
+counterparty is stale.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from core.budgets import SPEND_FIELDS, SpendDelta
+
+LINK_FIELDS = {**SPEND_FIELDS, "account_name": 1, "linked_tx_id": 1, "transfer_pair": 1, "counterparty_account": 1}
+
+UNLINK = {
+    "$set": {"is_transfer": False, "linked_tx_id": None},
+    "$unset": {"transfer_pair": "", "counterparty_account": ""},
+}
+
+
+def pair_key(a, b) -> str:
+    a, b = str(a), str(b)
+    return f"{a}:{b}" if a < b else f"{b}:{a}"
+
+
+def link_fields(txn_id, partner_id, partner_account: Optional[str]) -> Dict[str, Any]:
+    """The $set for one leg of a transfer."""
+    return {
+        "is_transfer": True,
+        "linked_tx_id": str(partner_id),
+        "transfer_pair": pair_key(txn_id, partner_id),
+        "counterparty_account": partner_account,
+    }
+
+
+def _object_ids(ids: Iterable[str]) -> List[ObjectId]:
+    ids = list(ids)
+    invalid = [i for i in ids if not ObjectId.is_valid(i)]
+    if invalid:
+        raise ValueError(f"Invalid id: {invalid[0]}")
+    return [ObjectId(i) for i in ids]
+
+
+async def _load(collection, ids: List[ObjectId]) -> Dict[str, Dict[str, Any]]:
+    docs = await collection.find({"_id": {"$in": ids}}, LINK_FIELDS).to_list(length=None)
+    return {str(doc["_id"]): doc for doc in docs}
+
+
+async def _released_partners(collection, docs: Dict[str, Dict[str, Any]], keep: Dict[str, str]):
+    """Old partners of `docs` that still point back at them and are not being relinked."""
+    old = {
+        doc["linked_tx_id"]: doc_id for doc_id, doc in docs.items()
+        if doc.get("linked_tx_id") and doc["linked_tx_id"] not in keep
+    }
+    valid = [ObjectId(i) for i in old if ObjectId.is_valid(i)]
+    if not valid:
+        return []
+    partners = await collection.find({"_id": {"$in": valid}}, LINK_FIELDS).to_list(length=None)
+    return [p for p in partners if p.get("linked_tx_id") == old[str(p["_id"])]]
+
+
+async def plan_links(collection, pairs: List[Tuple[str, str]]) -> Tuple[List[UpdateOne], SpendDelta]:
+    """
+    Writes linking every (a, b) pair; raises ValueError for malformed
+    requests and LookupError for ids that do not exist.
+    """
+    ids = [i for pair in pairs for i in pair]
+    if any(a == b for a, b in pairs):
+        raise ValueError("A transaction cannot be linked to itself")
+    if len(set(ids)) != len(ids):
+        raise ValueError("Each transaction can appear in only one pair")
+    docs = await _load(collection, _object_ids(ids))
+    missing = [i for i in ids if i not in docs]
+    if missing:
+        raise LookupError(f"Transaction not found: {missing[0]}")
+
+    partner_of = {}
+    for a, b in pairs:
+        partner_of[a], partner_of[b] = b, a
+
+    ops, delta = [], SpendDelta()
+    for doc_id, partner_id in partner_of.items():
+        doc = docs[doc_id]
+        ops.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": link_fields(doc_id, partner_id, docs[partner_id].get("account_name"))},
+        ))
+        delta.replace(doc, {"is_transfer": True})
+    for partner in await _released_partners(collection, docs, partner_of):
+        # Guarded so a concurrent relink of the old partner is left alone
+        ops.append(UpdateOne({"_id": partner["_id"], "linked_tx_id": partner["linked_tx_id"]}, UNLINK))
+        delta.replace(partner, {"is_transfer": False})
+    return ops, delta
+
+
+async def plan_unlinks(collection, tx_ids: List[str]) -> Tuple[List[UpdateOne], SpendDelta]:
+    """Writes unlinking every transaction and its partner; LookupError for unknown ids."""
+    docs = await _load(collection, _object_ids(tx_ids))
+    missing = [i for i in tx_ids if i not in docs]
+    if missing:
+        raise LookupError(f"Transaction not found: {missing[0]}")
+
+    ops, delta = [], SpendDelta()
+    for doc in docs.values():
+        ops.append(UpdateOne({"_id": doc["_id"]}, UNLINK))
+        delta.replace(doc, {"is_transfer": False})
+    for partner in await _released_partners(collection, docs, {}):
+        if str(partner["_id"]) in docs:
+            continue
+        ops.append(UpdateOne({"_id": partner["_id"], "linked_tx_id": partner["linked_tx_id"]}, UNLINK))
+        delta.replace(partner, {"is_transfer": False})
+    return ops, delta
+
+
+def audit_pipeline() -> List[Dict[str, Any]]:
+    """One pass over linked/flagged rows, grouped by the pair key each one implies."""
+    has_link = {"$and": [{"$ne": ["$linked_tx_id", None]}, {"$ne": ["$linked_tx_id", ""]}]}
+    return [
+        {"$match": {"$or": [{"linked_tx_id": {"$nin": [None, ""]}}, {"is_transfer": True}]}},
+        {"$project": {**LINK_FIELDS, "id": {"$toString": "$_id"}}},
+        {"$group": {
+            "_id": {"$cond": [
+                has_link,
+                {"$cond": [
+                    {"$lt": ["$id", "$linked_tx_id"]},
+                    {"$concat": ["$id", ":", "$linked_tx_id"]},
+                    {"$concat": ["$linked_tx_id", ":", "$id"]},
+                ]},
+                None,
+            ]},
+            # Only what the audit reads, so groups stay small; absent fields
+            # come through as null, which the audit treats the same way
+            "docs": {"$push": {field: {"$ifNull": [f"${field}", None]} for field in ("_id", "id", *LINK_FIELDS)}},
+        }},
+    ]
+
+
+async def audit_links(collection) -> Tuple[List[UpdateOne], SpendDelta, Dict[str, Any]]:
+    """
+    Finds broken links and plans their repair:
+      dangling  -- points at a transaction that no longer exists
+      one_sided -- the partner exists but points elsewhere (or nowhere)
+      flag_only -- is_transfer without any link
+      stale     -- a healthy pair missing its pair key/counterparty
+    """
+    ops: List[UpdateOne] = []
+    delta = SpendDelta()
+    broken: List[Dict[str, Any]] = []
+    flag_only = stale = 0
+
+    # The group holds every linked row at once; let it spill to disk
+    async for group in collection.aggregate(audit_pipeline(), allowDiskUse=True):
+        docs = group["docs"]
+        if group["_id"] is None:
+            for doc in docs:
+                flag_only += 1
+                ops.append(UpdateOne({"_id": doc["_id"]}, UNLINK))
+                delta.replace(doc, {"is_transfer": False})
+        elif len(docs) == 1:
+            broken.append(docs[0])
+        else:
+            for doc, partner in ((docs[0], docs[1]), (docs[1], docs[0])):
+                fields = link_fields(doc["_id"], partner["_id"], partner.get("account_name"))
+                if any(doc.get(k) != v for k, v in fields.items()):
+                    stale += 1
+                    ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+                    delta.replace(doc, {"is_transfer": True})
+
+    # Only the broken rows need their partner's existence checked
+    targets = [ObjectId(d["linked_tx_id"]) for d in broken if ObjectId.is_valid(d["linked_tx_id"])]
+    existing = {
+        str(d["_id"]) for d in await collection.find({"_id": {"$in": targets}}, {"_id": 1}).to_list(length=None)
+    } if targets else set()
+    dangling = 0
+    for doc in broken:
+        dangling += doc["linked_tx_id"] not in existing
+        ops.append(UpdateOne({"_id": doc["_id"], "linked_tx_id": doc["linked_tx_id"]}, UNLINK))
+        delta.replace(doc, {"is_transfer": False})
+
+    report = {
+        "dangling": dangling,
+        "one_sided": len(broken) - dangling,
+        "flag_only": flag_only,
+        "stale": stale,
+        "sample": [str(d["_id"]) for d in broken[:10]],
+    }
+    return ops, delta, report
+
+
+def flows_pipeline(start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Totals moved between account pairs, from the outgoing leg of each linked transfer."""
+    match: Dict[str, Any] = {"transfer_pair": {"$exists": True}, "amount": {"$lt": 0}}
+    if start or end:
+        match["date"] = {}
+        if start:
+            match["date"]["$gte"] = start
+        if end:
+            match["date"]["$lte"] = end
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"from": "$account_name", "to": "$counterparty_account"},
+            "total": {"$sum": {"$abs": "$amount"}},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"total": -1}},
+    ]
+
+
+def columnar_flows(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    return {
+        "from": [r["_id"]["from"] for r in rows],
+        "to": [r["_id"]["to"] for r in rows],
+        "total": [round(r["total"], 2) for r in rows],
+        "count": [r["count"] for r in rows],
+    }
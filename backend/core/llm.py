@@ -1,10 +1,11 @@
 import os
 import abc
 import json
-import requests
-import google.generativeai as genai
-from typing import List, Dict, Any
-from core.config import Config
+import time
+import asyncio
+import httpx
+from typing import List, Dict, Any, Tuple, Callable, AsyncIterator
+from core.config import ENV_FILES, Config, reload_settings
 
 class LLMProvider(abc.ABC):
     @abc.abstractmethod
@@ -19,22 +20,45 @@ class LLMProvider(abc.ABC):
     async def interpret_command(self, user_message: str) -> Dict[str, str] | None:
         pass
 
+    async def stream_content(self, prompt: str) -> AsyncIterator[str]:
+        """Yields the response as it is generated. Default: one chunk at the end."""
+        yield await self.generate_content(prompt)
+
+    async def aclose(self):
+        """Releases pooled connections; providers without any need not override."""
+        pass
+
+MISSING_GEMINI_KEY = "GEMINI_API_KEY not found in environment variables. Please check your .env file."
+
+def check_credentials():
+    """Raises ValueError if the configured provider cannot start, without creating it."""
+    if Config.get_llm_type() != "LOCAL" and not Config.get_gemini_api_key():
+        raise ValueError(MISSING_GEMINI_KEY)
+
 class GeminiProvider(LLMProvider):
     def __init__(self):
         api_key = Config.get_gemini_api_key()
         if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
+            raise ValueError(MISSING_GEMINI_KEY)
+        # The SDK takes most of a second to import; only Gemini users pay for it
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         model_name = Config.get_gemini_model()
         self.model = genai.GenerativeModel(model_name)
 
     async def generate_content(self, prompt: str) -> str:
-        response = self.model.generate_content(prompt)
+        response = await self.model.generate_content_async(prompt)
         return response.text
 
+    async def stream_content(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
     async def extract_data(self, raw_text: str, prompt_template: str) -> List[Dict[str, Any]]:
         full_prompt = f"{prompt_template}\n\nDATA:\n{raw_text}"
-        response = self.model.generate_content(full_prompt)
+        response = await self.model.generate_content_async(full_prompt)
         text = response.text
         # Clean up markdown code blocks if present
         if text.startswith("```json"):
@@ -46,7 +70,7 @@ class GeminiProvider(LLMProvider):
     async def interpret_command(self, user_message: str) -> Dict[str, str] | None:
         from prompts import COMMAND_INTERPRETER_PROMPT
         full_prompt = f"{COMMAND_INTERPRETER_PROMPT}\n\nUSER MESSAGE: {user_message}"
-        response = self.model.generate_content(full_prompt)
+        response = await self.model.generate_content_async(full_prompt)
         text = response.text.strip()
         
         if text.startswith("```json"):
@@ -62,10 +86,48 @@ class GeminiProvider(LLMProvider):
         except json.JSONDecodeError:
             return None
 
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Pooled client shared by every provider talking to the same endpoint, so
+    keep-alive connections are reused instead of a new handshake per call.
+    """
+    client = _http_clients.get(base_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(Config.get_llm_timeout(), connect=5.0),
+            limits=httpx.Limits(max_connections=Config.get_llm_concurrency() * 4,
+                                max_keepalive_connections=Config.get_llm_concurrency()),
+        )
+        _http_clients[base_url] = client
+    return client
+
+
 class LocalLLMProvider(LLMProvider):
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        self.base_url = base_url
-        self.model = "llama2" # Default, can be configurable
+    # Connection errors and these statuses are worth another attempt
+    RETRY_STATUSES = {429, 502, 503, 504}
+
+    def __init__(self, base_url: str | None = None):
+        self.base_url = base_url or Config.get_local_llm_url()
+        self.model = Config.get_local_llm_model()
+        self.max_retries = Config.get_llm_max_retries()
+        self.client = get_http_client(self.base_url)
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(path, json=payload)
+                if response.status_code not in self.RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == self.max_retries:
+                    raise
+            # Exponential backoff: 0.5s, 1s, 2s, ...
+            await asyncio.sleep(0.5 * 2 ** attempt)
 
     async def generate_content(self, prompt: str) -> str:
         payload = {
@@ -74,13 +136,38 @@ class LocalLLMProvider(LLMProvider):
             "stream": False
         }
         try:
-            response = requests.post(f"{self.base_url}/api/generate", json=payload)
-            response.raise_for_status()
+            response = await self._post("/api/generate", payload)
             return response.json().get("response", "")
         except Exception as e:
             print(f"Error calling Local LLM: {e}")
             return "Error generating response."
 
+    async def stream_content(self, prompt: str) -> AsyncIterator[str]:
+        # Ollama streams NDJSON: one {"response": "<token>", "done": false} per line
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True
+        }
+        try:
+            async with self.client.stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+        except Exception as e:
+            print(f"Error streaming from Local LLM: {e}")
+            yield "Error generating response."
+
+    async def aclose(self):
+        _http_clients.pop(self.base_url, None)
+        await self.client.aclose()
+
     async def extract_data(self, raw_text: str, prompt_template: str) -> List[Dict[str, Any]]:
         full_prompt = f"{prompt_template}\n\nDATA:\n{raw_text}\n\nRespond ONLY with the JSON list."
         response_text = await self.generate_content(full_prompt)
@@ -122,3 +209,65 @@ def get_llm_provider() -> LLMProvider:
     if llm_type == "LOCAL":
         return LocalLLMProvider()
     return GeminiProvider()
+
+
+def provider_key() -> Tuple[str, str]:
+    llm_type = Config.get_llm_type()
+    if llm_type == "LOCAL":
+        return llm_type, Config.get_local_llm_model()
+    return llm_type, Config.get_gemini_model()
+
+
+class ProviderRegistry:
+    """
+    Holds one provider per (LLM_TYPE, model) for the life of the app.
+
+    The env files are re-read when they change on disk (checked at most once a
+    second), so switching LLM_TYPE or the model takes effect on the next call
+    without a restart. Replaced providers are kept until shutdown rather than
+    closed immediately, since in-flight requests may still be using them.
+    """
+
+    def __init__(self, env_paths: List[str] = ENV_FILES, check_interval: float = 1.0,
+                 wrap: Callable[[LLMProvider, Tuple[str, str]], LLMProvider] | None = None):
+        self.env_paths = env_paths
+        # Optional decorator applied to each new provider (e.g. caching)
+        self.wrap = wrap
+        self.check_interval = check_interval
+        self.providers: Dict[Tuple[str, str], LLMProvider] = {}
+        self.current: Tuple[str, str] | None = None
+        self._env_mtimes = self._read_mtimes()
+        self._last_check = time.monotonic()
+
+    def _read_mtimes(self) -> Tuple[float, ...]:
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else 0.0 for p in self.env_paths)
+
+    def _reload_env_if_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        mtimes = self._read_mtimes()
+        if mtimes != self._env_mtimes:
+            self._env_mtimes = mtimes
+            reload_settings(self.env_paths)
+
+    def get(self) -> LLMProvider:
+        self._reload_env_if_changed()
+        key = provider_key()
+        provider = self.providers.get(key)
+        if provider is None:
+            provider = get_llm_provider()
+            if self.wrap is not None:
+                provider = self.wrap(provider, key)
+            self.providers[key] = provider
+            if self.current is not None and self.current != key:
+                print(f"LLM provider switched from {self.current} to {key}")
+        self.current = key
+        return provider
+
+    async def aclose(self):
+        for provider in self.providers.values():
+            await provider.aclose()
+        self.providers.clear()
+        self.current = None
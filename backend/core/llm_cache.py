@@ -0,0 +1,179 @@
+"""
+Content-addressed cache for LLM results.
+
+Keys are a SHA-256 over the operation, model, prompt template and input
+text, so the same statement chunk or chat command is only ever sent to the
+model once. Lookups go through an in-process LRU first, then a SQLite file
+that survives restarts and is bounded by TTL and entry count. Both tiers
+hold JSON, so every hit is a fresh copy the caller is free to mutate.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from core.llm import LLMProvider
+
+
+def cache_key(operation: str, model_name: str, prompt_template: str, text: str) -> str:
+    digest = hashlib.sha256()
+    for part in (operation, model_name, prompt_template, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SQLiteStore:
+    """Persistent tier. Calls block, so ResultCache runs them in a thread."""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self.max_entries:
+            # Least recently used entries go first
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN"
+                " (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    def __init__(self, memory_entries: int = 256, store: Optional[SQLiteStore] = None):
+        self.memory_entries = memory_entries
+        self.store = store
+        # JSON text: ingest annotates the rows it is handed (ids, links,
+        # dates), and none of that may leak into the next upload's hit
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return json.loads(self._memory[key])
+        if self.store is not None:
+            value = await asyncio.to_thread(self.store.get, key)
+            if value is not None:
+                self.stats["persistent_hits"] += 1
+                self._remember(key, json.dumps(value))
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, value: Any):
+        self._remember(key, json.dumps(value, default=str))
+        if self.store is not None:
+            await asyncio.to_thread(self.store.put, key, value)
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = sum(self.stats.values())
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        return {
+            **self.stats,
+            "memory_entries": len(self._memory),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+class CachedProvider(LLMProvider):
+    """
+    Wraps a provider so extraction and command interpretation are served from
+    the cache when possible. Empty results are never cached: the local
+    provider reports failures as [] / None, and those should be retried.
+    """
+
+    def __init__(self, provider: LLMProvider, cache: ResultCache, model_name: str):
+        self.provider = provider
+        self.cache = cache
+        self.model_name = model_name
+
+    async def generate_content(self, prompt: str) -> str:
+        return await self.provider.generate_content(prompt)
+
+    async def stream_content(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in self.provider.stream_content(prompt):
+            yield chunk
+
+    async def extract_data(self, raw_text: str, prompt_template: str) -> List[Dict[str, Any]]:
+        key = cache_key("extract_data", self.model_name, prompt_template, raw_text)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = await self.provider.extract_data(raw_text, prompt_template)
+        if result:
+            await self.cache.put(key, result)
+        return result
+
+    async def interpret_command(self, user_message: str) -> Dict[str, str] | None:
+        from prompts import COMMAND_INTERPRETER_PROMPT
+        normalized = " ".join(user_message.lower().split())
+        key = cache_key("interpret_command", self.model_name, COMMAND_INTERPRETER_PROMPT, normalized)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = await self.provider.interpret_command(user_message)
+        if result:
+            await self.cache.put(key, result)
+        return result
+
+    async def aclose(self):
+        await self.provider.aclose()
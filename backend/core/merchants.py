@@ -0,0 +1,52 @@
+"""
+Merchant normalization.
+
+Bank descriptions spell the same merchant many ways ("AMZN*Mktp US",
+"KROGER #443", "T.J. MAXX 0012"). Each transaction stores a normalized
+`merchant_key` plus its `merchant_tokens`; the token array carries a
+multikey index, so "starts with" lookups are index range scans instead of
+unanchored regexes over every description.
+"""
+import re
+from typing import Any, Dict, List
+
+_JOINERS = re.compile(r"[.']")
+_SEPARATORS = re.compile(r"[^a-z0-9&]+")
+_NOISE = re.compile(r"^(?:#?\d+|x+\d*)$")  # store numbers, card masks
+
+
+def merchant_key(text: str) -> str:
+    """Lowercase, punctuation-free, store numbers dropped: 'T.J. MAXX #0012' -> 'tj maxx'."""
+    text = _JOINERS.sub("", (text or "").lower())
+    tokens = [t for t in _SEPARATORS.split(text) if t and not _NOISE.match(t)]
+    return " ".join(tokens)
+
+
+def merchant_tokens(key: str) -> List[str]:
+    return key.split()
+
+
+def annotate_merchant(txn: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds merchant_key/merchant_tokens, derived from the description the user sees."""
+    key = merchant_key(txn.get("description") or txn.get("merchant") or "")
+    txn["merchant_key"] = key
+    txn["merchant_tokens"] = merchant_tokens(key)
+    return txn
+
+
+def merchant_query(keyword: str) -> Dict[str, Any] | None:
+    """
+    Filter for transactions whose merchant key contains the keyword as a
+    word-prefix phrase. The first token drives the index; the phrase check
+    on merchant_key only runs over those candidates. User input is
+    normalized the same way as stored keys, so regex metacharacters such as
+    'AMZN*' or 'T.J.' are never interpreted.
+    """
+    key = merchant_key(keyword)
+    if not key:
+        return None
+    tokens = key.split()
+    query: Dict[str, Any] = {"merchant_tokens": {"$regex": f"^{re.escape(tokens[0])}"}}
+    if len(tokens) > 1:
+        query["merchant_key"] = {"$regex": f"(?:^| ){re.escape(key)}"}
+    return query
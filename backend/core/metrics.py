@@ -0,0 +1,291 @@
+"""
+Request-level instrumentation, exposed in the Prometheus text format.
+
+- MetricsMiddleware times every request by route and status and, when asked,
+  returns a Server-Timing header with that request's stage timings and Mongo
+  command count.
+- stage(name) times a block (parse, LLM call, linking, DB writes). It feeds
+  a histogram and, inside a request, that request's Server-Timing entries;
+  background jobs only feed the histogram.
+- MongoCommandCounter is a pymongo command listener. Motor runs commands on
+  its executor with the caller's context copied, so each command is counted
+  against the request that issued it.
+- InstrumentedProvider wraps an LLM provider and records latency, prompt and
+  response sizes and token estimates per provider and operation.
+
+The registry is in-process and dependency-free. Values reset on restart,
+and with several workers each process reports its own.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from core.chunking import estimate_tokens
+from core.llm import LLMProvider
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts, +Inf included last), sum
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            counts, total = self.values.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket = _format_labels(self.labels, labels, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+HTTP_REQUESTS = Counter("fintrack_http_requests_total", "HTTP requests", ("method", "route", "status"))
+HTTP_SECONDS = Histogram("fintrack_http_request_seconds", "HTTP request latency", ("method", "route"))
+STAGE_SECONDS = Histogram("fintrack_stage_seconds", "Time spent per processing stage", ("stage",))
+MONGO_COMMANDS = Counter("fintrack_mongo_commands_total", "Mongo commands", ("command", "outcome"))
+MONGO_SECONDS = Histogram("fintrack_mongo_command_seconds", "Mongo command latency", ("command",))
+MONGO_PER_REQUEST = Histogram(
+    "fintrack_mongo_commands_per_request", "Mongo commands issued per HTTP request", ("route",), COUNT_BUCKETS
+)
+LLM_CALLS = Counter("fintrack_llm_calls_total", "LLM provider calls", ("provider", "operation", "outcome"))
+LLM_SECONDS = Histogram(
+    "fintrack_llm_call_seconds", "LLM provider call latency", ("provider", "operation"),
+    (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+LLM_PROMPT_CHARS = Counter("fintrack_llm_prompt_chars_total", "Characters sent to the LLM", ("provider", "operation"))
+LLM_RESPONSE_CHARS = Counter("fintrack_llm_response_chars_total", "Characters received from the LLM", ("provider", "operation"))
+LLM_PROMPT_TOKENS = Counter("fintrack_llm_prompt_tokens_total", "Estimated prompt tokens", ("provider", "operation"))
+LLM_RESPONSE_TOKENS = Counter("fintrack_llm_response_tokens_total", "Estimated response tokens", ("provider", "operation"))
+
+METRICS = [
+    HTTP_REQUESTS, HTTP_SECONDS, STAGE_SECONDS,
+    MONGO_COMMANDS, MONGO_SECONDS, MONGO_PER_REQUEST,
+    LLM_CALLS, LLM_SECONDS, LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS, LLM_PROMPT_TOKENS, LLM_RESPONSE_TOKENS,
+]
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    """What one request spent, for its Server-Timing header."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages.append((name, seconds))
+
+    def add_mongo(self, seconds: float):
+        # Called from Motor's executor threads
+        with self._lock:
+            self.mongo_commands += 1
+            self.mongo_seconds += seconds
+
+    def server_timing(self, total: float) -> str:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages]
+        entries.append(f'mongo;dur={self.mongo_seconds * 1000:.1f};desc="{self.mongo_commands} commands"')
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add_stage(name, elapsed)
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMANDS.inc(event.command_name, outcome)
+        MONGO_SECONDS.observe(seconds, event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add_mongo(seconds)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI so streaming responses pass through untouched. The Server-Timing
+    header is added when `timing_headers` is on or the client sends
+    `X-Timing: 1`. It can only cover work finished before the response starts,
+    so a streamed body's own time shows up in the histograms only.
+    """
+
+    def __init__(self, app, timing_headers: bool = False):
+        self.app = app
+        self.timing_headers = timing_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+        wants_timing = self.timing_headers or (b"x-timing", b"1") in scope.get("headers", [])
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_timing:
+                    header = stats.server_timing(time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            # Label by route template, never the raw path, to keep cardinality bounded
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], path, str(status))
+            HTTP_SECONDS.observe(time.perf_counter() - start, scope["method"], path)
+            MONGO_PER_REQUEST.observe(stats.mongo_commands, path)
+
+
+class InstrumentedProvider(LLMProvider):
+    """Records every call that reaches the model (sits below the result cache)."""
+
+    def __init__(self, provider: LLMProvider, name: str):
+        self.provider = provider
+        self.name = name
+
+    def _record(self, operation: str, prompt: str, response: str, seconds: float, outcome: str):
+        LLM_CALLS.inc(self.name, operation, outcome)
+        LLM_SECONDS.observe(seconds, self.name, operation)
+        LLM_PROMPT_CHARS.inc(self.name, operation, amount=len(prompt))
+        LLM_PROMPT_TOKENS.inc(self.name, operation, amount=estimate_tokens(prompt))
+        if response:
+            LLM_RESPONSE_CHARS.inc(self.name, operation, amount=len(response))
+            LLM_RESPONSE_TOKENS.inc(self.name, operation, amount=estimate_tokens(response))
+        stats = current_request.get()
+        if stats is not None:
+            stats.add_stage(f"llm-{operation}", seconds)
+
+    async def _call(self, operation: str, prompt: str, call):
+        start = time.perf_counter()
+        try:
+            result = await call
+        except Exception:
+            self._record(operation, prompt, "", time.perf_counter() - start, "error")
+            raise
+        # Structured results are sized as the JSON the model would have sent
+        response = result if isinstance(result, str) else json.dumps(result, default=str) if result else ""
+        self._record(operation, prompt, response, time.perf_counter() - start, "ok")
+        return result
+
+    async def generate_content(self, prompt: str) -> str:
+        return await self._call("generate", prompt, self.provider.generate_content(prompt))
+
+    async def stream_content(self, prompt: str) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        outcome = "error"
+        parts: List[str] = []
+        try:
+            async for chunk in self.provider.stream_content(prompt):
+                parts.append(chunk)
+                yield chunk
+            outcome = "ok"
+        finally:
+            self._record("stream", prompt, "".join(parts), time.perf_counter() - start, outcome)
+
+    async def extract_data(self, raw_text: str, prompt_template: str) -> List[Dict[str, Any]]:
+        prompt = f"{prompt_template}\n\nDATA:\n{raw_text}"
+        return await self._call("extract", prompt, self.provider.extract_data(raw_text, prompt_template))
+
+    async def interpret_command(self, user_message: str) -> Dict[str, str] | None:
+        from prompts import COMMAND_INTERPRETER_PROMPT
+        prompt = f"{COMMAND_INTERPRETER_PROMPT}\n\nUSER MESSAGE: {user_message}"
+        return await self._call("interpret", prompt, self.provider.interpret_command(user_message))
+
+    async def aclose(self):
+        await self.provider.aclose()
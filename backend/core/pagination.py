@@ -0,0 +1,88 @@
+"""
+Keyset pagination for transaction listings.
+
+Pages are ordered by (date desc, _id desc). The cursor is the last row's
+(date, _id) pair, so fetching page N costs the same as page 1 and is
+served by the (date, _id) index instead of skip/offset scans.
+
+Rows that migrate_dates.py has not converted yet keep a string date. BSON
+sorts every datetime above every string (and strings above numbers, numbers
+above null/missing), while $lt only compares values of the same type, so a
+cursor also admits every row whose date has a type sorting below its own.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+SORT = [("date", -1), ("_id", -1)]
+
+# Date types we store, highest first in BSON sort order; null/missing come last
+DATE_TYPES = ("date", "string", "number")
+
+# Fields a client may request through ?fields=
+TRANSACTION_FIELDS = {
+    "date", "description", "amount", "type", "category", "merchant",
+    "account_name", "is_transfer", "potential_transfer", "linked_tx_id",
+}
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    value = doc.get("date")
+    payload = {
+        "d": value.isoformat() if isinstance(value, datetime) else value,
+        "t": "dt" if isinstance(value, datetime) else "raw",
+        "i": str(doc["_id"]),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Raises ValueError on anything that is not a cursor we issued."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        date = datetime.fromisoformat(payload["d"]) if payload["t"] == "dt" else payload["d"]
+        return {"date": date, "_id": ObjectId(payload["i"])}
+    except (KeyError, TypeError, ValueError, InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _date_type(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return "number"
+    return None
+
+
+def after_cursor(query: Dict[str, Any], cursor: Dict[str, Any]) -> Dict[str, Any]:
+    """Restricts a filter to rows strictly after the cursor in SORT order."""
+    date = cursor["date"]
+    branches = [{"date": date, "_id": {"$lt": cursor["_id"]}}]
+    kind = _date_type(date)
+    if kind is not None:
+        branches.insert(0, {"date": {"$lt": date}})
+        branches.extend({"date": {"$type": lower}} for lower in DATE_TYPES[DATE_TYPES.index(kind) + 1:])
+        # Matches null and missing dates alike
+        branches.append({"date": None})
+    keyset = {"$or": branches}
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, int]]:
+    """Comma-separated field list -> projection. date and _id are always kept for the cursor."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in TRANSACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    projection = {f: 1 for f in requested}
+    projection["date"] = 1
+    return projection
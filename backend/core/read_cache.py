@@ -0,0 +1,123 @@
+"""
+In-memory cache for read endpoints, with ETags.
+
+Every cached response depends on one or more scopes ("transactions",
+"budgets"), each with a version counter. Code that writes a scope runs
+inside mutation(scope), which bumps the version when the write starts and
+again when it ends, so nothing read before or during a write is served after
+it. Entries are keyed by endpoint and resolved parameters (defaults applied,
+dates parsed), so equivalent URLs share an entry. The ETag derives from key
+and versions alone: a matching If-None-Match gets a 304 without touching the
+database, even once the entry itself has been evicted.
+
+Versions live in this process. Writes made by another server process, or
+directly in Mongo, are not seen; run a single worker, or turn the cache off
+with READ_CACHE_MB=0.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+TRANSACTIONS = "transactions"
+BUDGETS = "budgets"
+
+Versions = Tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    etag: str
+    versions: Versions
+    body: bytes
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match calls for
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ReadCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+        # Versions restart at zero, so ETags from a previous run must not match
+        self.epoch = os.urandom(8).hex()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def versions_of(self, scopes: Tuple[str, ...]) -> Versions:
+        return tuple(self.versions.get(scope, 0) for scope in scopes)
+
+    def bump(self, *scopes: str):
+        with self._lock:
+            for scope in scopes:
+                self.versions[scope] = self.versions.get(scope, 0) + 1
+
+    @contextmanager
+    def mutation(self, *scopes: str) -> Iterator[None]:
+        """Wraps a write; reads made while it runs are never cached past its end."""
+        self.bump(*scopes)
+        try:
+            yield
+        finally:
+            self.bump(*scopes)
+
+    @staticmethod
+    def key(endpoint: str, params: Mapping[str, Any]) -> str:
+        resolved = sorted((name, value) for name, value in params.items() if value is not None)
+        return json.dumps([endpoint, resolved], sort_keys=True, default=str)
+
+    def etag(self, key: str, versions: Versions) -> str:
+        digest = hashlib.sha256(f"{self.epoch}\0{key}\0{versions}".encode("utf-8")).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def get(self, key: str, versions: Versions) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.versions != versions:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: str, scopes: Tuple[str, ...], entry: CachedResponse):
+        size = len(entry.body) + len(key)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            # A write started since the read began; its result may already be stale
+            if self.versions_of(scopes) != entry.versions:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body) + len(key)
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                old_key, old = self._entries.popitem(last=False)
+                self._size -= len(old.body) + len(old_key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
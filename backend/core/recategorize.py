@@ -0,0 +1,167 @@
+"""
+Preview-then-commit bulk recategorization with an undo log.
+
+A preview resolves the keyword through the merchant index and records a
+pending plan (count + sample). Committing re-runs the same indexed query,
+applies the change in batched bulk_writes, and stores each batch's previous
+categories so the whole operation can be undone.
+
+A commit or undo that fails part-way marks its plan "failed"; one whose
+process died leaves it "applying"/"undoing" until STALE_CLAIM passes. Either
+way undo still runs: it only touches rows still in the plan's category, so
+undoing a partial change (or undoing twice) is safe.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from core.budgets import SPEND_FIELDS, SpendDelta
+from core.dates import serialize_transaction
+from core.merchants import merchant_query
+
+BATCH_SIZE = 1000
+SAMPLE_SIZE = 5
+# A pending chat preview can be confirmed for this long
+PREVIEW_TTL = timedelta(minutes=15)
+# A plan claimed longer ago than this is taken to be abandoned by its process
+STALE_CLAIM = timedelta(minutes=10)
+
+
+def undoable(plan_id: ObjectId) -> Dict[str, Any]:
+    """Plans undo may claim: applied, failed, or stuck mid-way."""
+    return {"_id": plan_id, "$or": [
+        {"status": {"$in": ["applied", "failed"]}},
+        {"status": {"$in": ["applying", "undoing"]}, "claimed_at": {"$lt": datetime.utcnow() - STALE_CLAIM}},
+    ]}
+
+
+async def preview(transactions, plans, keyword: str, new_category: str) -> Optional[Dict[str, Any]]:
+    query = merchant_query(keyword)
+    if query is None:
+        return None
+    count = await transactions.count_documents(query)
+    projection = {"date": 1, "description": 1, "amount": 1, "category": 1}
+    sample = await transactions.find(query, projection).sort("date", -1).limit(SAMPLE_SIZE).to_list(length=SAMPLE_SIZE)
+    plan = {
+        "keyword": keyword,
+        "new_category": new_category,
+        "query": query,
+        "count": count,
+        "status": "pending",
+        "created_at": datetime.utcnow(),
+    }
+    result = await plans.insert_one(plan)
+    return {
+        "preview_id": str(result.inserted_id),
+        "keyword": keyword,
+        "new_category": new_category,
+        "count": count,
+        "sample": [serialize_transaction(doc) for doc in sample],
+    }
+
+
+async def latest_pending(plans) -> Optional[Dict[str, Any]]:
+    return await plans.find_one(
+        {"status": "pending", "created_at": {"$gte": datetime.utcnow() - PREVIEW_TTL}},
+        sort=[("created_at", -1)],
+    )
+
+
+async def commit(transactions, plans, undo_log, plan_id: ObjectId,
+                 delta: Optional[SpendDelta] = None) -> Optional[Dict[str, Any]]:
+    """Applies a pending plan; category moves are recorded in `delta` for the budget totals."""
+    # Claim the plan atomically so a double-submit cannot apply it twice
+    plan = await plans.find_one_and_update(
+        {"_id": plan_id, "status": "pending"},
+        {"$set": {"status": "applying", "claimed_at": datetime.utcnow()}},
+    )
+    if plan is None:
+        return None
+
+    new_category = plan["new_category"]
+    query = {**plan["query"], "category": {"$ne": new_category}}
+    cursor = transactions.find(query, SPEND_FIELDS).batch_size(BATCH_SIZE)
+
+    updated = 0
+    batch: List[Dict[str, Any]] = []
+
+    async def flush():
+        nonlocal updated
+        if not batch:
+            return
+        await undo_log.insert_one({
+            "plan_id": plan_id,
+            "entries": [{"_id": d["_id"], "category": d.get("category")} for d in batch],
+        })
+        result = await transactions.bulk_write(
+            [UpdateOne({"_id": d["_id"]}, {"$set": {"category": new_category}}) for d in batch],
+            ordered=False,
+        )
+        updated += result.modified_count
+        if delta is not None:
+            for d in batch:
+                delta.replace(d, {"category": new_category})
+        batch.clear()
+
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= BATCH_SIZE:
+                await flush()
+        await flush()
+    except Exception as e:
+        # Some batches may have landed; their undo entries are already stored
+        await plans.update_one(
+            {"_id": plan_id}, {"$set": {"status": "failed", "updated": updated, "error": str(e)}}
+        )
+        raise
+
+    await plans.update_one(
+        {"_id": plan_id},
+        {"$set": {"status": "applied", "updated": updated, "applied_at": datetime.utcnow()}},
+    )
+    return {"undo_id": str(plan_id), "updated": updated, "new_category": new_category, "keyword": plan["keyword"]}
+
+
+async def undo(transactions, plans, undo_log, plan_id: ObjectId,
+               delta: Optional[SpendDelta] = None) -> Optional[int]:
+    plan = await plans.find_one_and_update(
+        undoable(plan_id),
+        {"$set": {"status": "undoing", "claimed_at": datetime.utcnow()}},
+    )
+    if plan is None:
+        return None
+
+    try:
+        restored = await _restore(transactions, undo_log, plan, delta)
+    except Exception as e:
+        # The log is kept, so the undo can simply be run again
+        await plans.update_one({"_id": plan_id}, {"$set": {"status": "failed", "error": str(e)}})
+        raise
+
+    await undo_log.delete_many({"plan_id": plan_id})
+    await plans.update_one({"_id": plan_id}, {"$set": {"status": "undone", "restored": restored}})
+    return restored
+
+
+async def _restore(transactions, undo_log, plan: Dict[str, Any], delta: Optional[SpendDelta]) -> int:
+    restored = 0
+    async for entry in undo_log.find({"plan_id": plan["_id"]}):
+        if delta is not None:
+            previous = {e["_id"]: e["category"] for e in entry["entries"]}
+            # Only rows still in the plan's category are reverted (see filter below)
+            async for doc in transactions.find(
+                {"_id": {"$in": list(previous)}, "category": plan["new_category"]}, SPEND_FIELDS
+            ):
+                delta.replace(doc, {"category": previous[doc["_id"]]})
+        ops = [
+            # Leave rows alone if someone recategorized them again since
+            UpdateOne({"_id": e["_id"], "category": plan["new_category"]}, {"$set": {"category": e["category"]}})
+            for e in entry["entries"]
+        ]
+        if ops:
+            result = await transactions.bulk_write(ops, ordered=False)
+            restored += result.modified_count
+    return restored
@@ -0,0 +1,270 @@
+"""
+Retrieval stage for /chat.
+
+Instead of pasting the newest documents into the prompt, the question is
+parsed for a time range, merchants and categories; targeted, index-backed
+queries then produce pre-aggregated totals plus a handful of matching rows,
+rendered as a compact table that fits a token budget.
+"""
+import calendar
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.chunking import estimate_tokens
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+
+STOPWORDS = {
+    "how", "much", "many", "did", "does", "do", "i", "me", "my", "we", "our", "spend", "spent",
+    "spending", "on", "at", "in", "for", "from", "to", "the", "a", "an", "and", "or", "of", "what",
+    "was", "were", "is", "are", "last", "this", "next", "month", "months", "year", "years", "week",
+    "weeks", "day", "days", "total", "show", "list", "all", "with", "between", "since", "during",
+    "money", "transactions", "transaction", "pay", "paid", "buy", "bought", "cost", "costs",
+}
+
+# How long the merchant/category vocabulary is reused before re-reading it
+VOCABULARY_TTL_SECONDS = 300
+# Most frequent merchants/categories kept; bounds memory and matching per question
+VOCABULARY_MERCHANTS = 5000
+VOCABULARY_CATEGORIES = 500
+
+
+@dataclass
+class ChatFilters:
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    merchants: List[str] = field(default_factory=list)
+    categories: List[str] = field(default_factory=list)
+
+    def query(self) -> Dict[str, Any]:
+        query: Dict[str, Any] = {"is_transfer": {"$ne": True}}
+        if self.start or self.end:
+            query["date"] = {}
+            if self.start:
+                query["date"]["$gte"] = self.start
+            if self.end:
+                query["date"]["$lt"] = self.end
+        if self.merchants:
+            query["merchant"] = {"$in": self.merchants}
+        if self.categories:
+            query["category"] = {"$in": self.categories}
+        return query
+
+    def describe(self) -> str:
+        parts = []
+        if self.start or self.end:
+            start = self.start.strftime("%Y-%m-%d") if self.start else "beginning"
+            end = (self.end - timedelta(days=1)).strftime("%Y-%m-%d") if self.end else "today"
+            parts.append(f"dates {start} to {end}")
+        if self.merchants:
+            parts.append(f"merchants {', '.join(self.merchants)}")
+        if self.categories:
+            parts.append(f"categories {', '.join(self.categories)}")
+        return "; ".join(parts) or "no filters (recent activity)"
+
+
+def _month_start(year: int, month: int) -> datetime:
+    return datetime(year, month, 1)
+
+
+def _next_month(d: datetime) -> datetime:
+    return datetime(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def parse_time_range(question: str, now: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Returns a half-open [start, end) range, or (None, None) if no period is mentioned."""
+    q = question.lower()
+    today = datetime(now.year, now.month, now.day)
+
+    m = re.search(r"\b(?:last|past)\s+(\d+)\s+(day|week|month|year)s?\b", q)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        days = {"day": 1, "week": 7, "month": 30, "year": 365}[unit] * n
+        return today - timedelta(days=days), today + timedelta(days=1)
+
+    if "yesterday" in q:
+        return today - timedelta(days=1), today
+    if "today" in q:
+        return today, today + timedelta(days=1)
+    if re.search(r"\bthis week\b", q):
+        start = today - timedelta(days=today.weekday())
+        return start, today + timedelta(days=1)
+    if re.search(r"\blast week\b", q):
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=7)
+    if re.search(r"\bthis month\b", q):
+        return _month_start(today.year, today.month), today + timedelta(days=1)
+    if re.search(r"\blast month\b", q):
+        end = _month_start(today.year, today.month)
+        return _month_start(end.year - (end.month == 1), (end.month - 2) % 12 + 1), end
+    if re.search(r"\bthis year\b", q):
+        return datetime(today.year, 1, 1), today + timedelta(days=1)
+    if re.search(r"\blast year\b", q):
+        return datetime(today.year - 1, 1, 1), datetime(today.year, 1, 1)
+
+    month_names = "|".join(sorted(MONTHS, key=len, reverse=True))
+    m = re.search(rf"\b(last\s+)?({month_names})\b\.?(?:\s+(\d{{4}}))?", q)
+    if m and not (m.group(2) == "may" and not m.group(1) and not m.group(3)):
+        month = MONTHS[m.group(2)]
+        if m.group(3):
+            year = int(m.group(3))
+        else:
+            # Most recent such month that has already started; "last March"
+            # in March means the previous year's
+            year = today.year if month < today.month or (month == today.month and not m.group(1)) else today.year - 1
+        start = _month_start(year, month)
+        return start, _next_month(start)
+
+    m = re.search(r"\b(?:in|during|for)?\s*((?:19|20)\d{2})\b", q)
+    if m:
+        year = int(m.group(1))
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+    return None, None
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9&']+", text.lower())
+
+
+def match_vocabulary(question: str, merchants: List[str], categories: List[str]) -> Tuple[List[str], List[str]]:
+    """Finds known merchants and categories mentioned in the question."""
+    words = [w for w in _words(question) if w not in STOPWORDS and w not in MONTHS and not w.isdigit()]
+    if not words:
+        return [], []
+    singular = {w[:-1] for w in words if w.endswith("s") and len(w) > 3}
+
+    matched_categories = [
+        c for c in categories
+        if c and (c.lower() in words or c.lower() in singular)
+    ]
+    category_words = {c.lower() for c in matched_categories}
+
+    candidates = [w for w in words if len(w) >= 3 and w not in category_words]
+    matched_merchants = []
+    for merchant in merchants:
+        merchant_words = _words(merchant or "")
+        if merchant_words and any(merchant_words[0] == w or (len(w) >= 4 and merchant_words[0].startswith(w))
+                                  for w in candidates):
+            matched_merchants.append(merchant)
+    return matched_merchants[:25], matched_categories
+
+
+async def top_values(collection, field: str, limit: int) -> List[str]:
+    """The `limit` most frequent non-empty string values of a field."""
+    pipeline = [
+        {"$match": {field: {"$type": "string", "$ne": ""}}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    rows = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=limit)
+    return [row["_id"] for row in rows]
+
+
+class Vocabulary:
+    """Most frequent merchants and categories, re-read at most every few minutes."""
+
+    def __init__(self, ttl_seconds: int = VOCABULARY_TTL_SECONDS,
+                 merchant_limit: int = VOCABULARY_MERCHANTS, category_limit: int = VOCABULARY_CATEGORIES):
+        self.ttl_seconds = ttl_seconds
+        self.merchant_limit = merchant_limit
+        self.category_limit = category_limit
+        self.loaded_at = 0.0
+        self.merchants: List[str] = []
+        self.categories: List[str] = []
+
+    async def get(self, collection) -> Tuple[List[str], List[str]]:
+        if time.monotonic() - self.loaded_at > self.ttl_seconds:
+            self.merchants = await top_values(collection, "merchant", self.merchant_limit)
+            self.categories = await top_values(collection, "category", self.category_limit)
+            self.loaded_at = time.monotonic()
+        return self.merchants, self.categories
+
+
+def _fmt_amount(value: Any) -> str:
+    # Rows from older imports may hold null or string amounts
+    try:
+        return f"{float(value):.2f}"
+    except (TypeError, ValueError):
+        return "" if value is None else str(value)
+
+
+def _fmt_row(doc: Dict[str, Any]) -> str:
+    date = doc.get("date")
+    date = date.strftime("%Y-%m-%d") if isinstance(date, datetime) else str(date)
+    return f"{date} | {doc.get('description', '')} | {_fmt_amount(doc.get('amount'))} | {doc.get('category', '')} | {doc.get('account_name', '')}"
+
+
+async def build_context(collection, filters: ChatFilters, token_budget: int, sample_rows: int = 40) -> str:
+    """
+    Summary totals, per-merchant/category/month breakdowns and the newest
+    matching rows, trimmed to token_budget.
+    """
+    query = filters.query()
+    facet_pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "spent": {"$sum": {"$cond": [{"$lt": ["$amount", 0]}, {"$abs": "$amount"}, 0]}},
+                "received": {"$sum": {"$cond": [{"$gt": ["$amount", 0]}, "$amount", 0]}},
+                "count": {"$sum": 1},
+            }}],
+            "by_category": [
+                {"$group": {"_id": "$category", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"total": 1}}, {"$limit": 10},
+            ],
+            "by_merchant": [
+                {"$group": {"_id": {"$ifNull": ["$merchant", "$description"]},
+                            "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"total": 1}}, {"$limit": 10},
+            ],
+        }},
+    ]
+    facets = (await collection.aggregate(facet_pipeline).to_list(length=1) or [{}])[0]
+
+    lines = [f"Filters: {filters.describe()}"]
+    totals = (facets.get("totals") or [None])[0]
+    if totals:
+        lines.append(f"Totals: spent {totals['spent']:.2f}, received {totals['received']:.2f}, {totals['count']} transactions")
+    else:
+        lines.append("Totals: no matching transactions")
+    for title, key in (("By category", "by_category"), ("By merchant", "by_merchant")):
+        rows = facets.get(key) or []
+        if rows:
+            lines.append(f"{title} (net amount, count):")
+            lines.extend(f"  {r['_id']}: {r['total']:.2f} ({r['count']})" for r in rows)
+
+    projection = {"_id": 0, "date": 1, "description": 1, "amount": 1, "category": 1, "account_name": 1}
+    cursor = collection.find(query, projection).sort("date", -1).limit(sample_rows)
+    samples = await cursor.to_list(length=sample_rows)
+    if samples:
+        lines.append("Matching transactions (date | description | amount | category | account):")
+
+    used = sum(estimate_tokens(line) for line in lines)
+    for doc in samples:
+        row = _fmt_row(doc)
+        cost = estimate_tokens(row)
+        if used + cost > token_budget:
+            lines.append(f"... {len(samples) - samples.index(doc)} more rows omitted")
+            break
+        lines.append(row)
+        used += cost
+    return "\n".join(lines)
+
+
+async def retrieve_chat_context(collection, vocabulary: Vocabulary, question: str,
+                                token_budget: int, now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    start, end = parse_time_range(question, now)
+    merchants, categories = match_vocabulary(question, *(await vocabulary.get(collection)))
+    filters = ChatFilters(start, end, merchants, categories)
+    if not (start or merchants or categories):
+        # Nothing specific asked: summarize the last 90 days
+        filters.start = datetime(now.year, now.month, now.day) - timedelta(days=90)
+    return await build_context(collection, filters, token_budget)
@@ -0,0 +1,179 @@
+"""
+Merchant -> category rules applied at ingest, without the LLM.
+
+Every confirmed recategorization is stored as a rule. Rules are compiled
+into one matcher: exact rules are a dict lookup on the normalized merchant
+key, prefix rules share a single Aho-Corasick automaton (one pass over the
+key finds every phrase that starts at a word boundary), and regex rules
+are the fallback. A batch is categorized per distinct merchant key, so a
+100k-row import with a few thousand merchants does a few thousand lookups.
+
+The exact and prefix phrases are also listed in the extraction prompt
+(newest first, up to PROMPT_MERCHANTS), so the LLM leaves the category of
+those rows to the rules instead of inferring one.
+"""
+import re
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.merchants import merchant_key
+
+RULE_KINDS = ("exact", "prefix", "regex")
+# Known merchants listed in the extraction prompt; bounds the prompt's size
+PROMPT_MERCHANTS = 200
+
+
+class PhraseAutomaton:
+    """Aho-Corasick over normalized merchant keys."""
+
+    def __init__(self, patterns: Dict[str, Any]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[str, Any]]] = [[]]
+        for pattern, value in patterns.items():
+            self._add(pattern, value)
+        self._link()
+
+    def _add(self, pattern: str, value: Any):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        self.output[state].append((pattern, value))
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                if state == 0:
+                    # Depth-1 states always fail back to the root
+                    continue
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def matches(self, text: str) -> List[Tuple[str, Any]]:
+        """Patterns found in text that start at a word boundary."""
+        found = []
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for pattern, value in self.output[state]:
+                start = end - len(pattern) + 1
+                if start == 0 or text[start - 1] == " ":
+                    found.append((pattern, value))
+        return found
+
+
+class RuleMatcher:
+    def __init__(self, rules: List[Dict[str, Any]]):
+        # Later rules override earlier ones for the same pattern
+        ordered = sorted(rules, key=lambda r: r.get("created_at") or datetime.min)
+        self.exact: Dict[str, str] = {}
+        prefixes: Dict[str, str] = {}
+        self.regexes: List[Tuple[re.Pattern, str]] = []
+        for rule in ordered:
+            if rule["kind"] == "exact":
+                self.exact[rule["pattern"]] = rule["category"]
+            elif rule["kind"] == "prefix":
+                prefixes[rule["pattern"]] = rule["category"]
+            else:
+                self.regexes.insert(0, (re.compile(rule["pattern"], re.IGNORECASE), rule["category"]))
+        self.automaton = PhraseAutomaton(prefixes) if prefixes else None
+        # Exact and prefix patterns, newest first
+        self.phrases = list(dict.fromkeys(r["pattern"] for r in reversed(ordered) if r["kind"] != "regex"))
+        self.size = len(rules)
+
+    def known_merchants(self, limit: int = PROMPT_MERCHANTS) -> List[str]:
+        """Merchant phrases the rules categorize, newest first."""
+        return self.phrases[:limit]
+
+    def category_for(self, key: str, description: str = "") -> Optional[str]:
+        if key in self.exact:
+            return self.exact[key]
+        if self.automaton is not None:
+            found = self.automaton.matches(key)
+            if found:
+                # The most specific (longest) phrase wins
+                return max(found, key=lambda m: len(m[0]))[1]
+        for pattern, category in self.regexes:
+            if pattern.search(description):
+                return category
+        return None
+
+    def apply(self, transactions: List[Dict[str, Any]]) -> int:
+        """Sets category on matching rows, resolving each distinct merchant once."""
+        resolved: Dict[Tuple[str, str], Optional[str]] = {}
+        applied = 0
+        for txn in transactions:
+            key = txn.get("merchant_key")
+            if key is None:
+                key = merchant_key(txn.get("description") or "")
+            description = txn.get("description") or ""
+            # Regex rules look at the raw description, so it is part of the memo key only when needed
+            memo = (key, description if self.regexes else "")
+            if memo not in resolved:
+                resolved[memo] = self.category_for(key, description)
+            category = resolved[memo]
+            if category:
+                txn["category"] = category
+                txn["category_source"] = "rule"
+                applied += 1
+        return applied
+
+
+def normalize_rule(kind: str, pattern: str) -> str:
+    """Exact/prefix rules are stored in merchant-key form; regexes must compile."""
+    if kind not in RULE_KINDS:
+        raise ValueError(f"kind must be one of {list(RULE_KINDS)}")
+    if kind == "regex":
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regex: {e}")
+        return pattern
+    normalized = merchant_key(pattern)
+    if not normalized:
+        raise ValueError("Pattern has no searchable characters")
+    return normalized
+
+
+class RuleEngine:
+    """Caches the compiled matcher and rebuilds it only when the rule set changes."""
+
+    def __init__(self):
+        self.matcher = RuleMatcher([])
+        self.version: Optional[Tuple[int, Any]] = None
+
+    async def refresh(self, rules_collection) -> RuleMatcher:
+        newest = await rules_collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        count = await rules_collection.count_documents({})
+        version = (count, newest["_id"] if newest else None)
+        if version != self.version:
+            rules = await rules_collection.find({}, {"kind": 1, "pattern": 1, "category": 1, "created_at": 1}).to_list(length=None)
+            self.matcher = RuleMatcher(rules)
+            self.version = version
+        return self.matcher
+
+    async def add_rule(self, rules_collection, kind: str, pattern: str, category: str, source: str = "user") -> Dict[str, Any]:
+        normalized = normalize_rule(kind, pattern)
+        rule = {"kind": kind, "pattern": normalized, "category": category,
+                "source": source, "created_at": datetime.utcnow()}
+        # One rule per (kind, pattern): a new correction replaces the old one
+        await rules_collection.delete_many({"kind": kind, "pattern": normalized})
+        result = await rules_collection.insert_one(rule)
+        rule["_id"] = result.inserted_id
+        return rule
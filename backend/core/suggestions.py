@@ -0,0 +1,156 @@
+"""
+Budget suggestions from spending history.
+
+History is read with one projected query (date, amount, category of
+non-transfer spending) straight into columns, then reduced to a
+category x month matrix. Everything after that is whole-matrix NumPy:
+
+- one-off spikes are trimmed per category to median + k * MAD;
+- the level is a rolling median of the trimmed series;
+- seasonality is the target calendar month's average relative to the
+  category's overall average, shrunk toward 1 when few years exist;
+- trend is the least-squares slope over the recent window;
+- the band is the suggestion +/- z * the recent spread of the trimmed
+  series around its rolling median.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ROLLING_MONTHS = 6
+TREND_MONTHS = 12
+SPIKE_MADS = 3.0
+# Two-sided 80% band
+BAND_Z = 1.2816
+# Years of same-month history needed before seasonality counts fully
+SEASONAL_FULL_YEARS = 3
+
+HISTORY_FIELDS = {"_id": 0, "date": 1, "amount": 1, "category": 1}
+
+
+def history_query(start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+    date_filter: Dict[str, Any] = {"$type": "date"}
+    if start:
+        date_filter["$gte"] = start
+    if end:
+        date_filter["$lt"] = end
+    return {"date": date_filter, "is_transfer": {"$ne": True}, "amount": {"$lt": 0}}
+
+
+def history_frame(dates: List[datetime], amounts: List[float], categories: List[str]) -> pd.DataFrame:
+    """Spending rows as a columnar frame (date, spent, category)."""
+    return pd.DataFrame({
+        "date": pd.Series(dates, dtype="datetime64[ns]"),
+        "spent": -np.asarray(amounts, dtype=float),
+        "category": pd.Series(categories, dtype="category"),
+    })
+
+
+async def load_history(transactions, start: Optional[datetime], end: Optional[datetime]) -> pd.DataFrame:
+    dates, amounts, categories = [], [], []
+    cursor = transactions.find(history_query(start, end), HISTORY_FIELDS).batch_size(10000)
+    async for doc in cursor:
+        dates.append(doc["date"])
+        amounts.append(doc["amount"])
+        categories.append(doc.get("category") or "Other")
+    return history_frame(dates, amounts, categories)
+
+
+def monthly_matrix(frame: pd.DataFrame, last_month: pd.Period) -> pd.DataFrame:
+    """Category rows x contiguous month columns up to last_month, zero where nothing was spent."""
+    months = frame["date"].dt.to_period("M")
+    in_range = (months <= last_month).to_numpy()
+    if not in_range.any():
+        return pd.DataFrame()
+    frame, months = frame[in_range], months[in_range]
+    totals = frame.groupby([frame["category"], months], observed=True)["spent"].sum()
+    matrix = totals.unstack(fill_value=0.0)
+    span = pd.period_range(months.min(), last_month, freq="M")
+    matrix = matrix.reindex(columns=span, fill_value=0.0).astype(float)
+    return matrix[(matrix.to_numpy() > 0).any(axis=1)]
+
+
+def trim_spikes(values: np.ndarray, k: float = SPIKE_MADS) -> np.ndarray:
+    """Caps each row at its median + k * (scaled) MAD; NaNs are ignored."""
+    median = np.nanmedian(values, axis=1, keepdims=True)
+    mad = np.nanmedian(np.abs(values - median), axis=1, keepdims=True) * 1.4826
+    # A constant series (rent, subscriptions) has MAD 0 and nothing to trim
+    cap = np.where(mad > 0, median + k * mad, np.inf)
+    return np.minimum(values, cap)
+
+
+def trend_slope(values: np.ndarray) -> np.ndarray:
+    """Least-squares slope per row (units per month), skipping NaNs."""
+    present = ~np.isnan(values)
+    x = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    count = present.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = np.where(present, x, 0).sum(axis=1) / count
+        y_mean = np.nansum(values, axis=1) / count
+        dx = np.where(present, x - x_mean[:, None], 0)
+        dy = np.where(present, values - y_mean[:, None], 0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    return np.where(count >= 2, np.nan_to_num(slope), 0.0)
+
+
+def seasonal_factor(values: np.ndarray, month_numbers: np.ndarray, target_month: int) -> np.ndarray:
+    same = values[:, month_numbers == target_month]
+    years = (~np.isnan(same)).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overall = np.nanmean(values, axis=1)
+        factor = np.nansum(same, axis=1) / years / overall
+    factor = np.where((overall > 0) & (years > 0), factor, 1.0)
+    # Shrink toward 1 until several years of that month are available
+    weight = np.minimum(years / SEASONAL_FULL_YEARS, 1.0)
+    return 1.0 + weight * (factor - 1.0)
+
+
+def suggest_from_matrix(matrix: pd.DataFrame, target: pd.Period) -> Dict[str, List[Any]]:
+    """Columnar suggestions, one entry per category, for the target month."""
+    columns = ("category", "suggested", "low", "high", "median", "trend", "seasonal_factor", "months")
+    if matrix.empty:
+        return {c: [] for c in columns}
+
+    values = matrix.to_numpy()
+    # Months before a category's first spending are missing, not zero
+    started = np.cumsum(values > 0, axis=1) > 0
+    values = np.where(started, values, np.nan)
+
+    trimmed = trim_spikes(values)
+    rolling = pd.DataFrame(trimmed.T).rolling(ROLLING_MONTHS, min_periods=1).median().to_numpy().T
+    level = np.nan_to_num(rolling[:, -1])
+
+    slope = trend_slope(trimmed[:, -TREND_MONTHS:])
+    months_ahead = (target - matrix.columns[-1]).n
+    month_numbers = np.fromiter((p.month for p in matrix.columns), dtype=int, count=len(matrix.columns))
+    season = seasonal_factor(trimmed, month_numbers, target.month)
+
+    suggested = np.maximum(level * season + slope * months_ahead, 0.0)
+    with np.errstate(invalid="ignore"):
+        spread = np.nan_to_num(np.nanstd((trimmed - rolling)[:, -TREND_MONTHS:], axis=1))
+    low = np.maximum(suggested - BAND_Z * spread, 0.0)
+    high = suggested + BAND_Z * spread
+    history = started.sum(axis=1)
+
+    keep = level > 0
+    order = np.argsort(-suggested[keep], kind="stable")
+    pick = lambda arr: arr[keep][order]
+    return {
+        "category": [str(c) for c in pick(matrix.index.to_numpy())],
+        "suggested": np.round(pick(suggested), 2).tolist(),
+        "low": np.round(pick(low), 2).tolist(),
+        "high": np.round(pick(high), 2).tolist(),
+        "median": np.round(pick(level), 2).tolist(),
+        "trend": np.round(pick(slope), 2).tolist(),
+        "seasonal_factor": np.round(pick(season), 3).tolist(),
+        "months": pick(history).astype(int).tolist(),
+    }
+
+
+def suggest_budgets(frame: pd.DataFrame, target: pd.Period) -> Dict[str, Any]:
+    """Suggested monthly budget per category for the target month, columnar."""
+    # The target month itself is usually partial, so history stops before it
+    matrix = monthly_matrix(frame, target - 1)
+    return {"month": str(target), **suggest_from_matrix(matrix, target)}
@@ -0,0 +1,195 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple, Optional, Callable
+
+from core.dates import parse_date
+
+TRANSFER_WINDOW_DAYS = 5
+
+
+def amount_key(amount) -> Optional[int]:
+    """Absolute amount in cents, so float noise never splits a bucket."""
+    try:
+        return abs(int(round(float(amount) * 100)))
+    except (TypeError, ValueError):
+        return None
+
+
+class TransferIndex:
+    """
+    Rows bucketed by absolute amount, each sign kept sorted by date.
+
+    Lookups bisect into the +/- window around a date and walk outwards, so the
+    closest eligible row is found without scanning the rest of the bucket.
+    Claimed rows are removed, which keeps assignment one-to-one.
+    """
+
+    def __init__(self, window_days: int = TRANSFER_WINDOW_DAYS):
+        self.window = timedelta(days=window_days)
+        self.buckets: Dict[int, Dict[bool, List[Tuple[datetime, int]]]] = {}
+
+    def extend(self, rows: List[Tuple[datetime, int, bool, int]]):
+        """Bulk load (date, key, positive, idx) rows and sort each side once."""
+        for date, key, positive, idx in rows:
+            self.buckets.setdefault(key, {True: [], False: []})[positive].append((date, idx))
+        for sides in self.buckets.values():
+            sides[True].sort()
+            sides[False].sort()
+
+    def remove(self, date: datetime, key: int, positive: bool, idx: int):
+        side = self.buckets.get(key, {}).get(positive)
+        if not side:
+            return
+        pos = bisect_left(side, (date, idx))
+        if pos < len(side) and side[pos][1] == idx:
+            side.pop(pos)
+
+    def closest(self, date: datetime, key: int, positive: bool,
+                valid: Callable[[int], bool]) -> Optional[Tuple[datetime, int]]:
+        """Nearest-dated row on the given side; ties go to the lowest index."""
+        side = self.buckets.get(key, {}).get(positive)
+        if not side:
+            return None
+
+        center = bisect_left(side, (date, -1))
+
+        right = None
+        pos = center
+        while pos < len(side) and side[pos][0] <= date + self.window:
+            if valid(side[pos][1]):
+                right = side[pos]
+                break
+            pos += 1
+
+        left = None
+        pos = center - 1
+        while pos >= 0 and side[pos][0] >= date - self.window:
+            if left is not None and side[pos][0] != left[0]:
+                break
+            if valid(side[pos][1]):
+                left = side[pos]
+            pos -= 1
+
+        if left is None or right is None:
+            return left or right
+        left_gap, right_gap = date - left[0], right[0] - date
+        if left_gap == right_gap:
+            return min(left, right, key=lambda c: c[1])
+        return left if left_gap < right_gap else right
+
+
+def _index_rows(rows: List[Dict[str, Any]]) -> List[Optional[Tuple[datetime, int, bool]]]:
+    parsed = []
+    for row in rows:
+        row_date = parse_date(row.get("date"))
+        key = amount_key(row.get("amount"))
+        if row_date is None or not key:
+            parsed.append(None)
+        else:
+            parsed.append((row_date, key, float(row["amount"]) > 0))
+    return parsed
+
+
+def match_batch_transfers(transactions: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """
+    Pairs transfers inside a single batch.
+
+    Criteria match the original scan: a potential transfer links to a row with
+    the opposite amount, in a different account, dated within the window.
+    Returns (initiator_index, candidate_index) pairs in batch order.
+    """
+    parsed = _index_rows(transactions)
+    index = TransferIndex()
+    index.extend([(p[0], p[1], p[2], i) for i, p in enumerate(parsed) if p is not None])
+
+    pairs: List[Tuple[int, int]] = []
+    linked = set()
+
+    for i, txn in enumerate(transactions):
+        if not txn.get("potential_transfer") or i in linked or parsed[i] is None:
+            continue
+
+        txn_date, key, positive = parsed[i]
+        account = txn.get("account_name")
+        best = index.closest(txn_date, key, not positive,
+                             lambda j: transactions[j].get("account_name") != account)
+        if best is None:
+            continue
+
+        j = best[1]
+        index.remove(txn_date, key, positive, i)
+        index.remove(best[0], key, not positive, j)
+        linked.add(i)
+        linked.add(j)
+        pairs.append((i, j))
+
+    return pairs
+
+
+def match_external_transfers(transactions: List[Dict[str, Any]],
+                             candidates: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """
+    Pairs still-unlinked potential transfers in a batch against rows that
+    already exist (e.g. fetched from the database in one query).
+
+    Returns (transaction_index, candidate_index) pairs; each candidate is
+    claimed at most once.
+    """
+    parsed = _index_rows(candidates)
+    index = TransferIndex()
+    index.extend([(p[0], p[1], p[2], j) for j, p in enumerate(parsed) if p is not None])
+
+    pairs: List[Tuple[int, int]] = []
+    for i, txn in enumerate(transactions):
+        if not txn.get("potential_transfer") or txn.get("linked_tx_id"):
+            continue
+        txn_date = parse_date(txn.get("date"))
+        key = amount_key(txn.get("amount"))
+        if txn_date is None or not key:
+            continue
+
+        positive = float(txn["amount"]) > 0
+        account = txn.get("account_name")
+        best = index.closest(txn_date, key, not positive,
+                             lambda j: candidates[j].get("account_name") != account)
+        if best is None:
+            continue
+
+        index.remove(best[0], key, not positive, best[1])
+        pairs.append((i, best[1]))
+
+    return pairs
+
+
+def candidate_window(transactions: List[Dict[str, Any]]) -> Optional[Tuple[datetime, datetime, List[float]]]:
+    """
+    Date bounds (padded by the window) and opposite amounts for the unlinked
+    potential transfers in a batch -- everything one bulk lookup needs.
+    """
+    window = timedelta(days=TRANSFER_WINDOW_DAYS)
+    dates = []
+    amounts = set()
+    for txn in transactions:
+        if not txn.get("potential_transfer") or txn.get("linked_tx_id"):
+            continue
+        txn_date = parse_date(txn.get("date"))
+        if txn_date is None or not amount_key(txn.get("amount")):
+            continue
+        dates.append(txn_date)
+        amounts.add(-round(float(txn["amount"]), 2))
+    if not dates:
+        return None
+    return min(dates) - window, max(dates) + window, sorted(amounts)
+
+
+def candidate_query(start: datetime, end: datetime, amounts: List[float]) -> Dict[str, Any]:
+    """
+    Filter for the bulk lookup over a candidate_window: amount equality, then
+    the date range, which the (amount, date, account_name) index serves.
+    """
+    return {
+        "amount": {"$in": amounts},
+        "date": {"$gte": start, "$lte": end},
+        # Never steal the partner of an existing transfer
+        "linked_tx_id": None,
+    }
@@ -0,0 +1,289 @@
+"""
+Bounded-memory reading of uploaded statements.
+
+The request handler copies the upload to a spool file block by block, and
+the upload job reads it back in row chunks: CSVs through
+pd.read_csv(chunksize=...), text line by line. Each chunk is processed and
+written before the next is read, so peak memory follows the chunk size, not
+the file size. Known bank layouts yield parsed transactions per chunk;
+anything else yields text for LLM extraction. pandas cannot read Excel
+incrementally, so workbooks are loaded whole and then handed out in the
+same row chunks.
+
+Batch imports instead read each file whole (they link transfers across the
+combined set), expanding zip archives first and parsing the files in a
+process pool, since the pandas work is CPU-bound.
+
+pandas and the bank formats are imported by the readers themselves, so the
+server starts without them and loads them on the first upload.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.dates import normalize_date
+from core.fingerprints import OrdinalCounter
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Bytes copied per read while spooling the request body
+SPOOL_BLOCK_SIZE = 1 << 20
+# Characters of a text statement handed to LLM extraction at a time
+TEXT_BLOCK_CHARS = 256 * 1024
+# Rows per pandas read when a batch import reads a file whole
+FILE_CHUNK_ROWS = 100000
+# Files taken from one archive; anything beyond is ignored
+MAX_ARCHIVE_MEMBERS = 500
+# Uncompressed bytes allowed per archive member and per archive; a zip that
+# declares more is rejected before anything is extracted
+MAX_MEMBER_BYTES = 256 << 20
+MAX_ARCHIVE_BYTES = 1 << 30
+
+# (transactions or None, text for the LLM, rows dropped as unreadable)
+Chunk = Tuple[Optional[List[Dict[str, Any]]], str, int]
+
+
+async def spool_upload(upload, directory: str) -> Tuple[str, int]:
+    """Copies an UploadFile to disk without holding it in memory; returns (path, size)."""
+    os.makedirs(directory, exist_ok=True)
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while block := await upload.read(SPOOL_BLOCK_SIZE):
+                f.write(block)
+                size += len(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def clear_spool(directory: str, keep: Iterable[str] = ()):
+    """
+    Removes the spool directories of server processes that are gone (their
+    jobs are failed on start), and loose files from before per-process
+    directories; the directories named in keep belong to live processes.
+    """
+    if not os.path.isdir(directory):
+        return
+    keep = set(keep)
+    for name in os.listdir(directory):
+        if name in keep:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _csv_frames(path: str, chunk_rows: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+    try:
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+    except Exception as e:
+        raise ValueError(f"Invalid CSV: {str(e)}")
+
+
+def _excel_frames(path: str, chunk_rows: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+    try:
+        frame = pd.read_excel(path)
+    except Exception as e:
+        raise ValueError(f"Invalid Excel: {str(e)}")
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def _text_blocks(path: str, block_chars: int) -> Iterator[str]:
+    """Line-aligned blocks; later blocks repeat the first line as their header."""
+    header = None
+    lines: List[str] = []
+    size = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if header is None and line.strip():
+                header = line
+            lines.append(line)
+            size += len(line)
+            if size >= block_chars:
+                yield "".join(lines)
+                lines, size = ([header] if header else []), len(header or "")
+    if len(lines) > (1 if header else 0):
+        yield "".join(lines)
+
+
+def iter_upload(path: str, filename: str, chunk_rows: int, account_name: Optional[str] = None) -> Iterator[Chunk]:
+    """
+    Yields (transactions, "", dropped) for chunks in a known layout, labeled
+    with account_name when given, and (None, text, 0) for anything the LLM
+    has to read.
+    """
+    from core.formats import parse_known_format
+
+    if filename.endswith(".csv"):
+        frames = _csv_frames(path, chunk_rows)
+    elif filename.endswith(".xlsx") or filename.endswith(".xls"):
+        frames = _excel_frames(path, chunk_rows)
+    else:
+        # Assume text
+        for block in _text_blocks(path, TEXT_BLOCK_CHARS):
+            yield None, block, 0
+        return
+
+    for frame in frames:
+        parsed = parse_known_format(frame, account_name)
+        if parsed is None:
+            # CSV text keeps one row per line for chunking, and is compact
+            yield None, frame.to_csv(index=False), 0
+        else:
+            yield parsed[0], "", parsed[1]
+
+
+def replay_counter(path: str, filename: str, chunk_rows: int, chunks_done: int,
+                   account_name: Optional[str] = None) -> OrdinalCounter:
+    """
+    An unbounded OrdinalCounter holding the counts of the first chunks_done
+    chunks, for when an unsorted file revisits dates a bounded one dropped.
+    Only known layouts use bounded counters, so this never calls the LLM.
+    """
+    counter = OrdinalCounter(bounded=False)
+    for rows, _, _ in itertools.islice(iter_upload(path, filename, chunk_rows, account_name), chunks_done):
+        for txn in rows or []:
+            normalize_date(txn)
+        counter.assign(rows or [])
+    return counter
+
+
+def _check_sizes(members: List[zipfile.ZipInfo]):
+    total = 0
+    for info in members:
+        if info.file_size > MAX_MEMBER_BYTES:
+            raise ValueError(f"{info.filename} expands to {info.file_size} bytes (limit {MAX_MEMBER_BYTES})")
+        total += info.file_size
+    if total > MAX_ARCHIVE_BYTES:
+        raise ValueError(f"members expand to {total} bytes (limit {MAX_ARCHIVE_BYTES})")
+
+
+def _copy_member(src, out, info: zipfile.ZipInfo):
+    """Copies a member, failing as soon as it yields more than its declared size."""
+    copied = 0
+    while block := src.read(min(SPOOL_BLOCK_SIZE, info.file_size - copied + 1)):
+        copied += len(block)
+        if copied > info.file_size:
+            raise ValueError(f"{info.filename} is larger than its declared {info.file_size} bytes")
+        out.write(block)
+
+
+def expand_archives(files: List[Tuple[str, str]], directory: str
+                    ) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Replaces every (filename, path) that is a zip with its member files,
+    extracted into directory; other files pass through. Folders, hidden
+    files and macOS metadata inside archives are skipped, and archives over
+    MAX_MEMBER_BYTES / MAX_ARCHIVE_BYTES uncompressed are rejected. Returns
+    the files and (filename, error) for each archive that could not be read.
+    """
+    expanded = []
+    failed = []
+    for filename, path in files:
+        if not filename.lower().endswith(".zip"):
+            expanded.append((filename, path))
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.is_dir()
+                    and not os.path.basename(info.filename).startswith(".")
+                    and not info.filename.startswith("__MACOSX/")
+                ][:MAX_ARCHIVE_MEMBERS]
+                _check_sizes(members)
+                extracted = []
+                try:
+                    for info in members:
+                        name = os.path.basename(info.filename)
+                        fd, member_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1], dir=directory)
+                        extracted.append((name, member_path))
+                        with os.fdopen(fd, "wb") as out, archive.open(info) as src:
+                            _copy_member(src, out, info)
+                except Exception:
+                    # A damaged member fails the whole archive, not the batch
+                    for _, member_path in extracted:
+                        os.remove(member_path)
+                    raise
+                expanded.extend(extracted)
+        except Exception as e:
+            # Corrupt, truncated or encrypted; the rest of the batch goes on
+            failed.append((filename, f"Invalid zip archive: {str(e)}"))
+        finally:
+            os.remove(path)
+    return expanded, failed
+
+
+def read_file(path: str, filename: str, account_name: Optional[str] = None
+              ) -> Tuple[Optional[List[Dict[str, Any]]], List[str], int]:
+    """
+    Whole-file read for batch imports: (transactions, [], dropped) for a
+    known layout, (None, text blocks, 0) otherwise. Runs in a worker process.
+    """
+    rows: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    dropped = 0
+    for chunk_rows, text, chunk_dropped in iter_upload(path, filename, FILE_CHUNK_ROWS, account_name):
+        if chunk_rows is None:
+            texts.append(text)
+        else:
+            rows.extend(chunk_rows)
+            dropped += chunk_dropped
+    return (None, texts, 0) if texts else (rows, [], dropped)
+
+
+class ParsePool:
+    """
+    Process pool for batch parsing, started on first use. Workers are
+    spawned rather than forked, since the server process runs an event loop
+    and driver threads that must not be copied.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(workers, 1)
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def read_all(self, files: List[Tuple[str, str]], accounts: Optional[Dict[str, str]] = None) -> List[Any]:
+        """
+        read_file for every (filename, path), with the account named for that
+        filename in accounts if any; a failed file yields its exception.
+        """
+        accounts = accounts or {}
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, read_file, path, filename, accounts.get(filename))
+              for filename, path in files),
+            return_exceptions=True,
+        )
+        if any(isinstance(r, BrokenProcessPool) for r in results):
+            # A worker died (e.g. out of memory); start fresh next time
+            self.shutdown()
+        return results
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
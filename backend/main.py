@@ -1,103 +1,139 @@
 import os
-from dotenv import load_dotenv
-
-# Load .env from the same directory as main.py
-load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-import pandas as pd
-import io
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Tuple
+import asyncio
+import json
 
-from core.llm import get_llm_provider
-from prompts import DATA_EXTRACTION_PROMPT
+from core.llm import ProviderRegistry, check_credentials
+from core.llm_cache import ResultCache, SQLiteStore, CachedProvider
+from core import analytics
+from core.budgets import SPEND_FIELDS, BudgetTracker, SpendDelta, month_key
+from core.chunking import extract_chunked
+from core.config import Config
+from core.dates import parse_date, normalize_date, serialize_transaction
+from core.db import ensure_indexes, supports_transactions
+from core.export import csv_rows, ndjson_rows
+from core.fingerprints import LOOKUP_BATCH_SIZE, OrderChanged, OrdinalCounter, existing_fingerprints, fingerprint_batch
+from core.jobs import JobProgress, JobQueue, QueueFull, new_owner_id
+from core.links import UNLINK, audit_links, columnar_flows, flows_pipeline, link_fields, plan_links, plan_unlinks
+from core.metrics import InstrumentedProvider, MetricsMiddleware, MongoCommandCounter, render_metrics, stage
+from core.merchants import annotate_merchant, merchant_query
+from core.pagination import SORT, after_cursor, decode_cursor, encode_cursor, parse_fields
+from core import recategorize
+from core.read_cache import BUDGETS, TRANSACTIONS, CachedResponse, ReadCache, etag_matches
+from core.rules import RuleEngine
+from core.retrieval import Vocabulary, retrieve_chat_context
+from core.transfers import match_batch_transfers, match_external_transfers, candidate_query, candidate_window
+from core.uploads import ParsePool, clear_spool, expand_archives, iter_upload, replay_counter, spool_upload
+from prompts import extraction_prompt
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
+from contextlib import asynccontextmanager
 
-app = FastAPI()
-
-async def identify_and_link_transfers(new_transactions: List[Dict[str, Any]]):
+async def identify_and_link_transfers(new_transactions: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
     """
     Identifies and links transfer transactions.
     1. Checks within the new batch.
-    2. Checks against the database.
+    2. Checks against the database, with one bulk lookup for the whole batch.
+
+    Every new transaction gets its ObjectId up front so links can point at real
+    IDs before insertion. Returns the (new row, existing document) pairs
+    matched against the database; write_transactions back-links the existing
+    side only for rows that were actually inserted.
     """
-    # Helper to parse date
-    def parse_date(date_str):
-        if not date_str: return None
-        formats = ["%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d-%b-%Y", "%Y/%m/%d"]
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        return None
+    for txn in new_transactions:
+        txn.setdefault("_id", ObjectId())
 
-    for i, txn in enumerate(new_transactions):
-        if not txn.get("potential_transfer"):
-            continue
-            
-        txn_date = parse_date(txn.get("date"))
-        if not txn_date:
-            continue
-            
-        amount = txn.get("amount")
-        account = txn.get("account_name")
-        
-        # 1. Check within new batch
-        for j, candidate in enumerate(new_transactions):
-            if i == j: continue
-            
-            cand_date = parse_date(candidate.get("date"))
-            if not cand_date: continue
-            
-            # Criteria: Opposite amount, Date +/- 5 days, Different Account
-            if (candidate.get("amount") == -amount and
-                abs((cand_date - txn_date).days) <= 5 and
-                candidate.get("account_name") != account):
-                
-                # Link found!
-                txn["is_transfer"] = True
-                txn["linked_tx_id"] = f"TEMP_BATCH_{j}" # Temp ID for batch linking
-                candidate["is_transfer"] = True
-                candidate["linked_tx_id"] = f"TEMP_BATCH_{i}"
-                break # Move to next transaction
-        
-        # 2. Check against database (if not linked in batch)
-        if not txn.get("linked_tx_id"):
-            # Find candidate in DB
-            query = {
-                "amount": -amount,
-                "account_name": {"$ne": account},
-                # Date range query is tricky with string dates, assuming ISO format for now
-                # Ideally we'd store dates as Date objects in Mongo
-            }
-            
-            # Fetch candidates and filter by date in python for simplicity/safety
-            cursor = transactions_collection.find(query)
-            db_candidates = await cursor.to_list(length=100)
-            
-            for db_cand in db_candidates:
-                db_date = parse_date(db_cand.get("date"))
-                if db_date and abs((db_date - txn_date).days) <= 5:
-                    # Link found!
-                    txn["is_transfer"] = True
-                    txn["linked_tx_id"] = str(db_cand["_id"])
-                    
-                    # Update DB record
-                    await transactions_collection.update_one(
-                        {"_id": db_cand["_id"]},
-                        {"$set": {"is_transfer": True, "linked_tx_id": "PENDING_INSERTION"}} 
-                        # We don't know the new txn's ID yet. 
-                        # We'll need to handle this post-insertion or use a 2-step process.
-                        # For MVP, let's just link the new one to the old one.
-                        # To fully link back, we'd need the new ID.
-                    )
-                    break
+    # 1. Check within new batch (indexed, one-to-one)
+    for i, j in match_batch_transfers(new_transactions):
+        txn, candidate = new_transactions[i], new_transactions[j]
+        txn.update(link_fields(txn["_id"], candidate["_id"], candidate.get("account_name")))
+        candidate.update(link_fields(candidate["_id"], txn["_id"], txn.get("account_name")))
 
-app = FastAPI()
+    # 2. Check against database (rows not linked in batch)
+    bounds = candidate_window(new_transactions)
+    if not bounds:
+        return []
+    start, end, amounts = bounds
+
+    pipeline = [
+        {"$match": candidate_query(start, end, amounts)},
+        {"$project": {**SPEND_FIELDS, "account_name": 1}},
+    ]
+    db_candidates = await transactions_collection.aggregate(pipeline).to_list(length=None)
+
+    external_links = []
+    for i, j in match_external_transfers(new_transactions, db_candidates):
+        txn, db_cand = new_transactions[i], db_candidates[j]
+        txn.update(link_fields(txn["_id"], db_cand["_id"], db_cand.get("account_name")))
+        external_links.append((txn, db_cand))
+    return external_links
+
+# Extraction / command results are cached by content across requests and restarts
+# (the SQLite tier is opened by lifespan, so importing the app creates no file)
+llm_cache = ResultCache(memory_entries=Config.get_llm_cache_memory_entries())
+
+# LLM providers live for the whole app; .env edits are picked up on the fly
+llm_registry = ProviderRegistry(
+    # Instrumented below the cache, so only calls that reach the model are measured
+    wrap=lambda provider, key: CachedProvider(
+        InstrumentedProvider(provider, ":".join(key)), llm_cache, model_name=":".join(key)
+    ),
+)
+
+# Set at startup: whether upload writes can run inside a Mongo transaction
+transactions_supported = False
+
+# Stamped on this process's jobs; its spooled uploads live in a directory of
+# the same name, so other server processes leave both alone
+INSTANCE_ID = new_owner_id()
+
+def spool_directory() -> str:
+    return os.path.join(Config.get_upload_spool_dir(), INSTANCE_ID)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, transactions_supported
+    # Created here, not at import, so loading the app opens no connections;
+    # a database bound beforehand (benchmarks, scripts) is used as is
+    owns_client = client is None
+    if owns_client:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        bind_database(AsyncIOMotorClient(Config.get_mongo_url(), event_listeners=[MongoCommandCounter()]))
+    if Config.get_llm_cache_path():
+        llm_cache.store = SQLiteStore(
+            Config.get_llm_cache_path(), Config.get_llm_cache_ttl(), Config.get_llm_cache_max_entries()
+        )
+    await ensure_indexes(transactions_collection)
+    transactions_supported = await supports_transactions(client)
+    await budget_tracker.ensure_indexes()
+    await budget_tracker.ensure_built(transactions_collection)
+    await upload_jobs.start()
+    await batch_jobs.start()
+    # Jobs of stopped processes were failed by start(); drop their files
+    clear_spool(Config.get_upload_spool_dir(), keep=await upload_jobs.live_owners())
+    try:
+        # Checked without creating the provider; its SDK loads on the first call
+        check_credentials()
+    except ValueError as e:
+        # Missing credentials should not stop the API from serving data
+        print(f"LLM provider not initialized: {e}")
+    yield
+    await upload_jobs.stop()
+    await batch_jobs.stop()
+    parse_pool.shutdown()
+    await llm_registry.aclose()
+    llm_cache.close()
+    if owns_client:
+        client.close()
+        client = None
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -106,13 +142,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag"],
 )
 
-# MongoDB
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.fintrack
-transactions_collection = db.transactions
+# Request timings, Mongo command counts and LLM usage, served on /metrics
+app.add_middleware(MetricsMiddleware, timing_headers=Config.get_timing_headers())
+
+# MongoDB: bound by bind_database, which the lifespan calls on startup
+client = None
+db = None
+transactions_collection = None
+recategorization_plans = None
+recategorization_undo = None
+category_rules = None
+jobs_collection = None
+budget_tracker = None
+
+def bind_database(new_client, database=None):
+    """Points the app's collections at `database` (default: the fintrack database)."""
+    global client, db, transactions_collection, recategorization_plans, recategorization_undo
+    global category_rules, jobs_collection, budget_tracker
+    client = new_client
+    db = database if database is not None else new_client.fintrack
+    transactions_collection = db.transactions
+    recategorization_plans = db.recategorizations
+    recategorization_undo = db.recategorization_undo
+    category_rules = db.category_rules
+    jobs_collection = db.jobs
+    upload_jobs.jobs = jobs_collection
+    batch_jobs.jobs = jobs_collection
+    budget_tracker = BudgetTracker(db.category_totals, db.budgets, db.budget_alerts)
 
 # Models
 class Transaction(BaseModel):
@@ -131,181 +190,973 @@ class ChatRequest(BaseModel):
     message: str
 
 class LinkRequest(BaseModel):
-    tx_id_1: str
-    tx_id_2: str
+    # One pair, or many in `pairs`
+    tx_id_1: Optional[str] = None
+    tx_id_2: Optional[str] = None
+    pairs: List[Tuple[str, str]] = []
 
 class UnlinkRequest(BaseModel):
-    tx_id: str
+    tx_id: Optional[str] = None
+    tx_ids: List[str] = []
+
+class RecategorizeRequest(BaseModel):
+    keyword: str
+    new_category: str
+
+class PlanRequest(BaseModel):
+    plan_id: str
+
+class BudgetRequest(BaseModel):
+    monthly_limit: float
+    thresholds: Optional[List[float]] = None
+
+class RuleRequest(BaseModel):
+    kind: str = "prefix"
+    pattern: str
+    category: str
 
 # Endpoints
 
+# Merchant/category names the chat retrieval matches questions against
+chat_vocabulary = Vocabulary()
+
+# Compiled merchant -> category rules, rebuilt only when the rule set changes
+rule_engine = RuleEngine()
+
+# Read responses, invalidated by version bumps from every write path
+read_cache = ReadCache(int(Config.get_read_cache_mb() * 2**20))
+
+async def cached_read(
+    request: Request,
+    endpoint: str,
+    scopes: Tuple[str, ...],
+    params: Dict[str, Any],
+    compute: Callable[[], Any],
+) -> Response:
+    """
+    Serves a read endpoint through the read cache. `params` are the resolved
+    inputs the result depends on; `compute` returns (body, extra headers).
+    A client already holding the current ETag gets a 304.
+    """
+    if not read_cache.enabled:
+        body, headers = await compute()
+        return JSONResponse(jsonable_encoder(body), headers=headers)
+    
+    versions = read_cache.versions_of(scopes)
+    key = read_cache.key(endpoint, params)
+    etag = read_cache.etag(key, versions)
+    # Browsers revalidate every time, and never get a stale copy
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        read_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    
+    entry = read_cache.get(key, versions)
+    if entry is None:
+        body, extra = await compute()
+        # Stored rendered, so a hit costs no serialization either
+        rendered = JSONResponse(jsonable_encoder(body)).body
+        entry = CachedResponse(etag, versions, rendered, tuple(extra.items()))
+        read_cache.put(key, scopes, entry)
+    return Response(entry.body, media_type="application/json", headers={**headers, **dict(entry.headers)})
+
 @app.get("/")
 async def root():
     return {"message": "FinTrackAI Backend is running"}
 
 @app.get("/config")
 async def get_config():
-    return {"llm_type": os.getenv("LLM_TYPE", "CLOUD")}
+    return {"llm_type": Config.get_llm_type()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**llm_cache.snapshot(), "reads": read_cache.snapshot()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of the in-process metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def upserted_rows(new_rows: List[Dict[str, Any]], result) -> List[Dict[str, Any]]:
+    # $setOnInsert carries each row's _id, so the upserted ids name the winners
+    upserted = set(result.upserted_ids.values())
+    return [txn for txn in new_rows if txn["_id"] in upserted]
+
+def settle_links(
+    new_rows: List[Dict[str, Any]],
+    inserted: List[Dict[str, Any]],
+    external_links: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+) -> Tuple[List[UpdateOne], List[Dict[str, Any]]]:
+    """
+    Link writes for the rows whose upsert won. A concurrent upload of the
+    same rows keeps its own copies, so an existing document is back-linked
+    only to an inserted row, and an inserted row whose in-batch partner was
+    not inserted is unlinked. Returns the writes and the existing documents
+    that were linked.
+    """
+    inserted_ids = {str(txn["_id"]) for txn in inserted}
+    batch_ids = {str(txn["_id"]) for txn in new_rows}
+    ops, linked_existing = [], []
+    for txn, db_cand in external_links:
+        if str(txn["_id"]) in inserted_ids:
+            ops.append(UpdateOne(
+                {"_id": db_cand["_id"]},
+                {"$set": link_fields(db_cand["_id"], txn["_id"], txn.get("account_name"))}
+            ))
+            linked_existing.append(db_cand)
+    for txn in inserted:
+        partner = txn.get("linked_tx_id")
+        if partner in batch_ids and partner not in inserted_ids:
+            ops.append(UpdateOne({"_id": txn["_id"]}, UNLINK))
+            txn.update(UNLINK["$set"])
+            for field in UNLINK["$unset"]:
+                txn.pop(field, None)
+    return ops, linked_existing
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    content = await file.read()
-    filename = file.filename
+async def write_transactions(
+    new_rows: List[Dict[str, Any]],
+    external_links: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Upserts a batch and then its link writes as one unit. Inside a
+    transaction when the server supports them (replica set); otherwise a
+    failure removes the rows this batch inserted and clears the links
+    pointing at them. Returns the rows that were inserted and the existing
+    documents that were linked to them.
+    """
+    # Upsert on the fingerprint (links already carry the real IDs); a
+    # concurrent upload of the same rows only ever inserts them once
+    upserts = [
+        UpdateOne({"fingerprint": txn["fingerprint"]}, {"$setOnInsert": txn}, upsert=True)
+        for txn in new_rows
+    ]
     
-    text_sample = ""
+    if transactions_supported:
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                result = await transactions_collection.bulk_write(upserts, ordered=False, session=session)
+                inserted = upserted_rows(new_rows, result)
+                link_ops, linked_existing = settle_links(new_rows, inserted, external_links)
+                if link_ops:
+                    await transactions_collection.bulk_write(link_ops, ordered=False, session=session)
+        return inserted, linked_existing
     
-    if filename.endswith(".csv"):
-        try:
-            df = pd.read_csv(io.BytesIO(content))
-            # Convert first 50 rows to string for LLM to parse
-            text_sample = df.head(50).to_string()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
-    elif filename.endswith(".xlsx") or filename.endswith(".xls"):
+    try:
+        result = await transactions_collection.bulk_write(upserts, ordered=False)
+        inserted = upserted_rows(new_rows, result)
+        # Back-link existing DB records to the new rows in one round-trip
+        link_ops, linked_existing = settle_links(new_rows, inserted, external_links)
+        if link_ops:
+            await transactions_collection.bulk_write(link_ops, ordered=False)
+        return inserted, linked_existing
+    except Exception:
+        # New rows have fresh ObjectIds, so this only touches this batch's writes
+        await remove_rows([txn["_id"] for txn in new_rows])
+        raise
+
+async def remove_rows(ids: List[ObjectId]):
+    """Deletes rows by id and clears the links that point at them."""
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        await transactions_collection.delete_many({"_id": {"$in": batch}})
+        await transactions_collection.update_many(
+            {"linked_tx_id": {"$in": [str(i) for i in batch]}},
+            UNLINK
+        )
+
+async def categorize_rows(rows: List[Dict[str, Any]]):
+    """Known merchants get the user's category, whatever the LLM guessed (or left null)."""
+    matcher = await rule_engine.refresh(category_rules)
+    matcher.apply(rows)
+    for txn in rows:
+        txn["category"] = txn.get("category") or "Other"
+
+async def rules_extraction_prompt() -> str:
+    matcher = await rule_engine.refresh(category_rules)
+    return extraction_prompt(matcher.known_merchants())
+
+async def ingest_chunk(rows: List[Dict[str, Any]], counter: OrdinalCounter,
+                       replay: Callable[[], OrdinalCounter]) -> Tuple[OrdinalCounter, List[ObjectId], int]:
+    """
+    Categorizes, de-duplicates, links and writes one chunk of an upload.
+    Returns the (possibly replaced) ordinal counter, ids of the rows inserted
+    and the number of alerts raised.
+    """
+    with stage("categorize"):
+        # Store dates as native datetimes so range queries use the index
+        for txn in rows:
+            normalize_date(txn)
+            annotate_merchant(txn)
+        await categorize_rows(rows)
+    
+    # Rows already stored (overlapping statements) are dropped before
+    # transfer matching so they can never pair with their own copies
+    with stage("deduplicate"):
         try:
-            df = pd.read_excel(io.BytesIO(content))
-            text_sample = df.head(50).to_string()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid Excel: {str(e)}")
-    else:
-        # Assume text
-        text_sample = content.decode("utf-8")[:5000] # Limit size
+            fingerprints = counter.assign(rows)
+        except OrderChanged:
+            # Unsorted file: recount the earlier chunks without dropping dates
+            counter = await asyncio.to_thread(replay)
+            fingerprints = counter.assign(rows)
+        stored = await existing_fingerprints(transactions_collection, fingerprints)
+        new_rows = [txn for txn in rows if txn["fingerprint"] not in stored]
+    
+    # Run Transfer Linking Logic; rows from earlier chunks are already in
+    # the database, so they pair through the external lookup
+    with stage("link"):
+        external_links = await identify_and_link_transfers(new_rows)
+    
+    inserted_rows, linked_existing = [], []
+    with read_cache.mutation(TRANSACTIONS):
+        if new_rows:
+            with stage("write"):
+                inserted_rows, linked_existing = await write_transactions(new_rows, external_links)
+        
+        # New spending, minus existing rows that turned out to be transfers
+        delta = SpendDelta()
+        for txn in inserted_rows:
+            delta.add(txn)
+        for doc in linked_existing:
+            delta.replace(doc, {"is_transfer": True})
+        with stage("budgets"):
+            alerts = await budget_tracker.apply(delta)
+    return counter, [txn["_id"] for txn in inserted_rows], len(alerts)
+
+def label_account(rows: List[Dict[str, Any]], account: Optional[str]):
+    """The account the uploader named wins over the layout default or the LLM's guess."""
+    if account:
+        for txn in rows:
+            txn["account_name"] = account
 
-    llm = get_llm_provider()
+async def process_upload(payload: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Upload job: the spooled file is read back in chunks of rows, and each
+    chunk is parsed (or extracted), categorized, de-duplicated, linked and
+    written before the next is read, so memory stays bounded by the chunk
+    size. Each chunk is written as it goes, so when a later chunk fails the
+    rows of the earlier ones are deleted again (and the links to them
+    cleared): a failed upload leaves nothing behind and can be retried.
+    """
+    path, filename, account = payload["path"], payload["filename"], payload.get("account")
+    chunk_rows = Config.get_upload_chunk_rows()
+    chunks = iter_upload(path, filename, chunk_rows, account)
+    counter = None
+    chunks_done = total = alerts = dropped = 0
+    inserted: List[ObjectId] = []
     try:
-        extracted_data = await llm.extract_data(text_sample, DATA_EXTRACTION_PROMPT)
-        
-        if extracted_data:
-            # Run Transfer Linking Logic
-            await identify_and_link_transfers(extracted_data)
+        while True:
+            await progress.update("parsing", total)
+            with stage("parse"):
+                chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            rows, text, chunk_dropped = chunk
+            dropped += chunk_dropped
+            known_layout = rows is not None
             
-            # Insert into DB
-            result = await transactions_collection.insert_many(extracted_data)
-            inserted_ids = result.inserted_ids
-            
-            # Post-processing: Resolve Temp IDs and Back-linking
-            for i, doc in enumerate(extracted_data):
-                doc_id = str(inserted_ids[i])
-                doc["_id"] = doc_id # Add ID for response
-                
-                # Resolve Batch Links
-                if doc.get("linked_tx_id") and doc["linked_tx_id"].startswith("TEMP_BATCH_"):
-                    target_index = int(doc["linked_tx_id"].split("_")[-1])
-                    target_real_id = str(inserted_ids[target_index])
-                    
-                    # Update this document in DB with real linked ID
-                    await transactions_collection.update_one(
-                        {"_id": inserted_ids[i]},
-                        {"$set": {"linked_tx_id": target_real_id}}
-                    )
-                    doc["linked_tx_id"] = target_real_id # Update for response
-                
-                # Resolve DB Links (Back-linking)
-                # If we linked to an existing DB record, we should update that record to point to us
-                elif doc.get("linked_tx_id") and not doc["linked_tx_id"].startswith("TEMP"):
-                     await transactions_collection.update_one(
-                        {"_id": ObjectId(doc["linked_tx_id"])},
-                        {"$set": {"linked_tx_id": doc_id}}
+            if not known_layout:
+                await progress.update("extracting", total)
+                with stage("extract"):
+                    rows = await extract_chunked(
+                        llm_registry.get(),
+                        text,
+                        await rules_extraction_prompt(),
+                        token_budget=Config.get_llm_chunk_tokens(),
+                        concurrency=Config.get_llm_concurrency(),
+                        on_chunk=lambda done, count: progress.update("extracting", done, count),
                     )
+                label_account(rows, account)
+            if counter is None:
+                # Only known layouts are replayable without calling the LLM again
+                counter = OrdinalCounter(bounded=known_layout)
+            
+            if rows:
+                await progress.update("writing", total)
+                counter, chunk_inserted, chunk_alerts = await ingest_chunk(
+                    rows, counter, lambda: replay_counter(path, filename, chunk_rows, chunks_done, account)
+                )
+                total += len(rows)
+                inserted += chunk_inserted
+                alerts += chunk_alerts
+            chunks_done += 1
+    except Exception:
+        if inserted:
+            print(f"Upload {filename} failed after {len(inserted)} rows; removing them")
+            with read_cache.mutation(TRANSACTIONS):
+                await remove_rows(inserted)
+                await budget_tracker.rebuild(transactions_collection)
+        raise
+    finally:
+        chunks.close()
+        os.remove(path)
+    
+    await progress.update("writing", total, total)
+    if dropped:
+        print(f"Upload {filename}: dropped {dropped} rows without a readable date or amount")
+    return {
+        "count": len(inserted),
+        "inserted": len(inserted),
+        "skipped": total - len(inserted),
+        "dropped": dropped,
+        "alerts": alerts,
+    }
 
-        return {"status": "success", "count": len(extracted_data), "data": extracted_data}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM Extraction failed: {str(e)}")
-
-@app.post("/chat")
-async def chat(request: ChatRequest):
-    llm = get_llm_provider()
+async def process_batch(payload: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Batch import job: archives are expanded, every file is parsed in the
+    process pool, and the combined rows are de-duplicated, transfer-matched
+    once and written with a single bulk write, so links between the files do
+    not depend on the order they arrive in. A file that cannot be read,
+    parsed or extracted (or an archive that cannot be opened) is reported in
+    the result and the rest are still imported.
+    """
+    directory = spool_directory()
+    accounts = payload.get("accounts") or {}
+    files = []
+    try:
+        await progress.update("parsing")
+        files, failed_archives = await asyncio.to_thread(expand_archives, payload["files"], directory)
+        await progress.update("parsing", 0, len(files))
+        with stage("parse"):
+            parsed = await parse_pool.read_all(files, accounts)
+        
+        summaries = [{"filename": filename, "rows": 0, "error": error} for filename, error in failed_archives]
+        batch: List[Dict[str, Any]] = []
+        for (filename, _), result in zip(files, parsed):
+            if isinstance(result, Exception):
+                summaries.append({"filename": filename, "rows": 0, "error": str(result)})
+                continue
+            rows, texts, dropped = result
+            if rows is None:
+                await progress.update("extracting")
+                rows = []
+                try:
+                    with stage("extract"):
+                        for text in texts:
+                            rows.extend(await extract_chunked(
+                                llm_registry.get(),
+                                text,
+                                await rules_extraction_prompt(),
+                                token_budget=Config.get_llm_chunk_tokens(),
+                                concurrency=Config.get_llm_concurrency(),
+                            ))
+                except Exception as e:
+                    print(f"Extraction failed for {filename}: {e}")
+                    summaries.append({"filename": filename, "rows": 0, "error": f"Extraction failed: {str(e)}"})
+                    continue
+                label_account(rows, accounts.get(filename))
+            for txn in rows:
+                normalize_date(txn)
+            # Ordinals are per file, exactly as if each were uploaded alone
+            fingerprint_batch(rows)
+            summaries.append({"filename": filename, "rows": len(rows), "dropped": dropped})
+            batch.extend(rows)
+    finally:
+        for _, path in files:
+            if os.path.exists(path):
+                os.remove(path)
     
-    # Check if it's a command
-    command = await llm.interpret_command(request.message)
+    await progress.update("categorizing", 0, len(batch))
+    with stage("categorize"):
+        for txn in batch:
+            annotate_merchant(txn)
+        await categorize_rows(batch)
     
-    if command and command.get("vendor_keyword") and command.get("new_category"):
-        keyword = command["vendor_keyword"]
-        new_category = command["new_category"]
+    # Overlapping statements in one batch share fingerprints; keep the first
+    await progress.update("deduplicating")
+    with stage("deduplicate"):
+        seen, unique = set(), []
+        for txn in batch:
+            if txn["fingerprint"] not in seen:
+                seen.add(txn["fingerprint"])
+                unique.append(txn)
+        stored = await existing_fingerprints(transactions_collection, [txn["fingerprint"] for txn in unique])
+        new_rows = [txn for txn in unique if txn["fingerprint"] not in stored]
+    
+    await progress.update("linking")
+    with stage("link"):
+        external_links = await identify_and_link_transfers(new_rows)
+    
+    inserted_rows, linked_existing = [], []
+    with read_cache.mutation(TRANSACTIONS):
+        if new_rows:
+            await progress.update("writing")
+            with stage("write"):
+                inserted_rows, linked_existing = await write_transactions(new_rows, external_links)
+        await progress.update("writing", len(batch), len(batch))
         
-        # Execute update
-        result = await transactions_collection.update_many(
-            {"description": {"$regex": keyword, "$options": "i"}},
-            {"$set": {"category": new_category}}
+        delta = SpendDelta()
+        for txn in inserted_rows:
+            delta.add(txn)
+        for doc in linked_existing:
+            delta.replace(doc, {"is_transfer": True})
+        with stage("budgets"):
+            alerts = await budget_tracker.apply(delta)
+    
+    inserted = len(inserted_rows)
+    return {
+        "count": inserted,
+        "inserted": inserted,
+        "skipped": len(batch) - inserted,
+        "dropped": sum(summary.get("dropped", 0) for summary in summaries),
+        "transfers_linked": sum(1 for txn in inserted_rows if txn.get("linked_tx_id")),
+        "alerts": len(alerts),
+        "files": summaries,
+    }
+
+upload_jobs = JobQueue(
+    jobs_collection,
+    process_upload,
+    workers=Config.get_upload_workers(),
+    max_pending=Config.get_upload_queue_size(),
+    owner=INSTANCE_ID,
+)
+
+@app.post("/upload", status_code=202)
+async def upload_file(file: UploadFile = File(...), account: Optional[str] = Form(None)):
+    """
+    Accepts the file and queues it; processing happens in the background.
+    Poll GET /jobs/{job_id} for progress and the inserted/skipped counts.
+    `account` names the account the statement belongs to, overriding the
+    bank layout's default (or the LLM's guess).
+    """
+    # Spooled to disk in blocks; the job streams it back in row chunks
+    path, size = await spool_upload(file, spool_directory())
+    try:
+        job_id = await upload_jobs.submit(
+            "upload", {"filename": file.filename, "path": path, "account": account},
+            filename=file.filename, size=size, account=account,
         )
-        
-        return {"response": f"Updated {result.modified_count} transactions matching '{keyword}' to category '{new_category}'."}
+    except QueueFull as e:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception:
+        os.remove(path)
+        raise
+    return {"status": "queued", "job_id": job_id}
+
+# Batch imports are heavy and parse in their own process pool; one at a time
+batch_jobs = JobQueue(
+    jobs_collection, process_batch, workers=1, max_pending=Config.get_upload_queue_size(), owner=INSTANCE_ID
+)
+parse_pool = ParsePool(Config.get_parse_workers())
+
+@app.post("/upload/batch", status_code=202)
+async def upload_batch(files: List[UploadFile] = File(...), accounts: Optional[str] = Form(None)):
+    """
+    Imports many statements (or zip archives of them) as one batch, with
+    transfers matched across all of them. Poll GET /jobs/{job_id}.
+    `accounts` is a JSON object mapping file names (archive members by
+    their own name) to the account each statement belongs to.
+    """
+    try:
+        account_map = json.loads(accounts) if accounts else {}
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid accounts: {str(e)}")
+    if not isinstance(account_map, dict) or not all(isinstance(v, str) for v in account_map.values()):
+        raise HTTPException(status_code=400, detail="accounts must map file names to account names")
     
-    # Normal Chat / RAG
-    # Simple RAG: Fetch recent transactions to give context
-    # In a real app, we'd do vector search or more sophisticated filtering
-    cursor = transactions_collection.find().sort("_id", -1).limit(20)
-    recent_txns = await cursor.to_list(length=20)
+    directory = spool_directory()
+    spooled = []
+    try:
+        for file in files:
+            path, size = await spool_upload(file, directory)
+            spooled.append({"filename": file.filename or "", "path": path, "size": size})
+        job_id = await batch_jobs.submit(
+            "upload_batch", {"files": [(f["filename"], f["path"]) for f in spooled], "accounts": account_map},
+            filenames=[f["filename"] for f in spooled], size=sum(f["size"] for f in spooled),
+        )
+    except QueueFull as e:
+        for f in spooled:
+            os.remove(f["path"])
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception:
+        for f in spooled:
+            os.remove(f["path"])
+        raise
+    return {"status": "queued", "job_id": job_id}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await jobs_collection.find_one({"_id": parse_object_id(job_id)})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job["_id"] = str(job["_id"])
+    return job
+
+CONFIRM_MESSAGES = {"yes", "y", "confirm", "apply", "do it", "go ahead", "ok"}
+UNDO_MESSAGES = {"undo", "undo that", "revert", "undo last change"}
+
+async def run_recategorization(operation: Callable[[SpendDelta], Awaitable[Any]]) -> Any:
+    """Runs a commit/undo and folds its category moves into the budget totals."""
+    delta = SpendDelta()
+    with read_cache.mutation(TRANSACTIONS):
+        try:
+            result = await operation(delta)
+        except Exception:
+            # Part of the change may have landed; recount rather than guess
+            await budget_tracker.rebuild(transactions_collection)
+            raise
+        await budget_tracker.apply(delta)
+    return result
+
+async def remember_recategorization(result: Dict[str, Any]):
+    """A confirmed recategorization becomes a rule for future imports."""
+    try:
+        await rule_engine.add_rule(category_rules, "prefix", result["keyword"], result["new_category"], source="recategorize")
+    except ValueError as e:
+        print(f"Could not store rule for '{result['keyword']}': {e}")
+
+async def apply_command(message: str, llm) -> str | None:
+    """
+    Handles bulk recategorization over chat: a command produces a preview,
+    "yes" commits the latest pending preview, "undo" reverts the last one.
+    Returns None when the message is not about recategorization.
+    """
+    normalized = " ".join(message.lower().strip(" .!").split())
+    
+    if normalized in CONFIRM_MESSAGES:
+        plan = await recategorize.latest_pending(recategorization_plans)
+        if plan:
+            result = await run_recategorization(lambda delta: recategorize.commit(
+                transactions_collection, recategorization_plans, recategorization_undo, plan["_id"], delta
+            ))
+            if result:
+                await remember_recategorization(result)
+                return (f"Updated {result['updated']} transactions matching '{result['keyword']}' "
+                        f"to category '{result['new_category']}'. Say 'undo' to revert.")
+    
+    if normalized in UNDO_MESSAGES:
+        plan = await recategorization_plans.find_one(
+            {"status": {"$in": ["applied", "failed"]}}, sort=[("claimed_at", -1)]
+        )
+        if plan:
+            restored = await run_recategorization(lambda delta: recategorize.undo(
+                transactions_collection, recategorization_plans, recategorization_undo, plan["_id"], delta
+            ))
+            return f"Reverted {restored} transactions matching '{plan['keyword']}'."
+    
+    command = await llm.interpret_command(message)
+    if not (command and command.get("vendor_keyword") and command.get("new_category")):
+        return None
+    keyword = command["vendor_keyword"]
+    new_category = command["new_category"]
     
-    context = f"Here are the user's recent transactions: {recent_txns}"
-    prompt = f"Context: {context}\n\nUser Question: {request.message}\n\nAnswer the user based on the context."
+    # Dry run first; nothing changes until the user confirms
+    plan = await recategorize.preview(transactions_collection, recategorization_plans, keyword, new_category)
+    if not plan or not plan["count"]:
+        return f"No transactions match '{keyword}'."
+    examples = "; ".join(f"{t['date']} {t['description']} ({t['category']})" for t in plan["sample"])
+    return (f"Found {plan['count']} transactions matching '{keyword}', e.g. {examples}. "
+            f"Reply 'yes' to change them to '{new_category}'.")
+
+async def build_chat_prompt(message: str) -> str:
+    # Targeted retrieval: parse dates/merchants/categories out of the question
+    # and hand the model pre-aggregated totals plus a compact row table
+    context = await retrieve_chat_context(
+        transactions_collection, chat_vocabulary, message, Config.get_chat_context_tokens()
+    )
+    today = datetime.now().strftime("%Y-%m-%d")
+    return (
+        f"Today is {today}. Amounts are signed: negative is money spent, positive is money received.\n\n"
+        f"Context:\n{context}\n\nUser Question: {message}\n\nAnswer the user based on the context."
+    )
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    llm = llm_registry.get()
     
-    response = await llm.generate_content(prompt)
+    # Check if it's a command
+    with stage("command"):
+        command_response = await apply_command(request.message, llm)
+    if command_response:
+        return {"response": command_response}
+    
+    # Normal Chat / RAG
+    with stage("retrieval"):
+        prompt = await build_chat_prompt(request.message)
+    with stage("generate"):
+        response = await llm.generate_content(prompt)
     return {"response": response}
 
+def sse_event(data: Dict[str, Any], event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same as /chat, delivered as Server-Sent Events: one `data: {"token": ...}`
+    event per chunk as the model produces it, then an `event: done`.
+    """
+    llm = llm_registry.get()
+
+    async def events():
+        with stage("command"):
+            command_response = await apply_command(request.message, llm)
+        if command_response:
+            yield sse_event({"token": command_response})
+        else:
+            with stage("retrieval"):
+                prompt = await build_chat_prompt(request.message)
+            async for token in llm.stream_content(prompt):
+                yield sse_event({"token": token})
+        yield sse_event({}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def parse_object_id(value: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid id: {value}")
+    return ObjectId(value)
+
+def parse_date_param(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if not parsed:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    return parsed
+
+def build_transaction_query(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    vendor: Optional[str],
+    category: Optional[str]
+) -> Dict[str, Any]:
+    query = {}
+    
+    for bound, value in (("$gte", start_date), ("$lte", end_date)):
+        if value:
+            query.setdefault("date", {})[bound] = parse_date_param(value)
+    if vendor:
+        # Resolved through the merchant-token index; input is never a raw regex
+        query.update(merchant_query(vendor) or {"merchant_tokens": {"$in": []}})
+    if category:
+        query["category"] = category
+    return query
+
 @app.get("/transactions")
 async def get_transactions(
+    request: Request,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    vendor: Optional[str] = None,
+    category: Optional[str] = None,
+    page_size: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Newest-first page of transactions. The body stays a plain list; when more
+    rows exist, the X-Next-Cursor header holds the value to pass as ?cursor=
+    for the next page.
+    """
+    query = build_transaction_query(start_date, end_date, vendor, category)
+    try:
+        if cursor:
+            query = after_cursor(query, decode_cursor(cursor))
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def compute():
+        headers = {}
+        # One extra row tells us whether another page exists
+        db_cursor = transactions_collection.find(query, projection).sort(SORT).limit(page_size + 1)
+        txns = await db_cursor.to_list(length=page_size + 1)
+        if len(txns) > page_size:
+            txns = txns[:page_size]
+            headers["X-Next-Cursor"] = encode_cursor(txns[-1])
+        # Convert ObjectId and datetime to strings
+        for txn in txns:
+            serialize_transaction(txn)
+        return txns, headers
+    
+    # Keyed on the resolved query, so equivalent filters share an entry
+    params = {"query": query, "projection": projection, "page_size": page_size}
+    return await cached_read(request, "transactions", (TRANSACTIONS,), params, compute)
+
+@app.get("/transactions/export")
+async def export_transactions(
+    format: str = "ndjson",
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     vendor: Optional[str] = None,
     category: Optional[str] = None
 ):
-    query = {}
+    """Streams every matching transaction as NDJSON or CSV, never holding the full set."""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    query = build_transaction_query(start_date, end_date, vendor, category)
+    db_cursor = transactions_collection.find(query).sort(SORT).batch_size(1000)
     
-    if start_date:
-        query.setdefault("date", {})["$gte"] = start_date
-    if end_date:
-        query.setdefault("date", {})["$lte"] = end_date
-    if vendor:
-        query["description"] = {"$regex": vendor, "$options": "i"}
-    if category:
-        query["category"] = category
-        
-    cursor = transactions_collection.find(query).sort("date", -1).limit(100)
-    txns = await cursor.to_list(length=100)
-    # Convert ObjectId to str
-    for txn in txns:
-        txn["_id"] = str(txn["_id"])
-    return txns
+    if format == "csv":
+        body, media_type = csv_rows(db_cursor), "text/csv"
+    else:
+        body, media_type = ndjson_rows(db_cursor), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"},
+    )
+
+# Analytics (aggregated server-side, transfers excluded, columnar JSON)
+
+@app.get("/analytics/monthly")
+async def analytics_monthly(
+    request: Request,
+    group_by: str = "category",
+    kind: str = "expense",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    if group_by not in analytics.GROUP_FIELDS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {list(analytics.GROUP_FIELDS)}")
+    if kind not in analytics.KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(analytics.KINDS)}")
+    start, end = parse_date_param(start_date), parse_date_param(end_date)
+    
+    async def compute():
+        pipeline = analytics.monthly_totals_pipeline(group_by, kind, start, end)
+        rows = await transactions_collection.aggregate(pipeline).to_list(length=None)
+        return {"group_by": group_by, "kind": kind, **analytics.pivot_monthly(rows)}, {}
+    
+    params = {"group_by": group_by, "kind": kind, "start": start, "end": end}
+    return await cached_read(request, "analytics/monthly", (TRANSACTIONS,), params, compute)
+
+@app.get("/analytics/cashflow")
+async def analytics_cashflow(request: Request, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    start, end = parse_date_param(start_date), parse_date_param(end_date)
+    
+    async def compute():
+        pipeline = analytics.cash_flow_pipeline(start, end)
+        rows = await transactions_collection.aggregate(pipeline).to_list(length=None)
+        return analytics.columnar_cash_flow(rows), {}
+    
+    params = {"start": start, "end": end}
+    return await cached_read(request, "analytics/cashflow", (TRANSACTIONS,), params, compute)
+
+@app.get("/analytics/top-vendors")
+async def analytics_top_vendors(
+    request: Request,
+    limit: int = 10,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    limit = max(1, min(limit, 100))
+    start, end = parse_date_param(start_date), parse_date_param(end_date)
+    
+    async def compute():
+        pipeline = analytics.top_vendors_pipeline(limit, start, end)
+        rows = await transactions_collection.aggregate(pipeline).to_list(length=None)
+        return analytics.columnar_vendors(rows), {}
+    
+    params = {"limit": limit, "start": start, "end": end}
+    return await cached_read(request, "analytics/top-vendors", (TRANSACTIONS,), params, compute)
 
 @app.delete("/transactions")
 async def clear_transactions():
-    result = await transactions_collection.delete_many({})
+    with read_cache.mutation(TRANSACTIONS):
+        result = await transactions_collection.delete_many({})
+        await budget_tracker.rebuild(transactions_collection)
     return {"message": f"Deleted {result.deleted_count} transactions"}
 
+# Bulk recategorization: preview -> commit -> (optional) undo
+
+@app.post("/recategorize/preview")
+async def recategorize_preview(request: RecategorizeRequest):
+    plan = await recategorize.preview(
+        transactions_collection, recategorization_plans, request.keyword, request.new_category
+    )
+    if plan is None:
+        raise HTTPException(status_code=400, detail="Keyword has no searchable characters")
+    return plan
+
+@app.post("/recategorize/commit")
+async def recategorize_commit(request: PlanRequest):
+    plan_id = parse_object_id(request.plan_id)
+    result = await run_recategorization(lambda delta: recategorize.commit(
+        transactions_collection, recategorization_plans, recategorization_undo, plan_id, delta
+    ))
+    if result is None:
+        raise HTTPException(status_code=409, detail="Preview not found or already applied")
+    await remember_recategorization(result)
+    return result
+
+@app.post("/recategorize/undo")
+async def recategorize_undo(request: PlanRequest):
+    plan_id = parse_object_id(request.plan_id)
+    restored = await run_recategorization(lambda delta: recategorize.undo(
+        transactions_collection, recategorization_plans, recategorization_undo, plan_id, delta
+    ))
+    if restored is None:
+        raise HTTPException(status_code=409, detail="Change not found or not applied")
+    return {"restored": restored}
+
+# Budgets: status reads the materialized per-category monthly totals
+
+def parse_month_param(value: Optional[str]) -> str:
+    if not value:
+        return month_key(datetime.now())
+    try:
+        return datetime.strptime(value, "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid month: {value} (expected YYYY-MM)")
+
+@app.get("/budgets")
+async def get_budgets(request: Request, month: Optional[str] = None):
+    month = parse_month_param(month)
+    
+    async def compute():
+        return await budget_tracker.status(month), {}
+    
+    # Spending totals move with the transactions, limits with the budgets
+    return await cached_read(request, "budgets", (TRANSACTIONS, BUDGETS), {"month": month}, compute)
+
+@app.get("/budgets/suggestions")
+async def get_budget_suggestions(request: Request, month: Optional[str] = None, years: int = Query(10, ge=1, le=30)):
+    """
+    Suggested limits per category for a month (default: the current one),
+    from up to `years` of non-transfer spending, with an 80% band.
+    """
+    month = parse_month_param(month)
+    
+    async def compute():
+        # pandas is loaded here on first use rather than at startup
+        import pandas as pd
+        from core import suggestions
+        
+        target = pd.Period(month, freq="M")
+        end = target.start_time.to_pydatetime()
+        start = (target - 12 * years).start_time.to_pydatetime()
+        frame = await suggestions.load_history(transactions_collection, start, end)
+        return suggestions.suggest_budgets(frame, target), {}
+    
+    params = {"month": month, "years": years}
+    return await cached_read(request, "budgets/suggestions", (TRANSACTIONS,), params, compute)
+
+@app.put("/budgets/{category}")
+async def set_budget(category: str, request: BudgetRequest):
+    try:
+        with read_cache.mutation(BUDGETS):
+            return await budget_tracker.set_budget(category, request.monthly_limit, request.thresholds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/budgets/{category}")
+async def delete_budget(category: str):
+    with read_cache.mutation(BUDGETS):
+        result = await budget_tracker.budgets.delete_one({"category": category})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return {"message": "Budget deleted"}
+
+@app.get("/alerts")
+async def get_alerts(month: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    query = {"month": parse_month_param(month)} if month else {}
+    alerts = await budget_tracker.alerts.find(query).sort("created_at", -1).limit(limit).to_list(length=limit)
+    for alert in alerts:
+        alert["_id"] = str(alert["_id"])
+    return alerts
+
+# Merchant -> category rules applied at ingest
+
+@app.get("/rules")
+async def list_rules():
+    rules = await category_rules.find().sort("created_at", -1).to_list(length=None)
+    for rule in rules:
+        serialize_transaction(rule) # String ID and dates
+    return rules
+
+@app.post("/rules")
+async def create_rule(request: RuleRequest):
+    try:
+        rule = await rule_engine.add_rule(category_rules, request.kind, request.pattern, request.category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return serialize_transaction(rule)
+
+@app.delete("/rules/{rule_id}")
+async def delete_rule(rule_id: str):
+    result = await category_rules.delete_one({"_id": parse_object_id(rule_id)})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return {"message": "Rule deleted"}
+
+async def apply_link_ops(ops: List[UpdateOne]):
+    """Link changes land together: one bulk_write, in a transaction when available."""
+    if not ops:
+        return
+    if transactions_supported:
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                await transactions_collection.bulk_write(ops, ordered=False, session=session)
+    else:
+        await transactions_collection.bulk_write(ops, ordered=False)
+
 @app.post("/transfers/link")
 async def link_transfers(request: LinkRequest):
-    # Update both to point to each other and set is_transfer=True
-    await transactions_collection.update_one(
-        {"_id": ObjectId(request.tx_id_1)},
-        {"$set": {"is_transfer": True, "linked_tx_id": request.tx_id_2}}
-    )
-    await transactions_collection.update_one(
-        {"_id": ObjectId(request.tx_id_2)},
-        {"$set": {"is_transfer": True, "linked_tx_id": request.tx_id_1}}
-    )
-    return {"message": "Transactions linked successfully"}
+    pairs = list(request.pairs)
+    if request.tx_id_1 or request.tx_id_2:
+        pairs.append((request.tx_id_1 or "", request.tx_id_2 or ""))
+    if not pairs:
+        raise HTTPException(status_code=400, detail="No transactions to link")
+    try:
+        ops, delta = await plan_links(transactions_collection, pairs)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    with read_cache.mutation(TRANSACTIONS):
+        await apply_link_ops(ops)
+        # Transfers are not spending; released partners count again
+        await budget_tracker.apply(delta)
+    return {"message": "Transactions linked successfully", "linked": len(pairs)}
 
 @app.post("/transfers/unlink")
 async def unlink_transfers(request: UnlinkRequest):
-    # Get the transaction to find its partner
-    txn = await transactions_collection.find_one({"_id": ObjectId(request.tx_id)})
-    if not txn:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+    tx_ids = list(dict.fromkeys(request.tx_ids + ([request.tx_id] if request.tx_id else [])))
+    if not tx_ids:
+        raise HTTPException(status_code=400, detail="No transactions to unlink")
+    try:
+        ops, delta = await plan_unlinks(transactions_collection, tx_ids)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    partner_id = txn.get("linked_tx_id")
+    with read_cache.mutation(TRANSACTIONS):
+        await apply_link_ops(ops)
+        await budget_tracker.apply(delta)
+    return {"message": "Transactions unlinked successfully"}
+
+@app.post("/transfers/repair")
+async def repair_transfers(dry_run: bool = False):
+    """
+    Clears dangling and one-sided links and backfills pair keys on healthy
+    pairs (including links made before pair keys existed).
+    """
+    ops, delta, report = await audit_links(transactions_collection)
+    if not dry_run:
+        with read_cache.mutation(TRANSACTIONS):
+            await apply_link_ops(ops)
+            await budget_tracker.apply(delta)
+    return {**report, "updated": 0 if dry_run else len(ops), "dry_run": dry_run}
+
+@app.get("/transfers/flows")
+async def transfer_flows(request: Request, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """Money moved between accounts, from linked transfers only."""
+    start, end = parse_date_param(start_date), parse_date_param(end_date)
     
-    # Unlink self
-    await transactions_collection.update_one(
-        {"_id": ObjectId(request.tx_id)},
-        {"$set": {"is_transfer": False, "linked_tx_id": None}}
-    )
+    async def compute():
+        rows = await transactions_collection.aggregate(flows_pipeline(start, end)).to_list(length=None)
+        return columnar_flows(rows), {}
     
-    # Unlink partner if exists
-    if partner_id:
-        await transactions_collection.update_one(
-            {"_id": ObjectId(partner_id)},
-            {"$set": {"is_transfer": False, "linked_tx_id": None}}
-        )
-        
-    return {"message": "Transactions unlinked successfully"}
+    return await cached_read(request, "transfers/flows", (TRANSACTIONS,), {"start": start, "end": end}, compute)
@@ -0,0 +1,150 @@
+"""
+One-shot migration: rewrites string `date` fields as native datetimes,
+backfills normalized merchant keys and row fingerprints, and creates the
+transaction indexes.
+
+Usage (from backend/):
+    python migrate_dates.py [--batch-size 1000] [--dry-run]
+
+Safe to re-run; only documents whose date is still a string, or that have
+no merchant key or fingerprint yet, are touched.
+"""
+import argparse
+
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from core.config import Config
+from core.dates import parse_date
+from core.merchants import annotate_merchant
+from core.db import TRANSACTION_INDEXES
+from core.fingerprints import fingerprint, row_identity
+
+
+def migrate(collection, batch_size: int = 1000, dry_run: bool = False):
+    converted = unparseable = 0
+    last_id = None
+
+    while True:
+        # Walk by _id so each batch is an index range scan and the run is resumable
+        query = {"date": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {"date": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            parsed = parse_date(doc["date"])
+            if parsed is None:
+                unparseable += 1
+                continue
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"date": parsed}}))
+
+        if ops and not dry_run:
+            collection.bulk_write(ops, ordered=False)
+        converted += len(ops)
+        print(f"Converted {converted} documents ({unparseable} unparseable)...")
+
+    return converted, unparseable
+
+
+def backfill_merchant_keys(collection, batch_size: int = 1000, dry_run: bool = False):
+    updated = 0
+    last_id = None
+
+    while True:
+        query = {"merchant_key": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {"description": 1, "merchant": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            fields = annotate_merchant({"description": doc.get("description"), "merchant": doc.get("merchant")})
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                "merchant_key": fields["merchant_key"],
+                "merchant_tokens": fields["merchant_tokens"],
+            }}))
+
+        if not dry_run:
+            collection.bulk_write(ops, ordered=False)
+        updated += len(ops)
+        print(f"Merchant keys for {updated} documents...")
+
+    return updated
+
+
+def backfill_fingerprints(collection, batch_size: int = 1000, dry_run: bool = False):
+    """
+    Fingerprints rows stored before idempotent ingest. Repeats are numbered
+    in _id (insertion) order, as they would have been within one file. Rows
+    whose fingerprint is already taken are earlier duplicates; they are left
+    unfingerprinted and counted so they can be reviewed.
+    """
+    updated = duplicates = 0
+    ordinals = {}
+    last_id = None
+    projection = {"account_name": 1, "date": 1, "amount": 1, "description": 1}
+
+    while True:
+        query = {"fingerprint": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            identity = row_identity(doc)
+            ordinal = ordinals.get(identity, 0)
+            ordinals[identity] = ordinal + 1
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"fingerprint": fingerprint(identity, ordinal)}}))
+
+        if not dry_run:
+            try:
+                collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                duplicates += len(e.details.get("writeErrors", []))
+        updated += len(ops)
+        print(f"Fingerprints for {updated} documents ({duplicates} duplicates)...")
+
+    return updated, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = MongoClient(Config.get_mongo_url())
+    collection = client.fintrack.transactions
+
+    converted, unparseable = migrate(collection, args.batch_size, args.dry_run)
+    print(f"Done: {converted} converted, {unparseable} left as strings.")
+
+    keyed = backfill_merchant_keys(collection, args.batch_size, args.dry_run)
+    print(f"Done: merchant keys added to {keyed} documents.")
+
+    if not args.dry_run:
+        # Needed before the backfill so duplicate fingerprints are rejected
+        collection.create_index([("fingerprint", ASCENDING)], unique=True, sparse=True)
+    fingerprinted, duplicates = backfill_fingerprints(collection, args.batch_size, args.dry_run)
+    print(f"Done: fingerprints added to {fingerprinted - duplicates} documents, {duplicates} duplicates found.")
+
+    if not args.dry_run:
+        for keys in TRANSACTION_INDEXES:
+            collection.create_index(keys)
+        print("Indexes ensured.")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,23 @@ Ignore header lines or footer lines that are not transactions.
 Output ONLY the valid JSON list.
 """
 
+# Appended when the user's category rules already cover some merchants
+KNOWN_MERCHANTS_NOTE = """
+The user has already categorized the merchants below (lowercase phrases as they
+appear in descriptions). For a transaction whose description contains one of
+them, output "category": null instead of inferring one.
+{merchants}
+"""
+
+
+def extraction_prompt(known_merchants):
+    """DATA_EXTRACTION_PROMPT, telling the model which merchants need no category."""
+    if not known_merchants:
+        return DATA_EXTRACTION_PROMPT
+    return DATA_EXTRACTION_PROMPT + KNOWN_MERCHANTS_NOTE.format(
+        merchants="\n".join(f"- {merchant}" for merchant in known_merchants)
+    )
+
 COMMAND_INTERPRETER_PROMPT = """
 You are a command interpreter for a finance tracker.
 Analyze the user's message to see if it is a request to update transaction categories in bulk.
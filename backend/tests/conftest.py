@@ -0,0 +1,109 @@
+"""
+Shared fixtures: the app bound to an in-memory mongomock database, with a
+fake LLM for statements that are not in a known layout.
+"""
+import csv
+import io
+import os
+import tempfile
+import time
+
+# Settings are read on first use, so these hold for the whole session
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["LLM_TYPE"] = "LOCAL"
+os.environ["UPLOAD_SPOOL_DIR"] = tempfile.mkdtemp(prefix="fintrack-test-uploads-")
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import main
+from core.llm import LLMProvider
+from core.llm_cache import CachedProvider, ResultCache
+from core.read_cache import ReadCache
+
+
+BOA_CSV = (
+    b"Date,Description,Amount\n"
+    b"01/02/2024,WHOLE FOODS MARKET,-54.20\n"
+    b"01/03/2024,PAYROLL DEPOSIT,2500.00\n"
+    b"01/05/2024,SHELL OIL 1234,-40.00\n"
+)
+# Two legs of one transfer, in a layout only the (fake) LLM reads
+A_TXT = b"date,description,amount,account_name\n2024-01-02,TRANSFER TO SAVINGS,-100.00,Checking\n"
+B_TXT = b"date,description,amount,account_name\n2024-01-03,TRANSFER FROM CHECKING,100.00,Savings\n"
+
+
+class FakeProvider(LLMProvider):
+    """Reads `date,description,amount,account_name` CSV text, as the LLM would."""
+
+    def __init__(self):
+        self.extract_calls = 0
+        self.prompts = []
+
+    async def generate_content(self, prompt: str) -> str:
+        return ""
+
+    async def extract_data(self, raw_text, prompt_template):
+        self.extract_calls += 1
+        self.prompts.append(prompt_template)
+        return [
+            {
+                "date": row["date"],
+                "description": row["description"],
+                "amount": float(row["amount"]),
+                "type": "expense" if float(row["amount"]) < 0 else "income",
+                "category": "Other",
+                "account_name": row["account_name"],
+                "potential_transfer": "TRANSFER" in row["description"].upper(),
+            }
+            for row in csv.DictReader(io.StringIO(raw_text))
+        ]
+
+    async def interpret_command(self, user_message):
+        return None
+
+
+@pytest.fixture
+def mongo():
+    client = AsyncMongoMockClient()
+    main.bind_database(client)
+    # Responses cached by an earlier test must not leak into this database
+    main.read_cache = ReadCache(main.read_cache.max_bytes)
+    yield client
+    main.client = None
+
+
+@pytest.fixture
+def app(mongo):
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    provider = FakeProvider()
+    cached = CachedProvider(provider, ResultCache(), model_name="fake")
+    monkeypatch.setattr(main.llm_registry, "get", lambda: cached)
+    return provider
+
+
+def wait_for_job(app, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = app.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def upload(app, filename: str, content: bytes) -> dict:
+    response = app.post("/upload", files={"file": (filename, content)})
+    assert response.status_code == 202, response.text
+    return wait_for_job(app, response.json()["job_id"])
+
+
+def find(app, query=None):
+    """Stored transactions, read straight from the database."""
+    return app.portal.call(lambda: main.transactions_collection.find(query or {}).to_list(length=None))
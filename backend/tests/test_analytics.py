@@ -0,0 +1,77 @@
+"""Analytics: pipeline filters, end-to-end top vendors and columnar reshaping."""
+from datetime import datetime
+
+import main
+from core import analytics
+
+
+def test_base_match_skips_transfers_and_undated_rows():
+    start, end = datetime(2024, 1, 1), datetime(2024, 3, 31)
+    assert analytics.base_match(start, end, "expense") == {
+        "date": {"$type": "date", "$gte": start, "$lte": end},
+        "is_transfer": {"$ne": True},
+        "amount": {"$lt": 0},
+    }
+    assert analytics.base_match(None, None, "income")["amount"] == {"$gt": 0}
+    assert "amount" not in analytics.base_match(None, None, "all")
+
+
+def test_monthly_pipeline_groups_in_mongo_by_month_and_key():
+    match, group, sort = analytics.monthly_totals_pipeline("account", "all", None, None)
+    assert match == {"$match": analytics.base_match(None, None, "all")}
+    assert group["$group"]["_id"] == {
+        "month": {"$dateTrunc": {"date": "$date", "unit": "month"}}, "key": "$account_name",
+    }
+    # "all" stays signed; spending is reported as a magnitude
+    assert group["$group"]["total"] == {"$sum": "$amount"}
+    expense_group = analytics.monthly_totals_pipeline("category", "expense", None, None)[1]["$group"]
+    assert expense_group["total"] == {"$sum": {"$abs": "$amount"}}
+    assert sort == {"$sort": {"_id.month": 1}}
+
+
+def test_pivot_monthly_fills_missing_months_with_zero():
+    rows = [
+        {"_id": {"month": datetime(2024, 1, 1), "key": "Food"}, "total": 10.004},
+        {"_id": {"month": datetime(2024, 2, 1), "key": "Rent"}, "total": 900},
+        {"_id": {"month": datetime(2024, 2, 1), "key": None}, "total": 5},
+        {"_id": {"month": datetime(2024, 3, 1), "key": "Food"}, "total": 12.5},
+    ]
+    assert analytics.pivot_monthly(rows) == {
+        "months": ["2024-01", "2024-02", "2024-03"],
+        "series": {"Food": [10.0, 0.0, 12.5], "Rent": [0.0, 900.0, 0.0], "Unknown": [0.0, 5.0, 0.0]},
+    }
+
+
+def test_columnar_cash_flow_nets_income_and_expenses():
+    rows = [{"_id": datetime(2024, 1, 1), "income": 2500, "expenses": 1200.555},
+            {"_id": datetime(2024, 2, 1), "income": 0, "expenses": 80}]
+    assert analytics.columnar_cash_flow(rows) == {
+        "months": ["2024-01", "2024-02"], "income": [2500.0, 0.0], "expenses": [1200.56, 80.0], "net": [1299.44, -80.0],
+    }
+
+
+def seed(app, docs):
+    app.portal.call(lambda: main.transactions_collection.insert_many(docs))
+
+
+def test_top_vendors_endpoint(app):
+    seed(app, [
+        {"date": datetime(2024, 1, 3), "amount": -50.0, "merchant": "Whole Foods", "description": "WHOLE FOODS #1"},
+        {"date": datetime(2024, 1, 20), "amount": -30.0, "merchant": "Whole Foods", "description": "WHOLE FOODS #2"},
+        {"date": datetime(2024, 1, 5), "amount": -60.0, "description": "CORNER SHOP"},
+        {"date": datetime(2024, 2, 1), "amount": -20.0, "merchant": "Shell", "description": "SHELL"},
+        # Not spending: income, a linked transfer, and a row whose date was never parsed
+        {"date": datetime(2024, 1, 6), "amount": 2500.0, "merchant": "Employer", "description": "PAYROLL"},
+        {"date": datetime(2024, 1, 7), "amount": -500.0, "merchant": "Savings", "is_transfer": True},
+        {"date": "01/08/2024", "amount": -999.0, "merchant": "Unparsed", "description": "UNPARSED"},
+    ])
+    assert app.get("/analytics/top-vendors").json() == {
+        "merchant": ["Whole Foods", "CORNER SHOP", "Shell"], "total": [80.0, 60.0, 20.0], "count": [2, 1, 1],
+    }
+    limited = app.get("/analytics/top-vendors", params={"limit": 1, "end_date": "2024-01-10"}).json()
+    assert limited == {"merchant": ["CORNER SHOP"], "total": [60.0], "count": [1]}
+
+
+def test_invalid_group_and_kind_are_rejected(app):
+    assert app.get("/analytics/monthly", params={"group_by": "color"}).status_code == 400
+    assert app.get("/analytics/monthly", params={"kind": "refunds"}).status_code == 400
@@ -0,0 +1,95 @@
+"""Batch imports: one bad file is reported and the rest still import."""
+import io
+import zipfile
+
+import pytest
+
+from core import uploads
+from tests.conftest import A_TXT, B_TXT, BOA_CSV, find, wait_for_job
+
+
+def upload_batch(app, files):
+    response = app.post("/upload/batch", files=[("files", f) for f in files])
+    assert response.status_code == 202, response.text
+    return wait_for_job(app, response.json()["job_id"], timeout=60)
+
+
+def zipped(**members: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_corrupt_zip_is_reported_and_batch_continues(app):
+    job = upload_batch(app, [
+        ("broken.zip", b"PK\x03\x04 not really a zip"),
+        ("statements.zip", zipped(**{"boa.csv": BOA_CSV})),
+    ])
+
+    assert job["status"] == "succeeded"
+    files = {summary["filename"]: summary for summary in job["result"]["files"]}
+    assert "Invalid zip archive" in files["broken.zip"]["error"]
+    assert files["boa.csv"]["rows"] == 3
+    assert job["result"]["inserted"] == 3
+    assert len(find(app)) == 3
+
+
+def test_failed_extraction_is_reported_and_batch_continues(app, fake_llm, monkeypatch):
+    original = fake_llm.extract_data
+
+    async def extract_data(raw_text, prompt_template):
+        if "Savings" in raw_text:
+            raise RuntimeError("model unavailable")
+        return await original(raw_text, prompt_template)
+
+    monkeypatch.setattr(fake_llm, "extract_data", extract_data)
+    job = upload_batch(app, [("B.txt", B_TXT), ("A.txt", A_TXT)])
+
+    assert job["status"] == "succeeded"
+    files = {summary["filename"]: summary for summary in job["result"]["files"]}
+    assert "model unavailable" in files["B.txt"]["error"]
+    assert files["A.txt"]["rows"] == 1
+    assert [doc["account_name"] for doc in find(app)] == ["Checking"]
+
+
+def test_archives_over_the_size_caps_are_rejected_before_extraction(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_MEMBER_BYTES", 1000)
+    monkeypatch.setattr(uploads, "MAX_ARCHIVE_BYTES", 1500)
+    # Zeros compress to almost nothing: a small archive that expands a lot
+    archives = {
+        "ok.zip": zipped(**{"a.csv": b"0" * 900}),
+        "bomb.zip": zipped(**{"a.csv": b"0" * 5000}),
+        "many.zip": zipped(**{"a.csv": b"0" * 800, "b.csv": b"0" * 800}),
+    }
+    files = []
+    for name, content in archives.items():
+        path = tmp_path / name
+        path.write_bytes(content)
+        files.append((name, str(path)))
+    extract_dir = tmp_path / "out"
+    extract_dir.mkdir()
+
+    assert len(archives["bomb.zip"]) < 200
+    expanded, failed = uploads.expand_archives(files, str(extract_dir))
+
+    assert [name for name, _ in expanded] == ["a.csv"]
+    errors = dict(failed)
+    assert "expands to 5000 bytes (limit 1000)" in errors["bomb.zip"]
+    assert "members expand to 1600 bytes (limit 1500)" in errors["many.zip"]
+    # Only the accepted member was written
+    assert len(list(extract_dir.iterdir())) == 1
+
+
+def test_member_yielding_more_than_declared_is_cut_off():
+    info = zipfile.ZipInfo("lying.csv")
+    info.file_size = 10
+    out = io.BytesIO()
+    with pytest.raises(ValueError, match="larger than its declared 10 bytes"):
+        uploads._copy_member(io.BytesIO(b"x" * (10 * uploads.SPOOL_BLOCK_SIZE)), out, info)
+    assert len(out.getvalue()) <= 10
+
+    exact = io.BytesIO()
+    uploads._copy_member(io.BytesIO(b"y" * 10), exact, info)
+    assert exact.getvalue() == b"y" * 10
@@ -0,0 +1,123 @@
+"""Budget totals follow every write path, and each threshold alerts once."""
+import pytest
+from bson import ObjectId
+
+import main
+from tests.conftest import A_TXT, B_TXT, find, upload
+
+GROCERIES_CSV = (
+    b"Date,Description,Amount\n"
+    b"01/02/2024,WHOLE FOODS MARKET,-54.20\n"
+    b"01/09/2024,WHOLE FOODS MARKET,-30.00\n"
+    b"01/03/2024,PAYROLL DEPOSIT,2500.00\n"
+    b"02/05/2024,WHOLE FOODS MARKET,-12.00\n"
+)
+
+
+def spent(app, category, month="2024-01"):
+    rows = app.get("/budgets", params={"month": month}).json()
+    return next(row["spent"] for row in rows if row["category"] == category)
+
+
+def totals(app):
+    docs = app.portal.call(lambda: main.budget_tracker.totals.find({}, {"_id": 1, "spent_cents": 1, "count": 1})
+                           .to_list(length=None))
+    # Zeroed entries are left behind by $inc; they mean the same as no entry
+    return sorted((d["_id"]["category"], d["_id"]["month"], d["spent_cents"], d["count"])
+                  for d in docs if d["spent_cents"] or d["count"])
+
+
+def assert_matches_rebuild(app):
+    incremental = totals(app)
+    app.portal.call(lambda: main.budget_tracker.rebuild(main.transactions_collection))
+    assert totals(app) == incremental
+
+
+def alerts(app, month="2024-01"):
+    return sorted((a["category"], a["threshold"]) for a in app.get("/alerts", params={"month": month}).json())
+
+
+def test_totals_and_alerts_through_insert_recategorize_and_delete(app):
+    assert app.put("/budgets/Groceries", json={"monthly_limit": 100}).status_code == 200
+    upload(app, "groceries.csv", GROCERIES_CSV)
+    assert_matches_rebuild(app)
+    assert spent(app, "Groceries") == 0.0
+
+    plan = app.post("/recategorize/preview", json={"keyword": "whole foods", "new_category": "Groceries"}).json()
+    assert app.post("/recategorize/commit", json={"plan_id": plan["preview_id"]}).status_code == 200
+    assert spent(app, "Groceries") == 84.2
+    assert spent(app, "Groceries", "2024-02") == 12.0
+    assert_matches_rebuild(app)
+    # 84% of the limit: the 75% threshold fires, 100% does not
+    assert alerts(app) == [("Groceries", 0.75)]
+
+    # Undo moves the spending back; the alert already fired stays, once
+    assert app.post("/recategorize/undo", json={"plan_id": plan["preview_id"]}).status_code == 200
+    assert spent(app, "Groceries") == 0.0
+    assert_matches_rebuild(app)
+
+    # A rule categorizes the next upload at ingest; it crosses 100%
+    app.post("/rules", json={"kind": "prefix", "pattern": "whole foods", "category": "Groceries"})
+    upload(app, "more.csv", b"Date,Description,Amount\n01/20/2024,WHOLE FOODS MARKET #2,-20.00\n")
+    assert spent(app, "Groceries") == 20.0
+    plan = app.post("/recategorize/preview", json={"keyword": "whole foods", "new_category": "Groceries"}).json()
+    app.post("/recategorize/commit", json={"plan_id": plan["preview_id"]})
+    assert spent(app, "Groceries") == 104.2
+    assert_matches_rebuild(app)
+    assert alerts(app) == [("Groceries", 0.75), ("Groceries", 1.0)]
+
+    app.delete("/transactions")
+    assert spent(app, "Groceries") == 0.0
+    assert totals(app) == []
+
+
+def test_transfers_stop_counting_as_spending_when_linked(app, fake_llm):
+    app.put("/budgets/Other", json={"monthly_limit": 1000})
+    upload(app, "A.txt", A_TXT)
+    # An unmatched transfer leg is still spending
+    assert spent(app, "Other") == 100.0
+
+    # Its partner arrives and the pair is linked
+    upload(app, "B.txt", B_TXT)
+    assert spent(app, "Other") == 0.0
+    assert_matches_rebuild(app)
+
+    a = find(app, {"account_name": "Checking"})[0]
+    b = find(app, {"account_name": "Savings"})[0]
+    assert app.post("/transfers/unlink", json={"tx_id": str(a["_id"])}).status_code == 200
+    assert spent(app, "Other") == 100.0
+    assert_matches_rebuild(app)
+
+    assert app.post("/transfers/link", json={"tx_id_1": str(a["_id"]), "tx_id_2": str(b["_id"])}).status_code == 200
+    assert spent(app, "Other") == 0.0
+    assert_matches_rebuild(app)
+
+
+def test_budget_validation(app):
+    assert app.put("/budgets/Food", json={"monthly_limit": 0}).status_code == 400
+    assert app.put("/budgets/Food", json={"monthly_limit": 10, "thresholds": [0.5, -1]}).status_code == 400
+    assert app.delete(f"/budgets/{ObjectId()}").status_code == 404
+
+
+def test_failed_rebuild_keeps_the_old_totals(app, monkeypatch):
+    upload(app, "groceries.csv", GROCERIES_CSV)
+    before = totals(app)
+    assert before
+
+    async def fail(self, *args, **kwargs):
+        raise RuntimeError("disk full")
+
+    # Breaks writing the staging collection, as a crash midway through would
+    monkeypatch.setattr(type(main.budget_tracker.totals), "insert_many", fail)
+    with pytest.raises(RuntimeError):
+        app.portal.call(lambda: main.budget_tracker.rebuild(main.transactions_collection))
+    monkeypatch.undo()
+
+    assert totals(app) == before
+    names = app.portal.call(main.db.list_collection_names)
+    assert not [name for name in names if "_rebuild_" in name]
+
+    app.portal.call(lambda: main.budget_tracker.rebuild(main.transactions_collection))
+    assert totals(app) == before
+    assert not [name for name in app.portal.call(main.db.list_collection_names) if "_rebuild_" in name]
+    assert "_id.month_1" in app.portal.call(main.budget_tracker.totals.index_information)
@@ -0,0 +1,60 @@
+"""Chat answers streamed as Server-Sent Events."""
+import json
+
+import main
+from tests.conftest import FakeProvider
+
+
+class StreamingProvider(FakeProvider):
+    tokens = ["Spent ", "$54.20\n\n", "event: fake", ' on "food".']
+
+    def __init__(self):
+        super().__init__()
+        self.stream_prompts = []
+
+    async def stream_content(self, prompt):
+        self.stream_prompts.append(prompt)
+        for token in self.tokens:
+            yield token
+
+
+def parse_events(body: str):
+    """(event name, data) per SSE event; events end with a blank line."""
+    assert body.endswith("\n\n")
+    events = []
+    for block in body[:-2].split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        assert set(fields) <= {"event", "data"}
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+def test_stream_frames_each_token_then_done(app, monkeypatch):
+    provider = StreamingProvider()
+    monkeypatch.setattr(main.llm_registry, "get", lambda: provider)
+
+    response = app.post("/chat/stream", json={"message": "How much did I spend on food?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    events = parse_events(response.text)
+    # Newlines and "event:" inside a token stay inside its JSON payload
+    assert events[:-1] == [("message", {"token": token}) for token in StreamingProvider.tokens]
+    assert events[-1] == ("done", {})
+    assert "How much did I spend on food?" in provider.stream_prompts[0]
+
+
+def test_command_reply_is_one_event(app, monkeypatch):
+    provider = StreamingProvider()
+
+    async def interpret_command(message):
+        return {"vendor_keyword": "walmart", "new_category": "Groceries"}
+
+    provider.interpret_command = interpret_command
+    monkeypatch.setattr(main.llm_registry, "get", lambda: provider)
+
+    events = parse_events(app.post("/chat/stream", json={"message": "Change Walmart to Groceries"}).text)
+
+    assert events == [("message", {"token": "No transactions match 'walmart'."}), ("done", {})]
+    assert provider.stream_prompts == []
@@ -0,0 +1,70 @@
+"""Chunked extraction: row-aligned chunks, repeated headers, de-duplicated overlap."""
+import asyncio
+
+from core.chunking import chunk_rows, estimate_tokens, extract_chunked, merge_chunk_results
+from tests.conftest import FakeProvider
+
+HEADER = "date,description,amount,account_name"
+
+
+def statement(rows: int) -> str:
+    lines = [f"2024-01-{day % 28 + 1:02d},STORE NUMBER {day:04d},-{day}.25,Checking" for day in range(rows)]
+    return "\n".join([HEADER] + lines) + "\n"
+
+
+class RecordingProvider(FakeProvider):
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    async def extract_data(self, raw_text, prompt_template):
+        self.chunks.append(raw_text)
+        return await super().extract_data(raw_text, prompt_template)
+
+
+def test_chunks_split_on_rows_within_budget_and_repeat_header():
+    rows = statement(40).splitlines()[1:]
+    budget = 60
+    chunks = chunk_rows(HEADER, rows, budget, overlap=1)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        lines = chunk.splitlines()
+        assert lines[0] == HEADER
+        assert all(line in rows for line in lines[1:])
+        assert sum(estimate_tokens(line) for line in lines) <= budget
+    # Consecutive chunks share exactly the overlap row, and every row is covered
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.splitlines()[-1] == current.splitlines()[1]
+    covered = {line for chunk in chunks for line in chunk.splitlines()[1:]}
+    assert covered == set(rows)
+
+
+def test_oversized_row_gets_its_own_chunk():
+    rows = ["short", "x" * 400, "short again"]
+    chunks = chunk_rows("h", rows, token_budget=20, overlap=0)
+    assert chunks == ["h\nshort", "h\n" + "x" * 400, "h\nshort again"]
+
+
+def test_merge_drops_overlap_but_keeps_genuine_repeats():
+    coffee = {"date": "2024-01-02", "description": "COFFEE", "amount": -3.5}
+    rent = {"date": "2024-01-03", "description": "RENT", "amount": -900.0}
+    # The same coffee twice in one chunk is two purchases; the repeat at the
+    # start of the next chunk is the overlap row
+    merged = merge_chunk_results([[rent, coffee, coffee], [dict(coffee, description="coffee "), rent]], overlap=1)
+    assert merged == [rent, coffee, coffee, rent]
+
+
+def test_extract_chunked_returns_each_row_once():
+    provider = RecordingProvider()
+    text = statement(120)
+    progress = []
+
+    async def on_chunk(done, total):
+        progress.append((done, total))
+
+    records = asyncio.run(extract_chunked(provider, text, "prompt", token_budget=200, concurrency=3, on_chunk=on_chunk))
+
+    assert len(provider.chunks) > 3
+    assert all(chunk.splitlines()[0] == HEADER for chunk in provider.chunks)
+    assert [r["description"] for r in records] == [f"STORE NUMBER {day:04d}" for day in range(120)]
+    assert progress[-1] == (len(provider.chunks), len(provider.chunks))
@@ -0,0 +1,44 @@
+"""Settings precedence: the process environment beats .env files, before and after reloads."""
+import os
+
+import pytest
+
+from core import config
+
+
+@pytest.fixture
+def fresh(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(config, "_process_env", None)
+    monkeypatch.delenv("LOCAL_LLM_MODEL", raising=False)
+    monkeypatch.delenv("LLM_CONCURRENCY", raising=False)
+    monkeypatch.setenv("GEMINI_MODEL", "from-env")
+    backend, root = tmp_path / "backend.env", tmp_path / "root.env"
+    monkeypatch.setattr(config, "ENV_FILES", [str(backend), str(root)])
+    return backend, root
+
+
+def test_environment_wins_at_start_and_after_reload(fresh):
+    backend, root = fresh
+    backend.write_text("GEMINI_MODEL=from-file\nLOCAL_LLM_MODEL=backend\n")
+    root.write_text("LOCAL_LLM_MODEL=root\nLLM_CONCURRENCY=9\n")
+
+    settings = config.get_settings()
+    assert settings.gemini_model == "from-env"
+    assert settings.local_llm_model == "backend"
+    assert settings.llm_concurrency == 9
+
+    backend.write_text("GEMINI_MODEL=edited\nLOCAL_LLM_MODEL=edited\n")
+    settings = config.reload_settings(config.ENV_FILES)
+    assert settings.gemini_model == "from-env"
+    assert settings.local_llm_model == "edited"
+
+
+def test_key_removed_from_file_reverts_to_default(fresh):
+    backend, _ = fresh
+    backend.write_text("LOCAL_LLM_MODEL=mistral\n")
+    assert config.get_settings().local_llm_model == "mistral"
+
+    backend.write_text("")
+    assert config.reload_settings(config.ENV_FILES).local_llm_model == "llama2"
+    assert "LOCAL_LLM_MODEL" not in os.environ
@@ -0,0 +1,58 @@
+"""Known bank layouts: amounts, dropped rows, categories and accounts."""
+import io
+
+import pandas as pd
+
+from core.formats import parse_known_format
+from tests.conftest import find, wait_for_job
+
+
+def test_currency_text_amounts_parse_and_bad_rows_are_counted():
+    frame = pd.read_csv(io.StringIO(
+        'Date,Description,Amount\n'
+        '01/02/2024,RENT PAYMENT,"$1,234.50"\n'
+        '01/03/2024,STARBUCKS 123,-$4.75\n'
+        'not a date,SHELL OIL,-40.00\n'
+        '01/05/2024,NETFLIX,n/a\n'
+    ))
+    rows, dropped = parse_known_format(frame)
+    assert [row["amount"] for row in rows] == [1234.50, -4.75]
+    assert dropped == 2
+
+
+def test_known_layouts_get_keyword_categories():
+    frame = pd.DataFrame({
+        "Date": ["01/02/2024"] * 5,
+        "Description": ["WHOLE FOODS MARKET", "UBER EATS ORDER", "UBER TRIP", "PAYROLL DEPOSIT",
+                        "ONLINE TRANSFER TO SAVINGS"],
+        "Amount": [-54.2, -20.0, -12.0, 2500.0, -100.0],
+    })
+    rows, _ = parse_known_format(frame)
+    assert [row["category"] for row in rows] == ["Food", "Food", "Transport", "Salary", "Transfer"]
+    assert [row["potential_transfer"] for row in rows] == [False, False, False, False, True]
+
+
+def test_account_override():
+    frame = pd.DataFrame({"Date": ["01/02/2024"], "Description": ["COFFEE"], "Amount": [-3.0]})
+    assert parse_known_format(frame)[0][0]["account_name"] == "BoA Checking"
+    assert parse_known_format(frame, "Chase Checking")[0][0]["account_name"] == "Chase Checking"
+
+
+def test_upload_reports_dropped_rows_and_uses_named_account(app):
+    content = b"Date,Description,Amount\n01/02/2024,COFFEE,\"$4.50\"\n01/03/2024,BROKEN,\n"
+    response = app.post("/upload", files={"file": ("export.csv", content)}, data={"account": "Chase Checking"})
+    job = wait_for_job(app, response.json()["job_id"])
+    assert job["result"]["inserted"] == 1
+    assert job["result"]["dropped"] == 1
+    [doc] = find(app)
+    assert doc["account_name"] == "Chase Checking"
+    assert doc["amount"] == 4.5
+
+
+def test_same_layout_for_two_accounts_links_as_transfer(app):
+    checking = b"Date,Description,Amount\n01/02/2024,ONLINE TRANSFER TO SAVINGS,-100.00\n"
+    savings = b"Date,Description,Amount\n01/02/2024,ONLINE TRANSFER FROM CHECKING,100.00\n"
+    for name, content, account in (("a.csv", checking, "Checking"), ("b.csv", savings, "Savings")):
+        response = app.post("/upload", files={"file": (name, content)}, data={"account": account})
+        assert wait_for_job(app, response.json()["job_id"])["status"] == "succeeded"
+    assert all(doc["is_transfer"] for doc in find(app))
@@ -0,0 +1,138 @@
+"""
+The range and filter queries must be served by TRANSACTION_INDEXES.
+
+The structural checks always run: each query the app builds must have an
+index whose leading fields it constrains, with the sort following the
+equality prefix. mongomock has no query planner, so the explain() checks run
+only against a real server named by MONGO_TEST_URL (a throwaway database is
+created and dropped).
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pytest
+
+import main
+from core.db import TRANSACTION_INDEXES, ensure_indexes
+from core.pagination import SORT
+from core.transfers import candidate_query
+
+TRANSFER_LOOKUP = candidate_query(datetime(2024, 1, 1), datetime(2024, 1, 31), [-25.0, 100.0])
+
+
+def is_equality(value: Any) -> bool:
+    return not isinstance(value, dict) or set(value) <= {"$eq", "$in"}
+
+
+def usable(keys: Sequence[Tuple[str, int]], query: Dict[str, Any], sort: List[Tuple[str, int]]) -> bool:
+    """Leading field filtered on; a sort, if any, follows the equality prefix in either direction."""
+    fields = [field for field, _ in keys]
+    if fields[0] not in query:
+        return False
+    if not sort:
+        return True
+    prefix = 0
+    while prefix < len(fields) and fields[prefix] in query and is_equality(query[fields[prefix]]):
+        prefix += 1
+    following = list(keys[prefix:prefix + len(sort)])
+    reversed_sort = [(field, -direction) for field, direction in sort]
+    return following in (sort, reversed_sort)
+
+
+def served_by(query: Dict[str, Any], sort: List[Tuple[str, int]] = ()) -> List[List[Tuple[str, int]]]:
+    return [keys for keys in TRANSACTION_INDEXES if usable(keys, query, list(sort))]
+
+
+def test_date_range_listing_uses_date_index():
+    query = main.build_transaction_query("2024-01-01", "2024-01-31", None, None)
+    assert [("date", -1), ("_id", -1)] in served_by(query, SORT)
+
+
+def test_category_listing_uses_category_index():
+    query = main.build_transaction_query("2024-01-01", None, None, "Food")
+    assert [("category", 1), ("date", -1), ("_id", -1)] in served_by(query, SORT)
+
+
+def test_vendor_filter_uses_merchant_tokens_index():
+    query = main.build_transaction_query(None, None, "whole foods", None)
+    assert [("merchant_tokens", 1)] in served_by(query)
+
+
+def test_transfer_lookup_uses_amount_date_index():
+    assert [("amount", 1), ("date", 1), ("account_name", 1)] in served_by(TRANSFER_LOOKUP)
+
+
+def plan_stages(plan: Any) -> List[Dict[str, Any]]:
+    """Every stage in an explain document, however the server nests them."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan)
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+@pytest.fixture
+def live_collection():
+    url = os.environ.get("MONGO_TEST_URL")
+    if not url:
+        pytest.skip("MONGO_TEST_URL not set; explain() needs a real MongoDB")
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run(check):
+        client = AsyncIOMotorClient(url)
+        database = client["fintrack_explain_test"]
+        try:
+            collection = database.transactions
+            await ensure_indexes(collection)
+            await collection.insert_many([
+                {"date": datetime(2024, 1, day), "amount": float(day), "category": "Food",
+                 "account_name": "Checking", "merchant_tokens": ["whole", "foods"], "linked_tx_id": None}
+                for day in range(1, 29)
+            ])
+            return await check(collection)
+        finally:
+            await client.drop_database(database)
+            client.close()
+
+    return lambda check: asyncio.run(run(check))
+
+
+def index_scans(explain: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [stage for stage in plan_stages(explain.get("queryPlanner", explain)) if stage["stage"] == "IXSCAN"]
+
+
+@pytest.mark.parametrize("query,sort,index", [
+    (main.build_transaction_query("2024-01-01", "2024-01-31", None, None), SORT, {"date": -1, "_id": -1}),
+    (main.build_transaction_query("2024-01-01", None, None, "Food"), SORT, {"category": 1, "date": -1, "_id": -1}),
+    (main.build_transaction_query(None, None, "whole foods", None), None, {"merchant_tokens": 1}),
+])
+def test_explain_listing_queries(live_collection, query, sort, index):
+    async def check(collection):
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        return await cursor.explain()
+
+    explain = live_collection(check)
+    assert [dict(stage["keyPattern"]) for stage in index_scans(explain)] == [index]
+    if sort:
+        # The index order is the sort order; no blocking sort stage
+        assert not [s for s in plan_stages(explain["queryPlanner"]) if s["stage"] == "SORT"]
+
+
+def test_explain_transfer_lookup(live_collection):
+    async def check(collection):
+        return await collection.database.command(
+            "explain", {"aggregate": collection.name, "pipeline": [{"$match": TRANSFER_LOOKUP}], "cursor": {}},
+        )
+
+    explain = live_collection(check)
+    patterns = [dict(stage["keyPattern"]) for stage in plan_stages(explain) if stage["stage"] == "IXSCAN"]
+    assert {"amount": 1, "date": 1, "account_name": 1} in patterns
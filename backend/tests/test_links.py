@@ -0,0 +1,41 @@
+"""The link audit finds and repairs broken transfer links."""
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from core.links import audit_links, link_fields
+
+
+def test_audit_reports_each_kind_of_broken_link(mongo):
+    collection = mongo["test"]["transactions"]
+    a, b, c, d, e = (ObjectId() for _ in range(5))
+    base = {"date": datetime(2024, 1, 2), "category": "Transfer", "account_name": "Checking"}
+    docs = [
+        # Healthy pair, missing its pair key
+        {"_id": a, **base, "amount": -50.0, "is_transfer": True, "linked_tx_id": str(b)},
+        {"_id": b, **base, "amount": 50.0, "account_name": "Savings", "is_transfer": True, "linked_tx_id": str(a)},
+        # Points at a deleted row
+        {"_id": c, **base, "amount": -20.0, "is_transfer": True, "linked_tx_id": str(ObjectId())},
+        # Flagged without a link
+        {"_id": d, **base, "amount": -10.0, "is_transfer": True, "linked_tx_id": None},
+        # Points at a row that points elsewhere
+        {"_id": e, **base, "amount": 20.0, "is_transfer": True, "linked_tx_id": str(a)},
+    ]
+
+    async def run():
+        await collection.insert_many(docs)
+        ops, _, report = await audit_links(collection)
+        await collection.bulk_write(ops)
+        return report, {doc["_id"]: doc for doc in await collection.find().to_list(length=None)}
+
+    report, repaired = asyncio.run(run())
+    assert {k: report[k] for k in ("dangling", "one_sided", "flag_only", "stale")} == {
+        "dangling": 1, "one_sided": 1, "flag_only": 1, "stale": 2,
+    }
+    for doc_id, partner, account in ((a, b, "Savings"), (b, a, "Checking")):
+        assert {k: repaired[doc_id].get(k) for k in link_fields(doc_id, partner, account)} == \
+            link_fields(doc_id, partner, account)
+    for doc_id in (c, d, e):
+        assert repaired[doc_id]["is_transfer"] is False
+        assert repaired[doc_id]["linked_tx_id"] is None
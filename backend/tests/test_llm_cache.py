@@ -0,0 +1,42 @@
+"""The LLM result cache must hand out copies, never the objects ingest mutates."""
+import asyncio
+
+from core.llm_cache import ResultCache
+from tests.conftest import A_TXT, B_TXT, find, upload
+
+
+def test_memory_hits_are_copies():
+    cache = ResultCache()
+
+    async def run():
+        value = [{"amount": 1.0}]
+        await cache.put("key", value)
+        value[0]["_id"] = "mutated after put"
+        hit = await cache.get("key")
+        hit[0]["linked_tx_id"] = "mutated after get"
+        return hit, await cache.get("key")
+
+    first, second = asyncio.run(run())
+    assert first is not second
+    assert second == [{"amount": 1.0}]
+
+
+def test_reupload_after_delete_comes_back_clean(app, fake_llm):
+    upload(app, "B.txt", B_TXT)
+    linked = upload(app, "A.txt", A_TXT)
+    assert linked["status"] == "succeeded"
+    a = next(doc for doc in find(app) if doc["account_name"] == "Checking")
+    assert a["is_transfer"] is True
+
+    assert app.delete("/transactions").status_code == 200
+    again = upload(app, "A.txt", A_TXT)
+
+    # Served from the cache, not from a second LLM call
+    assert fake_llm.extract_calls == 2
+    assert again["result"]["inserted"] == 1
+    [doc] = find(app)
+    assert not doc.get("is_transfer")
+    assert doc.get("linked_tx_id") is None
+    assert doc["_id"] != a["_id"]
+    report = app.post("/transfers/repair", params={"dry_run": True}).json()
+    assert report["dangling"] == 0
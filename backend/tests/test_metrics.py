@@ -0,0 +1,79 @@
+"""Prometheus rendering, stage timings and LLM usage accounting."""
+import asyncio
+
+from bson import ObjectId
+
+from core.metrics import Counter, Histogram, InstrumentedProvider, LLM_CALLS, LLM_PROMPT_CHARS, render_metrics
+from tests.conftest import FakeProvider
+
+
+def test_counter_renders_sorted_escaped_samples():
+    counter = Counter("test_total", "A counter", ("path", "status"))
+    counter.inc("/b", "200")
+    counter.inc("/a", "500", amount=2.5)
+    counter.inc("/b", "200")
+    counter.inc('say "hi"\n', "200")
+    assert counter.render() == [
+        "# HELP test_total A counter",
+        "# TYPE test_total counter",
+        'test_total{path="/a",status="500"} 2.5',
+        'test_total{path="/b",status="200"} 2',
+        'test_total{path="say \\"hi\\"\\n",status="200"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "A histogram", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "read")
+    assert histogram.render() == [
+        "# HELP test_seconds A histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{op="read",le="0.1"} 2',
+        'test_seconds_bucket{op="read",le="1"} 3',
+        'test_seconds_bucket{op="read",le="+Inf"} 4',
+        'test_seconds_sum{op="read"} 3.650000',
+        'test_seconds_count{op="read"} 4',
+    ]
+
+
+def test_unlabelled_metric():
+    counter = Counter("plain_total", "No labels")
+    counter.inc()
+    assert counter.render()[-1] == "plain_total 1"
+
+
+def sample(text: str, prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_instrumented_provider_counts_calls_and_sizes():
+    provider = InstrumentedProvider(FakeProvider(), "fake-metrics")
+    raw = "date,description,amount,account_name\n2024-01-02,COFFEE,-3.50,Checking\n"
+    records = asyncio.run(provider.extract_data(raw, "PROMPT"))
+    assert len(records) == 1
+    assert LLM_CALLS.values[("fake-metrics", "extract", "ok")] == 1
+    assert LLM_PROMPT_CHARS.values[("fake-metrics", "extract")] == len(f"PROMPT\n\nDATA:\n{raw}")
+
+
+def test_metrics_endpoint_labels_requests_by_route(app):
+    before = sample(render_metrics(), 'fintrack_http_requests_total{method="GET",route="/jobs/{job_id}",status="404"}')
+    missing = [str(ObjectId()) for _ in range(2)]
+    for job_id in missing:
+        assert app.get(f"/jobs/{job_id}").status_code == 404
+
+    response = app.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert "# TYPE fintrack_http_request_seconds histogram" in text
+    # The route template, never the raw path
+    after = sample(text, 'fintrack_http_requests_total{method="GET",route="/jobs/{job_id}",status="404"}')
+    assert after - before == 2
+    assert missing[0] not in text
+
+
+def test_server_timing_header_on_request(app):
+    assert "server-timing" not in app.get("/transactions").headers
+    header = app.get("/transactions", headers={"X-Timing": "1"}).headers["server-timing"]
+    assert "mongo;dur=" in header and header.endswith(tuple("0123456789")) and "total;dur=" in header
@@ -0,0 +1,76 @@
+"""Keyset pagination of /transactions."""
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import main
+from core.pagination import decode_cursor, encode_cursor
+
+
+def seed(app, docs):
+    app.portal.call(lambda: main.transactions_collection.insert_many(docs))
+
+
+def pages(app, **params):
+    """Every page of /transactions, following X-Next-Cursor."""
+    result, cursor = [], None
+    while True:
+        response = app.get("/transactions", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        result.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return result
+
+
+def test_pages_cover_every_row_once_in_order(app):
+    # Several rows per day, so ties on date are broken by _id
+    seed(app, [
+        {"date": datetime(2024, 1, 1) + timedelta(days=n // 3), "description": f"ROW {n}", "amount": -n,
+         "category": "Food" if n % 2 else "Fuel"}
+        for n in range(25)
+    ])
+    all_pages = pages(app, page_size=4)
+    assert [len(page) for page in all_pages] == [4] * 6 + [1]
+    rows = [row for page in all_pages for row in page]
+    assert len({row["_id"] for row in rows}) == 25
+    keys = [(row["date"], row["_id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+    # Filters apply on every page
+    food = [row for page in pages(app, page_size=5, category="Food") for row in page]
+    assert len(food) == 12 and {row["category"] for row in food} == {"Food"}
+
+
+def test_exact_page_size_has_no_next_cursor(app):
+    seed(app, [{"date": datetime(2024, 1, n), "description": "X", "amount": -1.0} for n in range(1, 5)])
+    response = app.get("/transactions", params={"page_size": 4})
+    assert len(response.json()) == 4 and "x-next-cursor" not in response.headers
+
+
+def test_cursor_round_trip():
+    doc = {"date": datetime(2024, 5, 6, 7, 8), "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == doc
+    raw = {"date": "05/06/2024", "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(raw)) == raw
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "e30", encode_cursor({"date": None, "_id": "not-an-id"})])
+def test_invalid_cursor_is_400(app, cursor):
+    response = app.get("/transactions", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_pages_continue_past_datetimes_into_unmigrated_dates(app):
+    # Sorted descending, BSON puts datetimes first, then strings, then null/missing
+    seed(app, [{"date": datetime(2024, 1, n), "description": f"DATE {n}", "amount": -1.0} for n in range(1, 4)]
+         + [{"date": f"01/0{n}/2023", "description": f"STRING {n}", "amount": -1.0} for n in range(1, 4)]
+         + [{"date": None, "description": "NULL", "amount": -1.0}, {"description": "MISSING", "amount": -1.0}])
+    expected = [row["description"] for row in app.get("/transactions", params={"page_size": 100}).json()]
+    assert expected[:6] == ["DATE 3", "DATE 2", "DATE 1", "STRING 3", "STRING 2", "STRING 1"]
+
+    for page_size in (1, 2, 4):
+        rows = [row["description"] for page in pages(app, page_size=page_size) for row in page]
+        assert rows == expected
@@ -0,0 +1,94 @@
+"""Read cache: ETag revalidation, and no stale response after any write."""
+import main
+from core.read_cache import TRANSACTIONS, CachedResponse, ReadCache, etag_matches
+from tests.conftest import BOA_CSV, upload
+
+
+def entry(cache, key, body=b"[]"):
+    versions = cache.versions_of((TRANSACTIONS,))
+    return CachedResponse(cache.etag(key, versions), versions, body)
+
+
+def test_write_during_read_is_not_cached():
+    cache = ReadCache(1 << 20)
+    key = cache.key("transactions", {"page_size": 100})
+    # Versions taken when the read starts; a write begins before it finishes
+    read = entry(cache, key)
+    with cache.mutation(TRANSACTIONS):
+        cache.put(key, (TRANSACTIONS,), read)
+        during = entry(cache, key)
+        cache.put(key, (TRANSACTIONS,), during)
+    assert cache.get(key, read.versions) is None
+    # Read while the write ran: a miss once it has finished
+    assert cache.get(key, cache.versions_of((TRANSACTIONS,))) is None
+    assert cache.snapshot()["entries"] == 1 and during.versions != cache.versions_of((TRANSACTIONS,))
+
+
+def test_lru_eviction_by_size():
+    key_a, key_b, key_c = (ReadCache.key("e", {"n": n}) for n in range(3))
+    cache = ReadCache(2 * (100 + len(key_a)))
+    for key in (key_a, key_b):
+        cache.put(key, (TRANSACTIONS,), entry(cache, key, b"x" * 100))
+    assert cache.get(key_a, (0,)) is not None
+    cache.put(key_c, (TRANSACTIONS,), entry(cache, key_c, b"x" * 100))
+    # b was the least recently used
+    assert cache.get(key_b, (0,)) is None
+    assert cache.get(key_a, (0,)) is not None and cache.get(key_c, (0,)) is not None
+    # Larger than the whole cache: never stored
+    cache.put(key_b, (TRANSACTIONS,), entry(cache, key_b, b"x" * 1000))
+    assert cache.get(key_b, (0,)) is None
+
+
+def test_equivalent_params_share_a_key():
+    assert ReadCache.key("e", {"a": 1, "b": None}) == ReadCache.key("e", {"a": 1})
+    assert ReadCache.key("e", {"a": 1}) != ReadCache.key("e", {"a": 2})
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+
+
+def get(app, path, etag=None):
+    return app.get(path, headers={"If-None-Match": etag} if etag else {})
+
+
+def test_revalidation_and_invalidation(app, fake_llm):
+    first = get(app, "/transactions")
+    assert first.status_code == 200 and first.json() == []
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    not_modified = get(app, "/transactions", etag)
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag
+
+    # An upload invalidates: the old ETag gets the new rows
+    upload(app, "boa.csv", BOA_CSV)
+    fresh = get(app, "/transactions", etag)
+    assert fresh.status_code == 200 and len(fresh.json()) == 3
+    assert fresh.headers["etag"] != etag
+
+    hits = main.read_cache.stats["hits"]
+    assert get(app, "/transactions").json() == fresh.json()
+    assert main.read_cache.stats["hits"] == hits + 1
+
+    # So does a recategorization
+    plan = app.post("/recategorize/preview", json={"keyword": "shell", "new_category": "Fuel"}).json()
+    assert app.post("/recategorize/commit", json={"plan_id": plan["preview_id"]}).status_code == 200
+    categories = {t["description"]: t["category"] for t in get(app, "/transactions", fresh.headers["etag"]).json()}
+    assert categories["SHELL OIL 1234"] == "Fuel"
+
+    # And a delete
+    assert get(app, "/analytics/top-vendors").json()["merchant"]
+    app.delete("/transactions")
+    assert get(app, "/transactions").json() == []
+    assert get(app, "/analytics/top-vendors").json()["merchant"] == []
+
+
+def test_disabled_cache_sends_no_etag(app, monkeypatch):
+    monkeypatch.setattr(main, "read_cache", ReadCache(0))
+    response = get(app, "/transactions")
+    assert response.status_code == 200 and "etag" not in response.headers
@@ -0,0 +1,92 @@
+"""Bulk recategorization: preview, commit once, undo, and recovery from failures."""
+from datetime import datetime
+
+import pytest
+
+import main
+from core import recategorize
+from tests.conftest import find, upload
+
+COFFEE_CSV = (
+    b"Date,Description,Amount\n"
+    b"01/02/2024,STARBUCKS STORE 1,-4.50\n"
+    b"01/03/2024,STARBUCKS STORE 2,-5.25\n"
+    b"01/04/2024,STARBUCKS STORE 3,-3.75\n"
+    b"01/05/2024,SHELL OIL,-40.00\n"
+)
+
+
+def categories(app):
+    return sorted((doc["description"], doc["category"]) for doc in find(app))
+
+
+def preview(app, keyword="starbucks", new_category="Coffee"):
+    response = app.post("/recategorize/preview", json={"keyword": keyword, "new_category": new_category})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_preview_commit_double_commit_undo(app):
+    upload(app, "coffee.csv", COFFEE_CSV)
+    before = categories(app)
+
+    plan = preview(app)
+    assert plan["count"] == 3
+    assert categories(app) == before
+
+    committed = app.post("/recategorize/commit", json={"plan_id": plan["preview_id"]})
+    assert committed.json()["updated"] == 3
+    assert [c for d, c in categories(app) if d.startswith("STARBUCKS")] == ["Coffee"] * 3
+
+    again = app.post("/recategorize/commit", json={"plan_id": plan["preview_id"]})
+    assert again.status_code == 409
+
+    undone = app.post("/recategorize/undo", json={"plan_id": plan["preview_id"]})
+    assert undone.json() == {"restored": 3}
+    assert categories(app) == before
+    assert app.post("/recategorize/undo", json={"plan_id": plan["preview_id"]}).status_code == 409
+
+
+def test_commit_failing_part_way_can_be_undone(app, monkeypatch):
+    upload(app, "coffee.csv", COFFEE_CSV)
+    before = categories(app)
+    plan = preview(app)
+
+    monkeypatch.setattr(recategorize, "BATCH_SIZE", 1)
+    original = main.transactions_collection.bulk_write
+    calls = []
+
+    async def failing_second_batch(ops, **kwargs):
+        calls.append(len(ops))
+        if len(calls) == 2:
+            raise RuntimeError("write failed")
+        return await original(ops, **kwargs)
+
+    monkeypatch.setattr(main.transactions_collection, "bulk_write", failing_second_batch)
+    with pytest.raises(RuntimeError):
+        app.post("/recategorize/commit", json={"plan_id": plan["preview_id"]})
+    monkeypatch.setattr(main.transactions_collection, "bulk_write", original)
+
+    stored = app.portal.call(lambda: main.recategorization_plans.find_one({}))
+    assert stored["status"] == "failed"
+    assert [c for _, c in categories(app)].count("Coffee") == 1
+
+    undone = app.post("/recategorize/undo", json={"plan_id": plan["preview_id"]})
+    assert undone.json() == {"restored": 1}
+    assert categories(app) == before
+
+
+def test_undo_takes_over_only_stale_claims(app):
+    upload(app, "coffee.csv", COFFEE_CSV)
+    plan = preview(app)
+    plan_id = main.parse_object_id(plan["preview_id"])
+
+    def claim(at):
+        app.portal.call(lambda: main.recategorization_plans.update_one(
+            {"_id": plan_id}, {"$set": {"status": "applying", "claimed_at": at}}
+        ))
+
+    claim(datetime.utcnow())
+    assert app.post("/recategorize/undo", json={"plan_id": plan["preview_id"]}).status_code == 409
+    claim(datetime.utcnow() - recategorize.STALE_CLAIM * 2)
+    assert app.post("/recategorize/undo", json={"plan_id": plan["preview_id"]}).json() == {"restored": 0}
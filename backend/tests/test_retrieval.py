@@ -0,0 +1,90 @@
+"""Chat retrieval: question parsing, the bounded vocabulary and the context table."""
+import asyncio
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from core.retrieval import Vocabulary, _fmt_row, match_vocabulary, parse_time_range, retrieve_chat_context
+
+NOW = datetime(2024, 3, 15, 18, 30)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("what did I spend today", (datetime(2024, 3, 15), datetime(2024, 3, 16))),
+    ("and yesterday?", (datetime(2024, 3, 14), datetime(2024, 3, 15))),
+    ("spending in the last 7 days", (datetime(2024, 3, 8), datetime(2024, 3, 16))),
+    ("past 2 weeks", (datetime(2024, 3, 1), datetime(2024, 3, 16))),
+    ("this week", (datetime(2024, 3, 11), datetime(2024, 3, 16))),
+    ("last week", (datetime(2024, 3, 4), datetime(2024, 3, 11))),
+    ("this month", (datetime(2024, 3, 1), datetime(2024, 3, 16))),
+    ("last month", (datetime(2024, 2, 1), datetime(2024, 3, 1))),
+    ("this year", (datetime(2024, 1, 1), datetime(2024, 3, 16))),
+    ("last year", (datetime(2023, 1, 1), datetime(2024, 1, 1))),
+    ("groceries in January", (datetime(2024, 1, 1), datetime(2024, 2, 1))),
+    # A month that has not started yet this year means last year's
+    ("rent in December", (datetime(2023, 12, 1), datetime(2024, 1, 1))),
+    ("last March", (datetime(2023, 3, 1), datetime(2023, 4, 1))),
+    ("March", (datetime(2024, 3, 1), datetime(2024, 4, 1))),
+    ("Sep 2022", (datetime(2022, 9, 1), datetime(2022, 10, 1))),
+    ("during 2021", (datetime(2021, 1, 1), datetime(2022, 1, 1))),
+    ("how much may I spend on coffee", (None, None)),
+    ("how much on coffee", (None, None)),
+])
+def test_parse_time_range(question, expected):
+    assert parse_time_range(question, NOW) == expected
+
+
+def test_last_month_in_january_is_previous_december():
+    assert parse_time_range("last month", datetime(2024, 1, 10)) == (datetime(2023, 12, 1), datetime(2024, 1, 1))
+
+
+def test_match_vocabulary_finds_merchants_and_categories():
+    merchants = ["WHOLE FOODS MARKET", "Shell Oil 1234", "Starbucks", "AMAZON.COM", None]
+    categories = ["Groceries", "Transport", "Coffee", ""]
+
+    assert match_vocabulary("How much did I spend at Whole Foods in March?", merchants, categories) == (
+        ["WHOLE FOODS MARKET"], [])
+    # Plural category names match; a category word is not also a merchant prefix
+    assert match_vocabulary("total coffees last month", merchants, categories) == ([], ["Coffee"])
+    # Prefixes of four letters or more match the merchant's first word
+    assert match_vocabulary("starb and amaz spending", merchants, categories) == (["Starbucks", "AMAZON.COM"], [])
+    assert match_vocabulary("how much did I spend this month", merchants, categories) == ([], [])
+
+
+def test_vocabulary_keeps_the_most_frequent_values():
+    collection = AsyncMongoMockClient().fintrack.transactions
+
+    async def load():
+        counts = {("Starbucks", "Coffee"): 3, ("Shell", "Fuel"): 2, ("Corner Shop", "Food"): 1,
+                  ("", None): 1, (None, None): 1, (42, None): 1}
+        await collection.insert_many([
+            {"merchant": merchant, "category": category}
+            for (merchant, category), count in counts.items() for _ in range(count)
+        ])
+        return await Vocabulary(merchant_limit=2, category_limit=5).get(collection)
+
+    assert asyncio.run(load()) == (["Starbucks", "Shell"], ["Coffee", "Fuel", "Food"])
+
+
+@pytest.mark.parametrize("amount, shown", [(-4.5, "-4.50"), ("12.345", "12.35"), (None, ""), ("n/a", "n/a")])
+def test_fmt_row_coerces_amounts(amount, shown):
+    row = _fmt_row({"date": datetime(2024, 1, 2), "description": "COFFEE", "amount": amount,
+                    "category": "Food", "account_name": "Checking"})
+    assert row == f"2024-01-02 | COFFEE | {shown} | Food | Checking"
+
+
+def test_context_tolerates_legacy_amounts():
+    collection = AsyncMongoMockClient().fintrack.transactions
+
+    async def build():
+        await collection.insert_many([
+            {"date": datetime(2024, 1, 2), "description": "COFFEE", "amount": -4.5, "category": "Food"},
+            {"date": datetime(2024, 1, 3), "description": "OLD IMPORT", "amount": "-7.25", "category": "Food"},
+            {"date": datetime(2024, 1, 4), "description": "NO AMOUNT", "amount": None, "category": "Food"},
+        ])
+        return await retrieve_chat_context(collection, Vocabulary(), "food in January", 2000, now=NOW)
+
+    context = asyncio.run(build())
+    assert "OLD IMPORT | -7.25 | Food" in context
+    assert "NO AMOUNT |  | Food" in context
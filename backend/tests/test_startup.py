@@ -0,0 +1,34 @@
+"""Importing the app stays cheap; connections and files open in the lifespan."""
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.bench_import import BACKEND_DIR, LAZY_MODULES
+
+
+def test_import_loads_no_heavy_modules_and_opens_no_files(tmp_path):
+    cache_path = tmp_path / "llm_cache.sqlite3"
+    script = (
+        "import json, sys, main\n"
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, "LLM_CACHE_PATH": str(cache_path)},
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+    assert not cache_path.exists()
+
+
+def test_lifespan_opens_and_closes_llm_cache(mongo, tmp_path, monkeypatch):
+    cache_path = tmp_path / "llm_cache.sqlite3"
+    monkeypatch.setattr(main.Config, "get_llm_cache_path", staticmethod(lambda: str(cache_path)))
+    with TestClient(main.app):
+        assert main.llm_cache.store is not None
+        assert cache_path.exists()
+    assert main.llm_cache.store is None
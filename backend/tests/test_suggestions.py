@@ -0,0 +1,91 @@
+"""Budget suggestions: robust level, seasonality, trend and the history window."""
+from datetime import datetime
+
+import pandas as pd
+
+import main
+from core.suggestions import history_frame, suggest_budgets
+
+
+def monthly(category, amounts_by_month, day=5):
+    """One spending row per (Period, amount)."""
+    return [(p.start_time.to_pydatetime().replace(day=day), -amount, category) for p, amount in amounts_by_month]
+
+
+def frame(*row_lists):
+    rows = [row for rows in row_lists for row in rows]
+    return history_frame(*map(list, zip(*rows)))
+
+
+def months(start, count):
+    return pd.period_range(start, periods=count, freq="M")
+
+
+def by_category(result):
+    return {c: {k: v[i] for k, v in result.items() if k != "month"} for i, c in enumerate(result["category"])}
+
+
+def test_constant_spending_is_suggested_as_is():
+    result = suggest_budgets(frame(monthly("Rent", [(p, 1000.0) for p in months("2022-01", 24)])), pd.Period("2024-01"))
+    rent = by_category(result)["Rent"]
+    assert result["month"] == "2024-01"
+    assert (rent["suggested"], rent["low"], rent["high"]) == (1000.0, 1000.0, 1000.0)
+    assert (rent["trend"], rent["seasonal_factor"], rent["months"]) == (0.0, 1.0, 24)
+
+
+def test_one_off_spike_is_trimmed():
+    amounts = [(p, 400.0 + (p.month % 3) * 10) for p in months("2023-01", 12)]
+    amounts[-1] = (amounts[-1][0], 5000.0)
+    groceries = by_category(suggest_budgets(frame(monthly("Groceries", amounts)), pd.Period("2024-01")))["Groceries"]
+    assert 400 <= groceries["suggested"] <= 430
+
+
+def test_seasonal_month_is_raised_once_several_years_exist():
+    amounts = [(p, 500.0 if p.month == 12 else 100.0) for p in months("2021-01", 36)]
+    result = by_category(suggest_budgets(frame(monthly("Gifts", amounts)), pd.Period("2023-12")))["Gifts"]
+    assert result["seasonal_factor"] > 2
+    assert result["suggested"] > 250
+    july = by_category(suggest_budgets(frame(monthly("Gifts", amounts)), pd.Period("2023-07")))["Gifts"]
+    assert july["seasonal_factor"] < 1
+    assert july["suggested"] < 100
+
+
+def test_rising_spending_is_extrapolated():
+    amounts = [(p, 100.0 + 10 * i) for i, p in enumerate(months("2023-01", 12))]
+    utilities = by_category(suggest_budgets(frame(monthly("Utilities", amounts)), pd.Period("2024-01")))["Utilities"]
+    assert utilities["trend"] == 10.0
+    # One month past the last: the trend step is added to the seasonal level
+    expected = utilities["median"] * utilities["seasonal_factor"] + 10
+    assert abs(utilities["suggested"] - expected) < 0.5
+
+
+def test_history_window():
+    rows = frame(
+        # Started three months ago: earlier months are missing, not zero
+        monthly("Gym", [(p, 50.0) for p in months("2023-10", 3)]),
+        # Stopped long ago: nothing to suggest
+        monthly("Daycare", [(p, 800.0) for p in months("2021-01", 6)]),
+        monthly("Rent", [(p, 1000.0) for p in months("2023-01", 12)]),
+        # The target month is partial and left out
+        [(datetime(2024, 1, 3), -9999.0, "Rent")],
+    )
+    result = suggest_budgets(rows, pd.Period("2024-01"))
+    assert result["category"] == ["Rent", "Gym"]
+    gym = by_category(result)["Gym"]
+    assert (gym["suggested"], gym["months"]) == (50.0, 3)
+    assert by_category(result)["Rent"]["suggested"] == 1000.0
+
+
+def test_no_history():
+    assert suggest_budgets(frame([(datetime(2024, 1, 3), -10.0, "Rent")]), pd.Period("2024-01"))["category"] == []
+
+
+def test_endpoint_skips_transfers_and_income(app):
+    docs = [
+        {"date": p.start_time.to_pydatetime(), "amount": amount, "category": category, "is_transfer": transfer}
+        for p in months("2023-01", 12)
+        for amount, category, transfer in ((-60.0, "Phone", False), (-500.0, "Savings", True), (3000.0, "Salary", False))
+    ]
+    app.portal.call(lambda: main.transactions_collection.insert_many(docs))
+    body = app.get("/budgets/suggestions", params={"month": "2024-01"}).json()
+    assert body["category"] == ["Phone"] and body["suggested"] == [60.0]
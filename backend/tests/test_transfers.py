@@ -0,0 +1,79 @@
+"""Transfer matching: opposite amount, other account, nearest date in the window."""
+from datetime import datetime
+
+from core.transfers import (
+    TransferIndex, amount_key, candidate_window, match_batch_transfers, match_external_transfers,
+)
+
+
+def tx(date, amount, account, potential=False, **extra):
+    return {"date": date, "amount": amount, "account_name": account, "potential_transfer": potential, **extra}
+
+
+def test_amount_key_is_absolute_cents():
+    assert amount_key(-100.0) == amount_key(100) == 10000
+    assert amount_key(0.1 + 0.2) == amount_key("0.30") == 30
+    assert amount_key(None) is None and amount_key("n/a") is None
+
+
+def test_closest_respects_window_and_prefers_nearest():
+    index = TransferIndex(window_days=5)
+    index.extend([
+        (datetime(2024, 1, 1), 100, True, 0),
+        (datetime(2024, 1, 8), 100, True, 1),
+        (datetime(2024, 1, 12), 100, True, 2),
+        (datetime(2024, 1, 9), 200, True, 3),
+    ])
+    anything = lambda idx: True
+    assert index.closest(datetime(2024, 1, 10), 100, True, anything) == (datetime(2024, 1, 8), 1)
+    assert index.closest(datetime(2024, 1, 11), 100, True, anything) == (datetime(2024, 1, 12), 2)
+    # Only day 1 is six days away: outside the window
+    assert index.closest(datetime(2023, 12, 26), 100, True, anything) is None
+    assert index.closest(datetime(2024, 1, 10), 100, False, anything) is None
+    assert index.closest(datetime(2024, 1, 10), 300, True, anything) is None
+    # Ineligible rows are skipped, not treated as the end of the search
+    assert index.closest(datetime(2024, 1, 10), 100, True, lambda idx: idx != 1) == (datetime(2024, 1, 12), 2)
+    index.remove(datetime(2024, 1, 8), 100, True, 1)
+    assert index.closest(datetime(2024, 1, 9), 100, True, anything) == (datetime(2024, 1, 12), 2)
+
+
+def test_equal_gaps_go_to_the_lowest_index():
+    index = TransferIndex()
+    index.extend([(datetime(2024, 1, 12), 100, True, 1), (datetime(2024, 1, 8), 100, True, 4),
+                  (datetime(2024, 1, 8), 100, True, 3)])
+    assert index.closest(datetime(2024, 1, 10), 100, True, lambda idx: True) == (datetime(2024, 1, 12), 1)
+    assert index.closest(datetime(2024, 1, 10), 100, True, lambda idx: idx != 1) == (datetime(2024, 1, 8), 3)
+
+
+def test_batch_pairs_are_one_to_one_across_accounts():
+    batch = [
+        tx("2024-01-02", -100.0, "Checking", potential=True),
+        tx("2024-01-03", 100.0, "Checking"),               # same account
+        tx("2024-01-05", 100.0, "Savings"),
+        tx("2024-01-04", 100.0, "Brokerage"),              # nearer
+        tx("2024-01-04", -100.0, "Checking", potential=True),
+        tx("2024-01-20", 100.0, "Savings"),                # outside every window
+        tx("2024-01-04", -55.5, "Checking", potential=True),
+    ]
+    assert match_batch_transfers(batch) == [(0, 3), (4, 2)]
+
+
+def test_external_matches_skip_linked_and_claim_each_candidate_once():
+    batch = [
+        tx(datetime(2024, 1, 2), -100.0, "Checking", potential=True),
+        tx(datetime(2024, 1, 2), -100.0, "Checking", potential=True),
+        tx(datetime(2024, 1, 2), -100.0, "Checking", potential=True, linked_tx_id="x"),
+        tx(datetime(2024, 1, 2), 100.0, "Savings"),
+    ]
+    candidates = [tx(datetime(2024, 1, 6), 100.0, "Savings"), tx(datetime(2024, 1, 1), 100.0, "Checking")]
+    assert match_external_transfers(batch, candidates) == [(0, 0)]
+
+
+def test_candidate_window_pads_dates_and_negates_amounts():
+    batch = [
+        tx("2024-01-10", -100.0, "Checking", potential=True),
+        tx("2024-01-20", 25.5, "Savings", potential=True),
+        tx("2024-02-20", 70.0, "Savings"),
+    ]
+    assert candidate_window(batch) == (datetime(2024, 1, 5), datetime(2024, 1, 25), [-25.5, 100.0])
+    assert candidate_window([tx("2024-01-10", -100.0, "Checking")]) is None
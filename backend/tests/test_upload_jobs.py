@@ -0,0 +1,220 @@
+"""Upload jobs: states, inserted/skipped counts, rollback and concurrent writes."""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import main
+from core.jobs import LEASE_SECONDS, JobQueue, QueueFull
+from core.links import link_fields
+from core.uploads import clear_spool
+from tests.conftest import BOA_CSV, find, upload
+
+
+def test_job_states_succeeded_and_failed(mongo):
+    jobs = mongo["test"]["jobs"]
+    seen = []
+
+    async def handler(payload, progress):
+        seen.append((await jobs.find_one({"_id": progress.job_id}))["status"])
+        if payload.get("fail"):
+            raise ValueError("boom")
+        return {"ok": True}
+
+    async def run():
+        queue = JobQueue(jobs, handler, workers=1)
+        await queue.start()
+        try:
+            ids = [await queue.submit("test", {}), await queue.submit("test", {"fail": True})]
+            queued = [job["status"] for job in await jobs.find({}).to_list(length=None)]
+            await queue.queue.join()
+            return queued, [await jobs.find_one({"_id": ObjectId(i)}) for i in ids]
+        finally:
+            await queue.stop()
+
+    queued, (ok, failed) = asyncio.run(run())
+    assert queued == ["queued", "queued"]
+    assert seen == ["running", "running"]
+    assert ok["status"] == "succeeded" and ok["result"] == {"ok": True}
+    assert failed["status"] == "failed" and failed["error"] == "boom"
+
+
+def test_interrupted_jobs_fail_on_start(mongo):
+    async def run():
+        jobs = mongo["test"]["jobs"]
+        await jobs.insert_one({"status": "running"})
+        queue = JobQueue(jobs, None)
+        await queue.start()
+        await queue.stop()
+        return await jobs.find_one({})
+
+    assert asyncio.run(run())["status"] == "failed"
+
+
+def test_concurrent_submits_cannot_overfill_the_queue(mongo):
+    jobs = mongo["test"]["jobs"]
+
+    class SlowInserts:
+        database = jobs.database
+
+        async def insert_one(self, doc):
+            # Both submits are inside the insert before either enqueues
+            await asyncio.sleep(0.01)
+            return await jobs.insert_one(doc)
+
+    async def run():
+        queue = JobQueue(SlowInserts(), None, max_pending=1)
+        return await asyncio.gather(queue.submit("test", {}), queue.submit("test", {}), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, str) for r in results) == 1
+    assert sum(isinstance(r, QueueFull) for r in results) == 1
+    assert asyncio.run(jobs.count_documents({})) == 1
+
+
+def test_start_only_recovers_jobs_of_expired_owners(mongo):
+    jobs = mongo["test"]["jobs"]
+    now = datetime.utcnow()
+
+    async def run():
+        await jobs.database.job_owners.insert_many([
+            {"_id": "live", "heartbeat_at": now},
+            {"_id": "gone", "heartbeat_at": now - timedelta(seconds=LEASE_SECONDS + 1)},
+        ])
+        await jobs.insert_many([
+            {"_id": "other", "status": "running", "owner": "live"},
+            {"_id": "orphan", "status": "queued", "owner": "gone"},
+            {"_id": "legacy", "status": "running"},
+        ])
+        queue = JobQueue(jobs, None, owner="me")
+        await queue.start()
+        live = await queue.live_owners()
+        await queue.stop()
+        return live, {job["_id"]: job["status"] for job in await jobs.find().to_list(length=None)}
+
+    live, statuses = asyncio.run(run())
+    assert sorted(live) == ["live", "me"]
+    assert statuses == {"other": "running", "orphan": "failed", "legacy": "failed"}
+
+
+def test_clear_spool_keeps_live_processes_files(tmp_path):
+    (tmp_path / "live").mkdir()
+    (tmp_path / "live" / "upload.csv").write_text("x")
+    (tmp_path / "gone").mkdir()
+    (tmp_path / "gone" / "upload.csv").write_text("x")
+    (tmp_path / "loose.csv").write_text("x")
+
+    clear_spool(str(tmp_path), keep=["live"])
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["live"]
+    assert (tmp_path / "live" / "upload.csv").exists()
+
+
+def test_reupload_counts_inserted_and_skipped(app):
+    first = upload(app, "boa.csv", BOA_CSV)
+    assert first["status"] == "succeeded"
+    assert first["result"]["inserted"] == 3
+    assert first["result"]["skipped"] == 0
+
+    second = upload(app, "boa.csv", BOA_CSV)
+    assert second["result"]["inserted"] == 0
+    assert second["result"]["skipped"] == 3
+    assert len(find(app)) == 3
+
+
+def test_failed_link_write_rolls_back(app, monkeypatch):
+    original = main.transactions_collection.bulk_write
+    calls = []
+
+    async def failing_bulk_write(ops, **kwargs):
+        calls.append(len(ops))
+        # The upsert goes through; the link write that follows fails
+        if len(calls) > 1:
+            raise RuntimeError("link write failed")
+        return await original(ops, **kwargs)
+
+    existing = {
+        "_id": ObjectId(), "date": main.datetime(2024, 1, 2), "description": "TRANSFER TO SAVINGS",
+        "amount": -100.0, "account_name": "Baxter Credit Union", "category": "Transfer",
+        "is_transfer": False, "potential_transfer": True, "linked_tx_id": None,
+    }
+    app.portal.call(lambda: main.transactions_collection.insert_one(existing))
+    monkeypatch.setattr(main.transactions_collection, "bulk_write", failing_bulk_write)
+
+    job = upload(app, "boa.csv", b"Date,Description,Amount\n01/03/2024,TRANSFER FROM CHECKING,100.00\n")
+
+    assert job["status"] == "failed"
+    assert len(calls) == 2
+    stored = find(app)
+    assert [doc["_id"] for doc in stored] == [existing["_id"]]
+    assert stored[0]["is_transfer"] is False
+    assert stored[0]["linked_tx_id"] is None
+
+
+def test_rows_lost_to_a_concurrent_upload_are_not_linked(app):
+    """A row another upload inserted first must not receive, or cause, links."""
+    date = main.datetime(2024, 1, 3)
+    existing = {
+        "_id": ObjectId(), "date": date, "description": "TRANSFER TO SAVINGS", "amount": -100.0,
+        "account_name": "BoA Checking", "is_transfer": False, "potential_transfer": True,
+        "linked_tx_id": None,
+    }
+    # Same fingerprint as the incoming deposit: the concurrent upload won
+    winner = {"_id": ObjectId(), "fingerprint": "deposit", "date": date, "amount": 100.0,
+              "account_name": "Savings", "is_transfer": False, "linked_tx_id": None}
+    deposit = {"_id": ObjectId(), "fingerprint": "deposit", "date": date, "amount": 100.0,
+               "account_name": "Savings", "is_transfer": False, "linked_tx_id": None}
+    # An in-batch pair whose other leg lost the same race
+    withdrawal = {"_id": ObjectId(), "fingerprint": "withdrawal", "date": date, "amount": -25.0,
+                  "account_name": "Savings", "linked_tx_id": None}
+    refund = {"_id": ObjectId(), "fingerprint": "refund", "date": date, "amount": 25.0,
+              "account_name": "Brokerage", "linked_tx_id": None}
+    refund_winner = {**refund, "_id": ObjectId()}
+    app.portal.call(lambda: main.transactions_collection.insert_many([existing, winner, refund_winner]))
+
+    deposit.update(link_fields(deposit["_id"], existing["_id"], existing["account_name"]))
+    withdrawal.update(link_fields(withdrawal["_id"], refund["_id"], refund["account_name"]))
+    refund.update(link_fields(refund["_id"], withdrawal["_id"], withdrawal["account_name"]))
+
+    inserted, linked_existing = app.portal.call(
+        lambda: main.write_transactions([deposit, withdrawal, refund], [(deposit, existing)])
+    )
+
+    assert [txn["_id"] for txn in inserted] == [withdrawal["_id"]]
+    assert linked_existing == []
+    by_id = {doc["_id"]: doc for doc in find(app)}
+    assert by_id[existing["_id"]]["is_transfer"] is False
+    assert by_id[existing["_id"]]["linked_tx_id"] is None
+    assert by_id[withdrawal["_id"]]["is_transfer"] is False
+    assert by_id[withdrawal["_id"]]["linked_tx_id"] is None
+    assert "transfer_pair" not in by_id[withdrawal["_id"]]
+    assert deposit["_id"] not in by_id and refund["_id"] not in by_id
+
+
+def test_failed_chunk_removes_rows_of_earlier_chunks(app, monkeypatch):
+    monkeypatch.setattr(main.Config, "get_upload_chunk_rows", staticmethod(lambda: 2))
+    original = main.ingest_chunk
+    chunks = []
+
+    async def failing_second_chunk(rows, counter, replay):
+        chunks.append(len(rows))
+        if len(chunks) == 2:
+            raise RuntimeError("chunk failed")
+        return await original(rows, counter, replay)
+
+    existing = {
+        "_id": ObjectId(), "date": main.datetime(2024, 1, 2), "description": "TRANSFER TO CHECKING",
+        "amount": -100.0, "account_name": "Savings", "category": "Transfer",
+        "is_transfer": False, "potential_transfer": True, "linked_tx_id": None,
+    }
+    app.portal.call(lambda: main.transactions_collection.insert_one(existing))
+    monkeypatch.setattr(main, "ingest_chunk", failing_second_chunk)
+
+    job = upload(app, "boa.csv", BOA_CSV.replace(b"PAYROLL DEPOSIT,2500.00", b"TRANSFER FROM SAVINGS,100.00"))
+
+    assert job["status"] == "failed"
+    assert chunks == [2, 1]
+    [doc] = find(app)
+    assert doc["_id"] == existing["_id"]
+    assert doc["is_transfer"] is False
+    assert doc["linked_tx_id"] is None
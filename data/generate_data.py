@@ -1,7 +1,24 @@
-import pandas as pd
-import random
+"""
+Synthetic bank statements.
+
+With no arguments this writes the four 2025 sample files, one per supported
+bank layout. With --users it becomes a load-test generator: N users, each
+with M accounts (cycling through the four layouts), Y years of history and
+random transfers between a user's accounts. Each account's history is
+built with vectorized date ranges, and output is written user by user, so
+memory stays bounded by one user's rows regardless of the total size.
+
+    python generate_data.py
+    python generate_data.py --users 50 --accounts 4 --years 10 \\
+        --transfer-density 1.0 --out generated --flat generated/transactions.csv
+"""
+import argparse
+import os
 from datetime import date, timedelta
 
+import numpy as np
+import pandas as pd
+
 # Constants
 START_DATE = date(2025, 1, 1)
 END_DATE = date(2025, 11, 30)
@@ -12,129 +29,298 @@ BIWEEKLY_NET = NET_SALARY / 26
 BOA_SPLIT = 0.30
 BAXTER_SPLIT = 0.70
 
-# Helper to generate bi-weekly pay dates (Starting Jan 3, 2025)
+DAILY_EXPENSES = ["WALMART GROCERY", "KROGER #443", "STARBUCKS COFFEE", "UBER EATS"]
+BILLS = ["CITY WATER BILL", "NETFLIX COM", "AMZN Mktp US", "TARGET"]
+
+LAYOUTS = ("boa", "baxter", "fidelity_individual", "fidelity_roth")
+LAYOUT_NAMES = {
+    "boa": "BoA Checking",
+    "baxter": "Baxter Credit Union",
+    "fidelity_individual": "Fidelity Individual",
+    "fidelity_roth": "Fidelity Roth IRA",
+}
+# Flat rows: one transaction per row, before formatting into a bank layout
+ROW_COLUMNS = ["date", "action", "symbol", "description", "quantity", "price", "amount"]
+
+_rng = np.random.default_rng()
+
+
+def set_seed(seed):
+    global _rng
+    _rng = np.random.default_rng(seed)
+
+
+# Helper to generate bi-weekly pay dates (first Friday on or after start_date)
 def get_biweekly_pay_dates(start_date, end_date):
-    pay_dates = []
-    current = date(2025, 1, 3) # First Friday of 2025
-    while current <= end_date:
-        if current >= start_date:
-            pay_dates.append(current)
-        current += timedelta(weeks=2)
-    return pay_dates
+    first = start_date + timedelta(days=(4 - start_date.weekday()) % 7)
+    return list(pd.date_range(first, end_date, freq="14D").date)
+
+
+def _days(start_date, end_date):
+    return pd.date_range(start_date, end_date, freq="D")
+
+
+def _rows(dates, description, amount, action="", symbol="", quantity="", price=""):
+    """Frame of flat rows; scalar arguments are broadcast over the dates."""
+    dates = np.asarray(dates, dtype=object)
+    n = len(dates)
+    column = lambda v: v if np.ndim(v) else np.full(n, v, dtype=object)
+    return pd.DataFrame({
+        "date": dates,
+        "action": column(action),
+        "symbol": column(symbol),
+        "description": column(description),
+        "quantity": column(quantity),
+        "price": column(price),
+        "amount": column(amount),
+    }, columns=ROW_COLUMNS)
+
+
+def _concat(frames):
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=ROW_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values("date", kind="stable", ignore_index=True)
+
+
+def _random_spend(days, probability, low, high, descriptions):
+    hit = _rng.random(len(days)) < probability
+    n = int(hit.sum())
+    amounts = -np.round(_rng.uniform(low, high, n), 2)
+    return _rows(days[hit].date, _rng.choice(descriptions, n), amounts)
+
+
+def checking_rows(start_date, end_date, builtin_transfers=True):
+    days = _days(start_date, end_date)
+    frames = [
+        # Income
+        _rows(get_biweekly_pay_dates(start_date, end_date), "DES: PAYROLL DEPOSIT ID: 998877",
+              round(BIWEEKLY_NET * BOA_SPLIT, 2)),
+        # Random daily expenses (40%) and bills (10%)
+        _random_spend(days, 0.4, 20, 150, DAILY_EXPENSES),
+        _random_spend(days, 0.1, 50, 200, BILLS),
+    ]
+    if builtin_transfers:
+        # Monthly Transfer to Investment Account
+        frames.append(_rows(days[days.day == 15].date, "Online Transfer to Fidelity Inv", -500.00))
+    return _concat(frames)
+
+
+def savings_rows(start_date, end_date, builtin_transfers=True):
+    days = _days(start_date, end_date)
+    frames = [
+        _rows(get_biweekly_pay_dates(start_date, end_date), "DIRECT DEP ACME CORP",
+              round(BIWEEKLY_NET * BAXTER_SPLIT, 2)),
+        _rows(days[days.day == 1].date, "MORTGAGE PAYMENT 4432", -3200.00),
+    ]
+    if builtin_transfers:
+        # Monthly Transfer to Roth IRA
+        frames.append(_rows(days[days.day == 5].date, "TRANSFER TO FIDELITY ROTH IRA", -600.00))
+    return _concat(frames)
+
+
+def brokerage_rows(start_date, end_date, builtin_transfers=True):
+    days = _days(start_date, end_date)
+    frames = []
+    if builtin_transfers:
+        # Receive Transfer from BoA (Day 16)
+        frames.append(_rows(days[days.day == 16].date, "ELECTRONIC FUNDS TRANSFER RECEIVED (CASH)", 500.00,
+                            action="EFT"))
+    # Invest on day 18
+    frames.append(_rows(days[days.day == 18].date, "FIDELITY 500 INDEX FUND", -490.00, action="BUY", symbol="FXAIX"))
+    return _concat(frames)
+
+
+def retirement_rows(start_date, end_date, builtin_transfers=True):
+    days = _days(start_date, end_date)
+    frames = []
+    if builtin_transfers:
+        # Receive Transfer from Baxter (Day 6)
+        frames.append(_rows(days[days.day == 6].date, "Cash Contribution", 600.00, action="EFT RECEIVED"))
+    # Buy stocks on day 7
+    buys = days[days.day == 7].date
+    frames.append(_rows(buys, "NVIDIA CORP", -280.00, action="YOU BOUGHT", symbol="NVDA", quantity=2, price=140.00))
+    frames.append(_rows(buys, "TESLA INC", -250.00, action="YOU BOUGHT", symbol="TSLA", quantity=1, price=250.00))
+    return _concat(frames)
+
+
+ACCOUNT_ROWS = {
+    "boa": checking_rows,
+    "baxter": savings_rows,
+    "fidelity_individual": brokerage_rows,
+    "fidelity_roth": retirement_rows,
+}
+
+
+def to_layout(rows, layout):
+    """Formats flat rows as the given bank's export columns."""
+    amounts = rows["amount"].astype(float)
+    if layout == "boa":
+        return pd.DataFrame({"Date": rows["date"], "Description": rows["description"], "Amount": amounts})
+    if layout == "baxter":
+        return pd.DataFrame({
+            "Posted Date": rows["date"],
+            "Transaction Details": rows["description"],
+            "Debit": (-amounts).clip(lower=0),
+            "Credit": amounts.clip(lower=0),
+        })
+    if layout == "fidelity_individual":
+        return pd.DataFrame({
+            "Date": rows["date"], "Action": rows["action"], "Symbol": rows["symbol"],
+            "Description": rows["description"], "Amount": amounts,
+        })
+    return pd.DataFrame({
+        "Run Date": rows["date"], "Account": "Roth IRA", "Action": rows["action"], "Symbol": rows["symbol"],
+        "Security Description": rows["description"], "Quantity": rows["quantity"], "Price": rows["price"],
+        "Amount": amounts,
+    })
+
+
+def flat_description(rows):
+    """The description the app derives from a layout (action, symbol, text)."""
+    joined = rows["action"].astype(str) + " " + rows["symbol"].astype(str) + " " + rows["description"].astype(str)
+    return joined.str.replace(r"\s+", " ", regex=True).str.strip()
 
-pay_dates = get_biweekly_pay_dates(START_DATE, END_DATE)
 
 # ---------------------------------------------------------
 # 1. Bank of America (BoA) - Checking
 # Format: Date, Description, Amount
 # ---------------------------------------------------------
-boa_data = []
-
-# Income
-for d in pay_dates:
-    amount = round(BIWEEKLY_NET * BOA_SPLIT, 2)
-    boa_data.append([d, "DES: PAYROLL DEPOSIT ID: 998877", amount])
-
-# Expenses & Transfers
-current = START_DATE
-while current <= END_DATE:
-    # Random Daily Expenses
-    if random.random() < 0.4: # 40% chance
-        amt = -round(random.uniform(20, 150), 2)
-        desc = random.choice(["WALMART GROCERY", "KROGER #443", "STARBUCKS COFFEE", "UBER EATS"])
-        boa_data.append([current, desc, amt])
-    
-    if random.random() < 0.1: # 10% chance
-        amt = -round(random.uniform(50, 200), 2)
-        desc = random.choice(["CITY WATER BILL", "NETFLIX COM", "AMZN Mktp US", "TARGET"])
-        boa_data.append([current, desc, amt])
-    
-    # Monthly Transfer to Investment Account
-    if current.day == 15: 
-        amt = -500.00
-        boa_data.append([current, "Online Transfer to Fidelity Inv", amt])
-
-    current += timedelta(days=1)
-
-df_boa = pd.DataFrame(boa_data, columns=["Date", "Description", "Amount"])
-df_boa.sort_values("Date", inplace=True)
-df_boa.to_csv('boa_transactions_2025.csv', index=False)
-print("Generated boa_transactions_2025.csv")
+def generate_boa(start_date=START_DATE, end_date=END_DATE):
+    return to_layout(checking_rows(start_date, end_date), "boa")
 
 
 # ---------------------------------------------------------
 # 2. Baxter Credit Union (BCU) - Main Savings/Mortgage
 # Format: Posted Date, Transaction Details, Debit, Credit
 # ---------------------------------------------------------
-baxter_data = []
-
-# Income
-for d in pay_dates:
-    amount = round(BIWEEKLY_NET * BAXTER_SPLIT, 2)
-    baxter_data.append([d, "DIRECT DEP ACME CORP", 0, amount])
-
-# Monthly Mortgage & Transfers
-current = START_DATE
-while current <= END_DATE:
-    if current.day == 1:
-        baxter_data.append([current, "MORTGAGE PAYMENT 4432", 3200.00, 0])
-    
-    # Monthly Transfer to Roth IRA
-    if current.day == 5: 
-        baxter_data.append([current, "TRANSFER TO FIDELITY ROTH IRA", 600.00, 0])
-        
-    current += timedelta(days=1)
-
-df_baxter = pd.DataFrame(baxter_data, columns=["Posted Date", "Transaction Details", "Debit", "Credit"])
-df_baxter.sort_values("Posted Date", inplace=True)
-df_baxter.to_csv('baxter_cu_transactions_2025.csv', index=False)
-print("Generated baxter_cu_transactions_2025.csv")
+def generate_baxter(start_date=START_DATE, end_date=END_DATE):
+    return to_layout(savings_rows(start_date, end_date), "baxter")
 
 
 # ---------------------------------------------------------
 # 3. Fidelity Individual Investment (Non-Retirement)
-# Format: Run Date, Action, Symbol, Description, Amount
+# Format: Date, Action, Symbol, Description, Amount
 # ---------------------------------------------------------
-fid_inv_data = []
-
-current = START_DATE
-while current <= END_DATE:
-    # Receive Transfer from BoA (Day 16)
-    if current.day == 16:
-        fid_inv_data.append([current, "EFT", "", "ELECTRONIC FUNDS TRANSFER RECEIVED (CASH)", 500.00])
-        
-        # Invest money 2 days later (Day 18)
-        buy_date = current + timedelta(days=2)
-        if buy_date <= END_DATE:
-            fid_inv_data.append([buy_date, "BUY", "FXAIX", "FIDELITY 500 INDEX FUND", -490.00])
-            
-    current += timedelta(days=1)
-
-df_fid_inv = pd.DataFrame(fid_inv_data, columns=["Date", "Action", "Symbol", "Description", "Amount"])
-df_fid_inv.to_csv('fidelity_individual_2025.csv', index=False)
-print("Generated fidelity_individual_2025.csv")
+def generate_fidelity_individual(start_date=START_DATE, end_date=END_DATE):
+    return to_layout(brokerage_rows(start_date, end_date), "fidelity_individual")
 
 
 # ---------------------------------------------------------
 # 4. Fidelity Roth IRA
 # Format: Run Date, Account, Action, Symbol, Security Description, Quantity, Price, Amount
 # ---------------------------------------------------------
-fid_roth_data = []
-
-current = START_DATE
-while current <= END_DATE:
-    # Receive Transfer from Baxter (Day 6)
-    if current.day == 6:
-        fid_roth_data.append([current, "Roth IRA", "EFT RECEIVED", "", "Cash Contribution", "", "", 600.00])
-        
-        # Buy Stocks (Day 7)
-        buy_date = current + timedelta(days=1)
-        if buy_date <= END_DATE:
-            fid_roth_data.append([buy_date, "Roth IRA", "YOU BOUGHT", "NVDA", "NVIDIA CORP", 2, 140.00, -280.00])
-            fid_roth_data.append([buy_date, "Roth IRA", "YOU BOUGHT", "TSLA", "TESLA INC", 1, 250.00, -250.00])
-    
-    current += timedelta(days=1)
-
-df_fid_roth = pd.DataFrame(fid_roth_data, columns=["Run Date", "Account", "Action", "Symbol", "Security Description", "Quantity", "Price", "Amount"])
-df_fid_roth.to_csv('fidelity_roth_2025.csv', index=False)
-print("Generated fidelity_roth_2025.csv")
\ No newline at end of file
+def generate_fidelity_roth(start_date=START_DATE, end_date=END_DATE):
+    return to_layout(retirement_rows(start_date, end_date), "fidelity_roth")
+
+
+# ---------------------------------------------------------
+# Load-test generator
+# ---------------------------------------------------------
+def transfer_rows(n_accounts, start_date, end_date, density):
+    """
+    Random transfers between a user's accounts: `density` per account per
+    month on average, received 0-2 days after they are sent. Returns one
+    frame of flat rows per account.
+    """
+    per_account = [[] for _ in range(n_accounts)]
+    if n_accounts < 2 or density <= 0:
+        return per_account
+    days = (end_date - start_date).days + 1
+    n = _rng.poisson(density * n_accounts * days / 30.4)
+    src = _rng.integers(0, n_accounts, n)
+    dst = (src + _rng.integers(1, n_accounts, n)) % n_accounts
+    sent = np.datetime64(start_date) + _rng.integers(0, days, n).astype("timedelta64[D]")
+    received = np.minimum(sent + _rng.integers(0, 3, n).astype("timedelta64[D]"), np.datetime64(end_date))
+    amounts = np.round(_rng.uniform(50, 2000, n), 2)
+    for i in range(n_accounts):
+        out, into = src == i, dst == i
+        per_account[i].append(_rows(sent[out].astype(object), [f"TRANSFER TO ACCT {d}" for d in dst[out]],
+                                    -amounts[out]))
+        per_account[i].append(_rows(received[into].astype(object), [f"TRANSFER FROM ACCT {s}" for s in src[into]],
+                                    amounts[into]))
+    return per_account
+
+
+def generate_user(user, n_accounts, start_date, end_date, transfer_density):
+    """Yields (account_index, layout, account_name, flat rows) for each of a user's accounts."""
+    transfers = transfer_rows(n_accounts, start_date, end_date, transfer_density)
+    for i in range(n_accounts):
+        layout = LAYOUTS[i % len(LAYOUTS)]
+        rows = ACCOUNT_ROWS[layout](start_date, end_date, builtin_transfers=False)
+        yield i, layout, f"{LAYOUT_NAMES[layout]} U{user}-{i}", _concat([rows, *transfers[i]])
+
+
+def _append_csv(frame, path):
+    frame.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def generate(users, accounts, years, transfer_density, out_dir=None, flat_path=None, end_date=END_DATE):
+    """Streams generated rows to per-account bank files and/or one flat CSV. Returns the row count."""
+    start_date = date(end_date.year - years + 1, 1, 1)
+    # Files are appended to, so start from a clean slate
+    if flat_path and os.path.exists(flat_path):
+        os.remove(flat_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        for name in os.listdir(out_dir):
+            if name.startswith("user") and name.endswith(".csv"):
+                os.remove(os.path.join(out_dir, name))
+
+    total = 0
+    for user in range(users):
+        flat = []
+        for i, layout, account_name, rows in generate_user(user, accounts, start_date, end_date, transfer_density):
+            total += len(rows)
+            if out_dir:
+                to_layout(rows, layout).to_csv(os.path.join(out_dir, f"user{user}_{i}_{layout}.csv"), index=False)
+            if flat_path:
+                flat.append(pd.DataFrame({
+                    "date": rows["date"],
+                    "description": flat_description(rows),
+                    "amount": rows["amount"].astype(float),
+                    "account_name": account_name,
+                    "user": user,
+                }))
+        # Only one user's rows are ever held in memory
+        if flat:
+            _append_csv(pd.concat(flat, ignore_index=True), flat_path)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic bank statements.")
+    parser.add_argument("--users", type=int, help="Load-test mode: number of users")
+    parser.add_argument("--accounts", type=int, default=4, help="Accounts per user")
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--transfer-density", type=float, default=1.0,
+                        help="Average transfers per account per month")
+    parser.add_argument("--out", help="Directory for per-account bank-format CSVs")
+    parser.add_argument("--flat", help="Path for one flat CSV (date, description, amount, account_name, user)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        set_seed(args.seed)
+
+    if args.users:
+        out_dir = args.out or (None if args.flat else "generated")
+        total = generate(args.users, args.accounts, args.years, args.transfer_density, out_dir, args.flat)
+        print(f"Generated {total} transactions for {args.users} users x {args.accounts} accounts x {args.years} years")
+        return
+
+    generate_boa().to_csv('boa_transactions_2025.csv', index=False)
+    print("Generated boa_transactions_2025.csv")
+
+    generate_baxter().to_csv('baxter_cu_transactions_2025.csv', index=False)
+    print("Generated baxter_cu_transactions_2025.csv")
+
+    generate_fidelity_individual().to_csv('fidelity_individual_2025.csv', index=False)
+    print("Generated fidelity_individual_2025.csv")
+
+    generate_fidelity_roth().to_csv('fidelity_roth_2025.csv', index=False)
+    print("Generated fidelity_roth_2025.csv")
+
+
+if __name__ == "__main__":
+    main()
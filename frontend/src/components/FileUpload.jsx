@@ -22,31 +22,58 @@ const FileUpload = ({ onUploadSuccess }) => {
         e.stopPropagation();
         setDragActive(false);
         if (e.dataTransfer.files && e.dataTransfer.files[0]) {
-            handleFiles(e.dataTransfer.files[0]);
+            handleFiles(e.dataTransfer.files);
         }
     };
 
     const handleChange = (e) => {
         e.preventDefault();
         if (e.target.files && e.target.files[0]) {
-            handleFiles(e.target.files[0]);
+            handleFiles(e.target.files);
         }
     };
 
-    const handleFiles = async (file) => {
+    // Uploads are processed in the background; poll the job until it finishes
+    const waitForJob = async (jobId) => {
+        while (true) {
+            const { data: job } = await axios.get(`/jobs/${jobId}`);
+            if (job.status === 'succeeded' || job.status === 'failed') return job;
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+        }
+    };
+
+    const handleFiles = async (fileList) => {
         setUploading(true);
         setMessage(null);
 
+        // Several files or an archive go in one batch so transfers between them are linked
+        const files = Array.from(fileList);
+        const batch = files.length > 1 || files[0].name.toLowerCase().endsWith('.zip');
         const formData = new FormData();
-        formData.append("file", file);
+        if (batch) {
+            files.forEach((file) => formData.append("files", file));
+        } else {
+            formData.append("file", files[0]);
+        }
 
         try {
-            const response = await axios.post('/upload', formData, {
+            const response = await axios.post(batch ? '/upload/batch' : '/upload', formData, {
                 headers: {
                     'Content-Type': 'multipart/form-data'
                 }
             });
-            setMessage({ type: 'success', text: `Successfully processed ${response.data.count} transactions!` });
+            const job = await waitForJob(response.data.job_id);
+            if (job.status === 'failed') {
+                setMessage({ type: 'error', text: job.error || "Upload failed. Please try again." });
+                return;
+            }
+            const { inserted, skipped, files: results = [] } = job.result;
+            const failed = results.filter((f) => f.error);
+            setMessage({
+                type: failed.length ? 'error' : 'success',
+                text: `Successfully processed ${inserted} transactions!` + (skipped ? ` (${skipped} already imported)` : '')
+                    + (failed.length ? ` Could not read: ${failed.map((f) => f.filename).join(', ')}` : '')
+            });
             if (onUploadSuccess) onUploadSuccess();
         } catch (error) {
             console.error("Upload error:", error);
@@ -70,6 +97,7 @@ const FileUpload = ({ onUploadSuccess }) => {
             >
                 <input
                     type="file"
+                    multiple
                     className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
                     onChange={handleChange}
                     disabled={uploading}
@@ -81,10 +109,10 @@ const FileUpload = ({ onUploadSuccess }) => {
                     </div>
                     <div>
                         <p className="text-lg font-medium text-slate-700">
-                            {uploading ? "Processing..." : "Drop your statement here"}
+                            {uploading ? "Processing..." : "Drop your statements here"}
                         </p>
                         <p className="text-sm text-slate-500 mt-1">
-                            Supports CSV, Excel, or Text files
+                            Supports CSV, Excel, Text, or a Zip of several files
                         </p>
                     </div>
                 </div>